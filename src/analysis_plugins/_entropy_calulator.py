@@ -10,7 +10,7 @@ including multiple passwords. The leak must not be cleaned, meaningly still cont
 
 The following parameters are passed to the plugin:
 
-'pws_multi'                 #   Dict: {'password/hash':{'occ':0, 'lookups':0}} 
+'pws_multi'                 #  Index: {'password/hash':{'occ':0, 'lookups':0}}  (LeakIndex, used like a dict)
                                   -->  password/hash is the key, 'occ' the occurence counter and 'lookups' a coutner for how often the pw/hash has been looked up during the guessing process
 'pw_counter'                #    Int:  Counter for the overall amount of passwords/hashes in the leak
 'pws_unique_counter'        #    Int:  Counter for the unique occurences in the leak
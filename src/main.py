@@ -10,11 +10,13 @@ import os
 import timeit
 import shutil
 import json
+import threading
 from subprocess import Popen, PIPE
 from collections import OrderedDict
 from math import fmod
 from pgf.log.logger import Logger
 from pgf.execution.executor import Executor
+from pgf.execution.scheduler import Scheduler
 from pgf.initiation.confighelper import ConfigHelper
 
 
@@ -79,20 +81,19 @@ def main():
     ch = ConfigHelper('./configfiles/run.ini', logger=logger)
 
     # parse jobs from 'run.ini'
-    job_queue = ch.parse_jobs()
-    job_counter = 0                                 # helper to get corrent job-object from json file at the end of each job run
+    jobs = ch.parse_jobs()                          # all jobs in order, to merge their plot series into the plot file
+    job_queue = [job for job in jobs if job.group_leader is None]       # the other jobs of a job group are run along with their group leader
+    lock = threading.Lock()                         # guards the files shared by the concurrently running jobs (jobs.json, plot file, logfile)
 
-    # Clear 'PGF.log' file in te JtR directory to reset it
-    # The path of the logfile will be generated and stored while parsing the jobs thus the get
-    # it from the first job in the list
-    job_queue[0].clear_jtr_log()
+    # Clear 'PGF.log' file(s) in te JtR directory to reset it
+    # The paths of the logfiles will be generated and stored while parsing the jobs (one per job if jobs run concurrently)
+    for job in jobs:
+        job.clear_jtr_log()
 
 
-    # iterate through the job queue
-    while len(job_queue) > 0:
-        logger.debug("Remaining jobs: %2d\n\n" % len(job_queue))
-        job = job_queue.pop(0)      # get first job in queue
-
+    def run_job(job):
+        ''' Processes a single job. Called by the Scheduler in a thread per job.
+        '''
         job_start = timeit.default_timer()
         logger.debug("Starting Job <%s>" % job.label)
 
@@ -115,26 +116,41 @@ def main():
                                                       (fmod(job_runtime,3600)/60),
                                                       (fmod(job_runtime,60))
                                                       ))
-        with open(job.output_file, 'a') as output_file:                     # write runtime of the current job the according outfile
-            output_file.write("\nRuntime: '%s':  %s" % (job.label, job_human_runtime))
+        for member in [job] + (job.group or []):                               # the jobs of a job group finish together
+            with open(member.output_file, 'a') as output_file:                     # write runtime of the current job the according outfile
+                output_file.write("\nRuntime: '%s':  %s" % (member.label, job_human_runtime))
+
+            # job finished!
+            logger.debug("---------------- JOB <%s> DONE! --------------------------\n" % member.label)
+            logger.debug("Runtime: %28s: %s\n" % (member.label, job_human_runtime))
+
+            with lock:
+                # add runtime to list of job-runtimes
+                runtimes[member.label] = job_human_runtime
+
+                # Write Runtime of curent job into jobs.json
+                with open('./results/jobs.json', 'r') as f:
+                    json_obj = json.load(f)
+                    json_obj['jobs'][jobs.index(member)]['runtime'] = job_human_runtime
+                    json_obj['jobs'][jobs.index(member)]['resources'] = job.resources      # peak and mean resources of the processes of the job (group)
+                with open('./results/jobs.json', 'w') as f:
+                    f.write(json.dumps(json_obj, sort_keys=True, indent=4))
 
-        # job finished!
-        logger.debug("---------------- JOB <%s> DONE! --------------------------\n" % job.label)
-        logger.debug("Runtime: %28s: %s\n" % (job.label, job_human_runtime))
+        with lock:
+            # Merge the plot series of the finished jobs into the plot file and the logfiles of its processes into the logfile
+            ch.preparation.merge_plot_file(jobs)
+            logger.merge_logs()
 
-        # add runtime to list of job-runtimes
-        runtimes[job.label] = job_human_runtime
 
-        # Write Runtime of curent job into jobs.json
-        with open('./results/jobs.json', 'r') as f:
-            json_obj = json.load(f)
-            json_obj['jobs'][job_counter]['runtime'] = job_human_runtime
-        with open('./results/jobs.json', 'w') as f:
-            f.write(json.dumps(json_obj, sort_keys=True, indent=4))
-        job_counter += 1
+    # run the jobs of the queue, 'max_concurrent_jobs' at once
+    scheduler = Scheduler(job_queue, run_job,
+                          ch.get_option('DEFAULT', 'max_concurrent_jobs'),
+                          ch.get_option('DEFAULT', 'cpu_affinity'),
+                          logger)
+    scheduler.run()
 
 
-    # **** **** WHILE LOOP ENDS HERE! **** ****
+    # **** **** ALL JOBS FINISHED HERE! **** ****
 
 
     # calc runtime of PGF
@@ -12,13 +12,33 @@ sys.path.insert(1, os.path.abspath('./'))
 import ast
 import psutil
 import signal
-import re
+import json
+import timeit
+import multiprocessing
+from collections import deque
+from itertools import islice
 from pgf.log.logger import Logger
 from pgf.analysis.schemes.plaintext_analysis import PlaintextAnalysis
 from pgf.analysis.schemes.hash_analysis import HashAnalysis
+from pgf.analysis.schemes.group_analysis import GroupAnalysis
+from pgf.analysis.schemes.digest_analysis import DigestAnalysis
 from pgf.analysis.fileparser.plaintext_pure import PlaintextPure
 from pgf.analysis.fileparser.hash_pure import HashPure
+from pgf.analysis.fileparser.hash_salted import HashSalted
 from pgf.analysis.fileparser.plaintext_withcount import PlaintextWithcount
+from pgf.analysis.fileparser.parallel_parser import ParallelParser
+from pgf.analysis.intake import BlockReader
+from pgf.analysis.match_pool import MatchPool
+from pgf.analysis.progress_writer import ProgressWriter
+from pgf.analysis.checkpoint import Checkpoint
+from pgf.analysis.crack_locator import CrackLocator
+from pgf.analysis.jtr_status import decode_status_line, STATUS, COMPLETED, ABORTED
+from pgf.analysis.hash_evaluator import to_digest_index
+from pgf.analysis.index.leak_index import LeakIndex
+from pgf.analysis.index.leak_cache import LeakCache
+from pgf.analysis.index.multi_leak_index import MultiLeakIndex
+from pgf.execution.stage_metrics import StageMetrics
+from pgf.execution.pipe_supervisor import PipeSupervisor
 
 
 class Analysis():
@@ -33,10 +53,36 @@ class Analysis():
     :param jtr_pot_file: '.pot' file of JtR to parse for cracked candidates.
     :param output_file: Path of the output file.
     :param progress_file: Path of the progress file.
-    :param plot_file: Path of the plot file.
+    :param plot_file: Path of the plot file (header line with the x-axis values).
+    :param leak_cache_dir: Directory of the cache of parsed leaks ('None' to disable the cache).
+    :param leak_cache_max_size: Maximum size of the leak cache in MB ('None' for no limit).
+    :param parse_processes: Amount of processes parsing the password file ('None' for all CPU cores).
+    :param intake_block_size: Amount of bytes of the candidate stream read at once ('None' to read the candidates line by line).
+    :param analysis_workers: Amount of processes matching the candidate blocks against the leak (requires 'intake_block_size').
+    :param plot_series_file: Path of the file the plot values of the job are appended to.
+    :param progress_flush_interval: Seconds between two writes of the buffered progress rows ('None' to write every row immediately).
+    :param progress_rows_per_decade: Amount of progress rows kept per power of ten of guesses ('None' to keep all rows).
+    :param group_members: JSON list of the jobs evaluating the candidates of this job's guesser as well (job group), one dict of
+                          their job-specific parameters (label, pw_file, output_file, ...) per job ('None' for a single job).
+    :param metrics_file: Path of the metrics file of the pipeline of the job ('None' to disable the instrumentation).
+    :param metrics_interval: Seconds between two rows of the metrics file.
+    :param checkpoint_file: Path of the checkpoint of the job (group), 'None' to disable the checkpoints (plaintext jobs only).
+    :param checkpoint_interval: Seconds between two checkpoints ('None' to write no checkpoints).
+    :param skip_candidates: 'None' for a new run. Otherwise the analysis is resumed from the checkpoint and the first [skip_candidates]
+                            candidates of the stream are discarded ('0' if they have been skipped by the replay of the candidate store).
+    :param hash_format: JtR format of the hashes evaluated by the built-in hash evaluator, which is then fed with the candidates
+                        instead of the status lines of JtR (see hash_evaluator), 'None' for plaintext jobs and hash jobs evaluated by JtR.
+    :param cracked_file: Path of the file the output of JtR (cracked passwords) is appended to ('None' if JtR is not running).
+    :param jtr_stdout_fd: File descriptor of the output pipe of JtR (cracked passwords), inherited from the Executor.
+    :param jtr_candidates_fd: File descriptor of the pipe the stopper copies the candidates passed to JtR to, inherited from
+                              the Executor. Both pipes are used to determine the guess numbers of the cracked passwords (see CrackLocator).
+    :param stats_file: Path of the file the statistics of the report are written to while the job is running ('None' to disable the snapshots).
     '''
 
-    def __init__(self, label, pw_format, pw_file, pid, analysis_interval, terminate_guessing, jtr_pot_file, output_file, progress_file, plot_file):
+    def __init__(self, label, pw_format, pw_file, pid, analysis_interval, terminate_guessing, jtr_pot_file, output_file, progress_file, plot_file, leak_cache_dir='None', leak_cache_max_size='None', parse_processes='1', intake_block_size='None', analysis_workers='1', plot_series_file='None',
+                 progress_flush_interval='None', progress_rows_per_decade='None', group_members='None',
+                 metrics_file='None', metrics_interval='None', checkpoint_file='None', checkpoint_interval='None', skip_candidates='None',
+                 hash_format='None', cracked_file='None', jtr_stdout_fd='None', jtr_candidates_fd='None', stats_file='None'):
         ''' Generator.
         '''
         # Initiate logger
@@ -52,15 +98,60 @@ class Analysis():
         self.output_file = output_file
         self.progress_file = progress_file
         self.plot_file = plot_file
+        self.plot_series_file = plot_series_file
+        self.progress_writer = ProgressWriter(progress_file,
+                                              ast.literal_eval(progress_flush_interval),
+                                              ast.literal_eval(progress_rows_per_decade),
+                                              None if stats_file == 'None' else stats_file)
+        self.parse_processes = ast.literal_eval(parse_processes)
+        self.intake_block_size = ast.literal_eval(intake_block_size)
+        self.analysis_workers = ast.literal_eval(analysis_workers)
+        self.metrics = None
+        if metrics_file != 'None' and metrics_interval != 'None':
+            self.metrics = StageMetrics(metrics_file, 'analysis', ast.literal_eval(metrics_interval))
+        self.checkpoint = None
+        if checkpoint_file != 'None':
+            self.checkpoint = Checkpoint(checkpoint_file)
+        self.checkpoint_interval = ast.literal_eval(checkpoint_interval)
+        self.skip_candidates = ast.literal_eval(skip_candidates)
+        self.hash_format = None if hash_format == 'None' else hash_format
+        self.cracked_file = cracked_file
+        self.jtr_stdout = None
+        self.jtr_candidates = None
+        if jtr_stdout_fd != 'None' and jtr_candidates_fd != 'None':
+            self.jtr_stdout = os.fdopen(int(jtr_stdout_fd), 'rb', 0)
+            self.jtr_candidates = os.fdopen(int(jtr_candidates_fd), 'rb', 0)
+        self.leak_cache = None
+        if leak_cache_dir != 'None':
+            self.leak_cache = LeakCache(leak_cache_dir, ast.literal_eval(leak_cache_max_size), self.logger)
 
         # generate inputhandler depenging on input format
         self.generate_inputhandler()
         # get filetype
         self.filetype = self.inputhandler.get_filetype()
-        # parse password file
-        self.pws_multi, self.pw_counter, self.error_counter = self.inputhandler.parse_pw_file()
+        # parse password file (or load it from the leak cache)
+        if self.leak_cache is not None:
+            self.pws_multi, self.pw_counter, self.error_counter = self.leak_cache.load_or_parse(self.pw_file, self.pw_format, self.parse_pw_file)
+        else:
+            self.pws_multi, self.pw_counter, self.error_counter = self.parse_pw_file()
+        # the analysis is fed with the candidates of the guesser, unless JtR evaluates the candidates of a hash job (status lines)
+        self.candidate_input = self.filetype == 'plaintext'
+        self.salts = None                   # {salt: amount of accounts} of salted leaks evaluated by the built-in hash evaluator
+        if self.filetype == 'hashvalues' and self.hash_format is not None:
+            if self.pw_format == 'hash_salted':
+                self.salts = HashSalted.group_by_salt(self.pws_multi)                   # the candidates are hashed once per salt
+            else:
+                self.pws_multi, errors = to_digest_index(self.pws_multi, self.hash_format)     # the built-in evaluator matches the raw digests
+                self.error_counter += errors
+            self.candidate_input = True
         # generate analysis scheme (which will do the actual analysis of cracked passwords
         self.generate_analysisscheme()
+        self.progress_writer.snapshot = self.analysisscheme.get_statistics     # statistics of the report, updated while cracking
+        # add the jobs sharing the candidates of the guesser (job group)
+        self.member_analyses = list()
+        if group_members != 'None':
+            self.generate_group(json.loads(group_members), pid, analysis_interval, terminate_guessing, jtr_pot_file, plot_file,
+                                intake_block_size, analysis_workers)
 
 
     def generate_inputhandler(self):
@@ -70,19 +161,55 @@ class Analysis():
             self.inputhandler = PlaintextPure(self.pw_file)
         elif self.pw_format == 'hash_pure':
             self.inputhandler = HashPure(self.pw_file)
+        elif self.pw_format == 'hash_salted':
+            self.inputhandler = HashSalted(self.pw_file)
         elif self.pw_format == 'plaintext_withcount':
             self.inputhandler = PlaintextWithcount(self.pw_file)
         else:
-            raise AttributeError('Unsupported file type <%s>! "plaintext_pure", "hash_pure".' % self.pw_format)
+            raise AttributeError('Unsupported file type <%s>! "plaintext_pure", "hash_pure", "hash_salted".' % self.pw_format)
+
+
+    def parse_pw_file(self):
+        ''' Parses the password file with the inputhandler.
+
+        :return: (LeakIndex, Int, Int): Index of the passwords/hashes, password counter and parsing-error counter.
+        '''
+        if hasattr(self.inputhandler, 'parse_digest_file'):
+            parsed = self.inputhandler.parse_digest_file()          # hex encoded hashes of the same width --> DigestIndex
+            if parsed is not None:
+                return parsed
+        if self.parse_processes != 1 and hasattr(self.inputhandler, 'parse_lines') \
+                and os.path.getsize(self.pw_file) >= ParallelParser.MIN_FILE_SIZE:
+            self.logger.debug("Start parsing the password file ...")
+            pws_multi, pw_counter, error_counter = ParallelParser(self.inputhandler, self.parse_processes, self.logger).parse(self.pw_file)
+            self.logger.debug("Parsing done!")
+            return pws_multi, pw_counter, error_counter
+        pws_multi, pw_counter, error_counter = self.inputhandler.parse_pw_file()
+        if not isinstance(pws_multi, LeakIndex):
+            pws_multi = LeakIndex.from_counts(pws_multi)            # convert dicts returned by custom parsers into the compact index
+        return pws_multi, pw_counter, error_counter
 
 
     def generate_analysisscheme(self):
         ''' Generate the analysisscheme object depending on file type of the provided password file.
         The file type is 'plaintext' for input files with the format 'plaintext_pure' or 'plaintext_colon'
-        and 'hashvalues' for input files with the format 'hash_pure'.
+        and 'hashvalues' for input files with the format 'hash_pure' or 'hash_salted'.
         '''
         self.analysisscheme = None                          # init analysisscheme
-        if self.filetype == 'hashvalues':
+        if self.filetype == 'hashvalues' and self.hash_format is not None:
+            self.analysisscheme = DigestAnalysis(self.label,
+                                                 self.pws_multi,
+                                                 self.pw_counter,
+                                                 self.error_counter,
+                                                 self.output_file,
+                                                 self.progress_file,
+                                                 self.plot_file,
+                                                 self.plot_series_file,
+                                                 self.hash_format,
+                                                 self.progress_writer,
+                                                 self.metrics,
+                                                 self.salts)
+        elif self.filetype == 'hashvalues':
             if self.terminate_guessing is None:
                 self.logger.warning("The guesser might run in endless mode as at least one of the job parameters 'terminate_guessing' is 'None'!\n")
             self.analysisscheme = HashAnalysis(self.label,
@@ -93,7 +220,11 @@ class Analysis():
                                                self.output_file,
                                                self.progress_file,
                                                self.plot_file,
-                                               self.analysis_interval)
+                                               self.analysis_interval,
+                                               self.plot_series_file,
+                                               self.progress_writer,
+                                               self.metrics,
+                                               self.jtr_stdout is not None)
         elif self.filetype == 'plaintext':
             self.analysisscheme = PlaintextAnalysis(self.label,
                                                     self.pws_multi,
@@ -101,22 +232,68 @@ class Analysis():
                                                     self.error_counter,
                                                     self.output_file,
                                                     self.progress_file, 
-                                                    self.plot_file)
+                                                    self.plot_file,
+                                                    self.plot_series_file,
+                                                    self.progress_writer,
+                                                    self.metrics)
         else:
             raise AttributeError('Unsupported execution strategy!')
 
 
+    def generate_group(self, members, pid, analysis_interval, terminate_guessing, jtr_pot_file, plot_file, intake_block_size, analysis_workers):
+        ''' Sets up the analysis of the other jobs of the job group. Each job gets its own Analysis (leak, analysis scheme,
+        progress file, ...), the candidates are matched once against the MultiLeakIndex of all leaks of the group and fanned out
+        to the analysis schemes of the jobs by a GroupAnalysis.
+
+        :param members: List of dicts of the job-specific parameters of the other jobs (see 'Analysis' parameters).
+        '''
+        for member in members:
+            member = dict((str(key), str(value)) for key, value in member.iteritems())
+            self.member_analyses.append(Analysis(pid=pid, analysis_interval=analysis_interval, terminate_guessing=terminate_guessing,
+                                                 jtr_pot_file=jtr_pot_file, plot_file=plot_file, intake_block_size=intake_block_size,
+                                                 analysis_workers=analysis_workers, **member))
+        analyses = [self] + self.member_analyses
+        for analysis in analyses:
+            if analysis.filetype != 'plaintext':
+                raise AttributeError('Only jobs with plaintext password files can share the candidates of a guesser!')
+        for analysis in self.member_analyses:
+            analysis.analysisscheme.metrics = self.metrics      # the jobs of the group share the pipeline of this job
+        index = MultiLeakIndex([analysis.pws_multi for analysis in analyses])
+        self.logger.debug("Matching the candidates against %d leaks (%d unique passwords)." % (len(analyses), len(index)))
+        self.analysisscheme = GroupAnalysis([analysis.analysisscheme for analysis in analyses], index)
+        self.pws_multi = index                  # the candidates are matched against all leaks of the group (see MatchPool)
+
+
     def execute(self):
-        ''' Start processing the generated pw candidates for plaintext input or parsing the JtR logfile for hash input.
+        ''' Start processing the generated pw candidates for plaintext input (and hash input evaluated by the built-in hash evaluator)
+        or parsing the JtR logfile for hash input.
         '''
         self.received_candidates = [None] * self.analysis_interval              # array to collect all received candidates
         self.index = 0
+        self.pending_guesses = 0                                                # candidates matched by the worker processes since the last progress line
         self.candidate_counter = 0                                              # to count the received candidates --> kill process on certain amount
-        status_line_re = re.compile('^[0-9]*g\s[0-9]*p')
-        candidates_processed_re = re.compile('[0-9]*p')
-
-        if self.filetype == 'plaintext':
-            for candidate in sys.stdin:
+        if self.skip_candidates is not None:
+            self.restore_checkpoint()                                           # resume the analysis of the checkpoint
+        self.next_checkpoint = timeit.default_timer() + (self.checkpoint_interval or 0)
+        if self.metrics is not None:
+            self.metrics.start()                                                # the leak has been parsed, the candidates are processed from now on
+        if self.candidate_input and self.terminate_guessing is not None and self.candidate_counter >= self.terminate_guessing:
+            self.kill_guesser()                                                 # all candidates have been analyzed before the checkpoint
+            self.handle_close()
+        elif self.candidate_input and self.intake_block_size is not None:
+            if self.analysis_workers > 1:
+                self.receive_blocks_parallel()
+            else:
+                self.receive_blocks()
+            # handle the end of candidate receiving
+            self.handle_close()
+        elif self.candidate_input:
+            lines = iter(self.read_lines())
+            if self.skip_candidates:
+                deque(islice(lines, self.skip_candidates), maxlen=0)          # discard the candidates analyzed before the checkpoint
+            for candidate in lines:
+                if self.metrics is not None:
+                    self.metrics.add(1, len(candidate))
                 self.received_candidates[self.index] = candidate[:-1]           # add candidate to array (without '\n')
                 self.candidate_counter += 1                                     # increment candidate counter
                 self.index += 1                                                 # increment index
@@ -128,31 +305,273 @@ class Analysis():
                 if self.index == self.analysis_interval:                        # when #[analysis_interval] passwords are stored in buffer, they are analyzed
                     self.analysisscheme.process_candidates(self.received_candidates) # analyze the received candidates
                     self.index = 0                                              # write next condidates from the beginning into the array
+                    self.update_checkpoint()
             # handle the end of candidate receiving
             self.handle_close()
         else:   # self.filetype == 'hashvalues'
             # Instead of the candidates, the status lines of JtR are processed for hashed input
-            for line in sys.stdin:
-#                 self.logger.debug(line)
-                if not status_line_re.match(line):
-                    if 'Session completed' in line:                             # all candidates cracked before amout max. guesses reached
-                        self.logger.warning("Breaking loop as 'Session completed' line received by john-hash.")
-                        if self.terminate_guessing is not None:
-                            self.kill_guesser()
-                        self.handle_close()           # process the status lines one by one
-                        return                                                  # don't process last line!
-                    else:
-                        continue                                                # other line than status line
-                else:                                                           # lines wil be such as: '736g 4008p 0:00:00:04  152.0g/s 828.0p/s 828.0c/s 885086C/s carama..marcia'
-                    temp = candidates_processed_re.findall(line)[0]             # get '4008p'
-                    temp = temp[:-4] + '000'                                     # remove p and replace 8 by 0 (and resepctively '4' and '12')
-                    self.candidate_counter = int(temp)                          # cast '4000' to int
-                    if (self.terminate_guessing is not None) and (self.candidate_counter >= self.terminate_guessing):
-                        self.logger.debug("Breaking loop at candidate_number %d" % self.candidate_counter)
-                        self.kill_guesser()                                     # kill the guesser when #['terminate_guesser'] of candidates has been generated
-                        break
-                    self.analysisscheme.process_status_line(line)               # process the status lines one by one
-            self.handle_close(last_line=line)
+            self.receive_jtr_output()
+
+
+    def receive_jtr_output(self):
+        ''' Processes the status lines of JtR (stdin) and, if their pipes are passed, the cracked passwords reported by JtR and
+        the candidates passed to JtR, so every cracked password is added to the analysis with its guess number (see CrackLocator).
+        Returns when JtR is done and all reported passwords are located.
+        '''
+        self.jtr_done = False                                                   # no more status lines are processed
+        self.buffers = {'status': '', 'cracks': ''}                             # unterminated last lines of the JtR pipes
+        self.crack_locator = CrackLocator()
+        supervisor = PipeSupervisor(self.logger, self.metrics)
+        supervisor.add(sys.stdin, lambda data: self.receive_lines('status', data, self.process_jtr_line))
+        if self.jtr_stdout is not None:
+            self.cracked = open(self.cracked_file, 'ab')
+            supervisor.add(self.jtr_stdout, self.receive_cracks)
+            supervisor.add(self.jtr_candidates, self.receive_candidates)
+            # JtR is done (both of its pipes are closed) and the candidates of the reported passwords have been received
+            supervisor.run(until=lambda: sys.stdin.closed and self.jtr_stdout.closed and not self.crack_locator.pending, idle=self.idle)
+            for pw, guess_number in self.crack_locator.close():
+                self.add_crack(pw, guess_number)
+            self.cracked.close()
+        else:
+            supervisor.run(idle=self.idle)
+        if self.buffers['status']:
+            self.process_jtr_line(self.buffers['status'])                       # unterminated last line
+        self.handle_close()
+
+
+    def receive_lines(self, name, data, process_line):
+        ''' Splits the [data] read from the JtR pipe [name] into lines and passes them to [process_line].
+        '''
+        lines = (self.buffers[name] + data).split('\n')
+        self.buffers[name] = lines.pop()
+        for line in lines:
+            process_line('%s\n' % line)
+
+
+    def process_jtr_line(self, line):
+        ''' Processes a line printed by JtR to stderr (status line, session line or other message, see jtr_status).
+        '''
+        if self.jtr_done:
+            return                                                              # terminated, JtR is drained only
+        status = decode_status_line(line)
+        if status.kind == COMPLETED or status.kind == ABORTED:
+            if status.kind == COMPLETED:                                        # all candidates cracked before amout max. guesses reached
+                self.logger.warning("Breaking loop as 'Session completed' line received by john-hash.")
+            else:
+                self.logger.warning("JtR has stopped: <%s>" % line.strip())
+            if self.terminate_guessing is not None:
+                self.kill_guesser()
+            self.jtr_done = True
+            return
+        if status.kind != STATUS:
+            return                                                              # other line than status line
+        if (self.terminate_guessing is not None) and (status.candidates >= self.terminate_guessing):
+            self.logger.debug("Breaking loop at candidate_number %d" % status.candidates)
+            self.kill_guesser()                                                 # kill the guesser when #['terminate_guesser'] of candidates has been generated
+            self.jtr_done = True
+            status.candidates = self.terminate_guessing                         # the progress ends at [terminate_guessing] candidates
+        if self.metrics is not None:
+            self.metrics.add(status.candidates - self.candidate_counter, len(line))
+        self.candidate_counter = status.candidates
+        self.crack_locator.prune(self.candidate_counter)                        # candidates processed by JtR are not needed anymore
+        self.analysisscheme.process_status_line(status)                         # process the status lines one by one
+        if self.jtr_stdout is not None:
+            self.analysisscheme.set_window_start(self.crack_locator.get_window_start())
+
+
+    def receive_cracks(self, data):
+        ''' Receives the output of JtR: appends it to the cracked file and looks up the cracked passwords in the candidates.
+        JtR prints every cracked password as '[password padded to 16 characters] ([username])'.
+        '''
+        self.cracked.write(data)
+        self.receive_lines('cracks', data, self.process_crack_line)
+
+
+    def process_crack_line(self, line):
+        ''' Adds the password of a line of JtR's output to the analysis (or to the pending passwords of the CrackLocator).
+        '''
+        end = line.rfind(' (')
+        if end < 0:
+            return                                                              # no cracked password
+        pw = line[:end]
+        if end == 16:
+            pw = pw.rstrip(' ')                                                 # padding
+        guess_number = self.crack_locator.add_crack(pw, self.candidate_counter)
+        if guess_number is not None:
+            self.add_crack(pw, guess_number)
+
+
+    def receive_candidates(self, data):
+        ''' Receives the candidates passed to JtR by the stopper and adds the passwords located in them to the analysis.
+        '''
+        for pw, guess_number in self.crack_locator.add_candidates(data):
+            self.add_crack(pw, guess_number)
+
+
+    def add_crack(self, pw, guess_number):
+        ''' Adds a cracked password to the analysis, unless it has been cracked behind [terminate_guessing] candidates.
+        '''
+        if self.terminate_guessing is None or guess_number <= self.terminate_guessing:
+            self.analysisscheme.add_crack(pw, guess_number)
+
+
+    def read_lines(self):
+        ''' Returns the lines of stdin (candidates). If the pipeline is instrumented, the lines are yielded
+        by a generator adding the time spent waiting for them to the metrics of the analysis.
+        '''
+        if self.metrics is None:
+            return sys.stdin
+        return self.timed_lines()
+
+
+    def timed_lines(self):
+        ''' Generator. Yields the lines of stdin and measures the time spent waiting for them.
+        '''
+        lines = iter(sys.stdin)
+        while True:
+            start = timeit.default_timer()
+            line = next(lines, None)
+            self.metrics.read_wait += timeit.default_timer() - start
+            if line is None:
+                return
+            yield line
+
+
+    def receive_blocks(self):
+        ''' Receives the pw candidates in blocks of [intake_block_size] bytes and processes them in batches of [analysis_interval] candidates.
+        '''
+        reader = self.get_block_reader(idle=self.idle)
+        for candidates in reader:
+            self.candidate_counter += len(candidates)
+            self.analysisscheme.process_candidates(candidates)          # analyze the received candidates
+            self.update_checkpoint()
+        if reader.limit_reached:
+            self.logger.debug("Breaking loop at candidate_number %d" % self.candidate_counter)
+            self.kill_guesser()                                         # kill the guesser when #['terminate_guesser'] of candidates has been generated
+
+
+    def receive_blocks_parallel(self):
+        ''' Receives the pw candidates in blocks of [intake_block_size] bytes, which are split (and hashed) and matched against the leak
+        by [analysis_workers] processes. The hits are processed in the order of the candidates.
+        '''
+        self.logger.debug("Matching the candidates with %d worker processes." % self.analysis_workers)
+        reader = self.get_block_reader()
+        pool = MatchPool(self.pws_multi, self.analysis_workers, self.analysisscheme.match if self.hash_format is not None else None)
+        try:
+            for count, hits, plaintexts in self.idle_results(pool.imap(reader.blocks())):
+                self.candidate_counter += count
+                if plaintexts is not None:
+                    self.analysisscheme.add_plaintexts(hits, plaintexts)    # candidates of the hashes found by the workers
+                self.process_matches(count, hits)
+                self.update_checkpoint()
+        finally:
+            pool.close()
+        if reader.limit_reached:
+            self.logger.debug("Breaking loop at candidate_number %d" % self.candidate_counter)
+            self.kill_guesser()                                         # kill the guesser when #['terminate_guesser'] of candidates has been generated
+
+
+    def idle_results(self, results):
+        ''' Generator. Yields the [results] of the MatchPool and calls idle() every IDLE_INTERVAL seconds while waiting for them
+        (the blocks are read by a thread of the pool, so the BlockReader must not call idle()).
+        '''
+        while True:
+            self.idle()
+            try:
+                result = results.next(BlockReader.IDLE_INTERVAL)
+            except multiprocessing.TimeoutError:
+                continue
+            except StopIteration:
+                return
+            yield result
+
+
+    def idle(self):
+        ''' Called while the analysis is waiting for input: writes the buffered rows of the progress files of the job (group)
+        once their flush interval has passed, so they are not held back while the guesser is stalled.
+        '''
+        self.progress_writer.poll()
+        for analysis in self.member_analyses:
+            analysis.progress_writer.poll()
+
+
+    def get_block_reader(self, idle=None):
+        ''' Returns the BlockReader of the candidate stream, reading up to [terminate_guessing] candidates in total.
+
+        :param idle: Function called while waiting for the candidates (see BlockReader).
+        '''
+        limit = self.terminate_guessing
+        if limit is not None:
+            limit -= self.candidate_counter                             # candidates analyzed before the checkpoint
+        return BlockReader(sys.stdin.fileno(), self.intake_block_size, self.analysis_interval, limit, self.metrics, self.skip_candidates or 0, idle)
+
+
+    def get_schemes(self):
+        ''' Returns the analysis schemes of the job and the other jobs of its group.
+        '''
+        if isinstance(self.analysisscheme, GroupAnalysis):
+            return self.analysisscheme.schemes
+        return [self.analysisscheme]
+
+
+    def update_checkpoint(self):
+        ''' Writes a checkpoint if [checkpoint_interval] seconds have passed since the last one.
+        Called after every processed batch, when no candidates are buffered by the analysis.
+        '''
+        if self.checkpoint is None or self.checkpoint_interval is None or timeit.default_timer() < self.next_checkpoint:
+            return
+        start = timeit.default_timer()
+        header = {'candidates': self.candidate_counter, 'pending_guesses': self.pending_guesses, 'schemes': list()}
+        arrays = list()
+        for scheme in self.get_schemes():
+            state, scheme_arrays = scheme.get_checkpoint()
+            header['schemes'].append(state)
+            arrays.extend(scheme_arrays)
+        try:
+            self.checkpoint.save(header, arrays)
+        except (IOError, OSError), e:
+            self.logger.warning("The checkpoint could not be written: <%s>" % str(e))
+        end = timeit.default_timer()
+        self.next_checkpoint = end + self.checkpoint_interval
+        self.logger.debug("Checkpoint written at candidate %s (%.2fs)." % ('{:,}'.format(self.candidate_counter), end - start))
+
+
+    def restore_checkpoint(self):
+        ''' Restores the counters of the analysis and the state of the analysis schemes from the checkpoint.
+        '''
+        header, arrays = self.checkpoint.load()
+        schemes = self.get_schemes()
+        if len(header['schemes']) != len(schemes):
+            raise ValueError("The checkpoint <%s> does not match the job group!" % self.checkpoint.path)
+        for i, (scheme, state) in enumerate(zip(schemes, header['schemes'])):
+            scheme.restore_checkpoint(state, arrays[3*i:3*i+3])
+        self.candidate_counter = header['candidates']
+        self.pending_guesses = header['pending_guesses']
+        self.logger.debug("Resuming the analysis at candidate %s (%s candidates are skipped)." \
+                          % ('{:,}'.format(self.candidate_counter), '{:,}'.format(self.skip_candidates)))
+
+
+    def process_matches(self, count, hits):
+        ''' Processes the hits of a block of [count] candidates in batches of [analysis_interval] candidates,
+        so the progress file is written exactly as by processing the candidates batch by batch.
+
+        :param count: Amount of candidates in the block.
+        :param hits: List of (position in the block, position in the LeakIndex) tuples.
+        '''
+        done = 0                                                        # candidates of the block processed so far
+        i = 0
+        while done < count:
+            n = min(count - done, self.analysis_interval - self.pending_guesses)
+            j = i
+            while j < len(hits) and hits[j][0] < done + n:
+                j += 1
+            self.analysisscheme.process_hits([(pos - done, idx) for pos, idx in hits[i:j]], n)
+            i = j
+            done += n
+            self.pending_guesses += n
+            if self.pending_guesses == self.analysis_interval:
+                self.analysisscheme.write_progress()
+                self.pending_guesses = 0
 
 
     def kill_guesser(self):
@@ -194,22 +613,21 @@ class Analysis():
             self.logger.debug("An exception occurred while killing the guesser: <%s>" % str(e))
 
 
-    def handle_close(self, last_line=None):
+    def handle_close(self):
         ''' Handles the closing the analysis module.
-
-        :param last_line: Last line to process by the analysisscheme.
         '''
-        if self.filetype == 'plaintext':
+        if self.candidate_input:
             if self.index > 0:          # analyze the remaining candidates if there are some
-                # delete the items from the previous round (already analyzed!) from the end of the array down to the fielt "self.index-1"
-                for i in range((self.analysis_interval-1), (self.index-1), -1):
-                    del self.received_candidates[i]
-                self.analysisscheme.process_candidates(self.received_candidates)
+                # the items behind "self.index-1" are from the previous round (already analyzed!)
+                self.analysisscheme.process_candidates(self.received_candidates[:self.index])
                 self.index = 0
-        elif last_line is not None:
-            self.analysisscheme.process_status_line(last_line)          # process last line of JtR output
+            elif self.pending_guesses > 0:
+                self.analysisscheme.write_progress()                    # last batch of the worker processes
+                self.pending_guesses = 0
         # generate the analysis results
         self.analysisscheme.gen_report()
+        if self.checkpoint is not None:
+            self.checkpoint.remove()                                    # the job is done, it is not resumed
 
 
 
@@ -228,10 +646,33 @@ def main():
     output_file = sys.argv[8]
     progress_file = sys.argv[9]
     plot_file = sys.argv[10]
+    leak_cache_dir = sys.argv[11]
+    leak_cache_max_size = sys.argv[12]
+    parse_processes = sys.argv[13]
+    intake_block_size = sys.argv[14]
+    analysis_workers = sys.argv[15]
+    plot_series_file = sys.argv[16]
+    progress_flush_interval = sys.argv[17]
+    progress_rows_per_decade = sys.argv[18]
+    group_members = sys.argv[19]
+    metrics_file = sys.argv[20]
+    metrics_interval = sys.argv[21]
+    checkpoint_file = sys.argv[22]
+    checkpoint_interval = sys.argv[23]
+    skip_candidates = sys.argv[24]
+    hash_format = sys.argv[25]
+    cracked_file = sys.argv[26]
+    jtr_stdout_fd = sys.argv[27]
+    jtr_candidates_fd = sys.argv[28]
+    stats_file = sys.argv[29]
 
 
     # create an Analysis instance
-    analysis = Analysis(label, pw_format, pw_file, pid, analysis_interval, terminate_guessing, jtr_pot_file, output_file, progress_file, plot_file)
+    analysis = Analysis(label, pw_format, pw_file, pid, analysis_interval, terminate_guessing, jtr_pot_file, output_file, progress_file, plot_file,
+                        leak_cache_dir, leak_cache_max_size, parse_processes, intake_block_size, analysis_workers, plot_series_file,
+                        progress_flush_interval, progress_rows_per_decade, group_members, metrics_file, metrics_interval,
+                        checkpoint_file, checkpoint_interval, skip_candidates, hash_format, cracked_file, jtr_stdout_fd, jtr_candidates_fd,
+                        stats_file)
     # run the analysis
     analysis.execute()
 
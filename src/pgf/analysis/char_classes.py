@@ -0,0 +1,81 @@
+'''
+This module provides the classifier of the characters of the cracked passwords used by the reports of the analysis schemes
+(categories of the passwords and the average amount of letters, digits and symbols).
+
+The classes are the ones of the former regular expressions:
+
+    letters: [a-zA-Z]
+    digits:  [0-9]
+    symbols: whitespace (' \\t\\n\\r\\f\\v') and %$^*@&/#!?_-+.,=:;'"<>(){}[]
+
+Every other character (e.g. '~', '|' or non-ASCII bytes) is no member of a class, passwords containing it have no category.
+'''
+
+import string
+
+LETTER = 'L'
+DIGIT = 'D'
+SYMBOL = 'S'
+NEWLINE = 'N'                                   # symbol, but '$' of the former regexes matched before a trailing newline
+OTHER = 'X'
+
+SYMBOLS = ' \t\n\r\f\v%$^*@&/#!?_-+.,=:;\'"<>(){}[]'
+
+# the categories in the order the former regexes were checked
+CATEGORIES = ('only_letters', 'only_digits', 'only_symbols', 'letters_digits', 'letters_symbols', 'digits_symbols', 'letters_digits_symbols')
+
+# (letters, digits, symbols) contained --> category (a password without characters is counted as letters only)
+CATEGORY_OF = {(False, False, False): 'only_letters',
+               (True, False, False): 'only_letters',
+               (False, True, False): 'only_digits',
+               (False, False, True): 'only_symbols',
+               (True, True, False): 'letters_digits',
+               (True, False, True): 'letters_symbols',
+               (False, True, True): 'digits_symbols',
+               (True, True, True): 'letters_digits_symbols'}
+
+
+def _build_table():
+    ''' Returns the translation table mapping every byte to its class.
+    '''
+    table = [OTHER] * 256
+    for char in string.ascii_letters:
+        table[ord(char)] = LETTER
+    for char in string.digits:
+        table[ord(char)] = DIGIT
+    for char in SYMBOLS:
+        table[ord(char)] = SYMBOL
+    table[ord('\n')] = NEWLINE
+    return ''.join(table)
+
+TABLE = _build_table()
+
+
+def to_pattern(pw):
+    ''' Returns the class pattern of [pw] (one class per character, e.g. 'LLLLDD' for 'pass12').
+    '''
+    if isinstance(pw, unicode):
+        pw = ''.join(chr(ord(char)) if char < u'\x80' else '\x80' for char in pw)     # the classes are ASCII only
+    return pw.translate(TABLE)
+
+
+def classify_pattern(pattern):
+    ''' Returns the category of a password and its amount of letters, digits and symbols from its class [pattern].
+
+    :return: (category or None, Int, Int, Int)
+    '''
+    core = pattern[:-1] if pattern.endswith(NEWLINE) else pattern
+    if OTHER in core:
+        category = None
+    else:
+        category = CATEGORY_OF[(LETTER in core, DIGIT in core, SYMBOL in core or NEWLINE in core)]
+    return category, pattern.count(LETTER), pattern.count(DIGIT), pattern.count(SYMBOL) + pattern.count(NEWLINE)
+
+
+def classify(pw):
+    ''' Returns the category of [pw] and its amount of letters, digits and symbols.
+
+    :return: (category or None, Int, Int, Int)
+    '''
+    return classify_pattern(to_pattern(pw))
+
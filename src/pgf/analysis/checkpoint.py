@@ -0,0 +1,100 @@
+'''
+This module provides the checkpoints of the analysis of long running plaintext jobs.
+A checkpoint holds the counters of the analysis and of every analysis scheme (the job and the other jobs of its group),
+the remaining x-axis values of the plot and the cracked passwords with their lookup counters and guessing numbers.
+Its size depends on the amount of cracked passwords only, not on the size of the leak.
+'''
+
+import os
+import json
+import hashlib
+from array import array
+
+
+class Checkpoint(object):
+    ''' Checkpoint file of a job: the magic line, a JSON header line and the arrays listed in the header.
+    The file is written to a temporary file first and renamed, so an interrupted write never destroys the last checkpoint.
+
+    :param path: Path of the checkpoint file.
+    '''
+
+    MAGIC = 'PGF-CHECKPOINT 1\n'                # change the version whenever the content of the checkpoints changes
+    SUFFIX = '.checkpoint'                      # file ending of the checkpoints
+
+    def __init__(self, path):
+        ''' Constructor.
+        '''
+        self.path = path
+
+
+    @classmethod
+    def get_path(cls, checkpoint_dir, jobs):
+        ''' Returns the path of the checkpoint of a job (and the other jobs of its group). The name contains a hash of the
+        configuration of the jobs, so a changed configuration is never resumed from the checkpoint of the old one.
+
+        :param checkpoint_dir: Directory of the checkpoints.
+        :param jobs: List of the job and the other jobs of its group.
+        '''
+        config = [[job.label, job.sh_content, job.training_file, job.pw_file, job.pw_format, job.max_guesses,
+                   job.terminate_guessing, job.analysis_interval, job.progress_rows_per_decade] for job in jobs]
+        key = hashlib.sha1('%s|%s' % (cls.MAGIC, json.dumps(config))).hexdigest()[:12]
+        name = ''.join([c if c.isalnum() or c in '-_.' else '_' for c in jobs[0].label])
+        return os.path.join(os.path.abspath(checkpoint_dir), '%s_%s%s' % (name, key, cls.SUFFIX))
+
+
+    def read_header(self):
+        ''' Returns the header of the checkpoint (None if there is no valid checkpoint).
+        '''
+        try:
+            with open(self.path, 'rb') as f:
+                if f.readline() != self.MAGIC:
+                    return None
+                return json.loads(f.readline())
+        except (IOError, ValueError):
+            return None
+
+
+    def save(self, header, arrays):
+        ''' Writes the checkpoint atomically.
+
+        :param header: Dict of JSON serializable values.
+        :param arrays: List of arrays written behind the header (their type codes and lengths are added to the header).
+        '''
+        header = dict(header)
+        header['arrays'] = [[a.typecode, len(a)] for a in arrays]
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        tmp_path = '%s.tmp' % self.path
+        with open(tmp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write('%s\n' % json.dumps(header))
+            for a in arrays:
+                a.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())                # the checkpoint is on disk before it replaces the last one
+        os.rename(tmp_path, self.path)
+
+
+    def load(self):
+        ''' Reads the checkpoint.
+
+        :return: (Dict, List): Header and arrays of the checkpoint.
+        '''
+        with open(self.path, 'rb') as f:
+            if f.readline() != self.MAGIC:
+                raise IOError("<%s> is not a checkpoint of this version!" % self.path)
+            header = json.loads(f.readline())
+            arrays = list()
+            for typecode, length in header['arrays']:
+                a = array(str(typecode))
+                a.fromfile(f, length)
+                arrays.append(a)
+        return header, arrays
+
+
+    def remove(self):
+        ''' Removes the checkpoint (the job is done).
+        '''
+        for path in (self.path, '%s.tmp' % self.path):
+            if os.path.isfile(path):
+                os.remove(path)
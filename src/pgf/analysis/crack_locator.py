@@ -0,0 +1,126 @@
+'''
+This module provides the locator of the passwords cracked by JtR in the candidate stream of a hash job.
+'''
+
+from collections import deque
+from itertools import izip
+
+
+class CrackLocator(object):
+    ''' Determines the guess numbers of the passwords cracked by JtR. The stopper copies every block of candidates it passes
+    to JtR to the analysis, which keeps the last blocks in a window: a cracked password reported by JtR is looked up in the
+    window, its guess number is the position of its first occurrence in the stream (JtR cracks a hash at the first
+    candidate matching it). The candidates of a block are only indexed when a cracked password is looked up in the block.
+
+    Passwords reported before their block has been received are pending until it arrives. Blocks are dropped from the window
+    if it exceeds WINDOW_SIZE bytes and JtR has processed them (status lines), so the window covers the candidates buffered
+    by the pipes and by JtR itself.
+    '''
+
+    WINDOW_SIZE = 1 << 24                       # bytes of candidates kept in the window before processed blocks are dropped
+
+    def __init__(self):
+        ''' Constructor.
+        '''
+        self.blocks = deque()                   # [amount of candidates before the block, candidates (list), index (None = not indexed yet), bytes]
+        self.size = 0                           # bytes of the candidates in the window
+        self.candidates = 0                     # amount of received candidates (exact counter of the stopper)
+        self.tail = ''                          # unterminated last candidate of the received data
+        self.pending = list()                   # (password, fallback guess number) of the cracked passwords not located yet
+
+
+    def add_candidates(self, data):
+        ''' Adds a chunk of the candidate stream to the window.
+
+        :return: List of (password, guess number) tuples of the pending passwords located in the chunk.
+        '''
+        data = self.tail + data
+        end = data.rfind('\n') + 1
+        self.tail = data[end:]
+        if end == 0:
+            return list()
+        return self.add_block(data[:end - 1].split('\n'), end)
+
+
+    def add_block(self, candidates, size):
+        ''' Appends the [candidates] ([size] bytes) to the window and looks up the pending passwords in them.
+        '''
+        block = [self.candidates, candidates, None, size]
+        self.blocks.append(block)
+        self.size += size
+        self.candidates += len(candidates)
+        located = list()
+        if self.pending:
+            pending = list()
+            for pw, fallback in self.pending:
+                guess_number = self.find_in(block, pw)
+                if guess_number is None:
+                    pending.append((pw, fallback))
+                else:
+                    located.append((pw, guess_number))
+            self.pending = pending
+        return located
+
+
+    def add_crack(self, pw, fallback):
+        ''' Looks up the cracked password [pw] in the window.
+
+        :param fallback: Guess number used if [pw] is never located (candidates processed by JtR when it was cracked).
+
+        :return: Guess number of [pw] or None if it is pending.
+        '''
+        for block in self.blocks:
+            guess_number = self.find_in(block, pw)
+            if guess_number is not None:
+                return guess_number
+        self.pending.append((pw, fallback))
+        return None
+
+
+    def find_in(self, block, pw):
+        ''' Returns the guess number of the first occurrence of [pw] in [block] (None if it does not occur).
+        '''
+        if block[2] is None:
+            candidates = block[1]
+            # reversed, so the first occurrence of a duplicate candidate is kept
+            block[2] = dict(izip(reversed(candidates), xrange(len(candidates), 0, -1)))
+        position = block[2].get(pw)
+        if position is None:
+            return None
+        return block[0] + position
+
+
+    def prune(self, processed):
+        ''' Drops the oldest blocks of the window while it exceeds WINDOW_SIZE bytes and JtR has processed them.
+
+        :param processed: Amount of candidates processed by JtR.
+        '''
+        while self.size > self.WINDOW_SIZE and len(self.blocks) > 1:
+            start, candidates, _, size = self.blocks[0]
+            if start + len(candidates) > processed:
+                break
+            self.blocks.popleft()
+            self.size -= size
+
+
+    def get_window_start(self):
+        ''' Returns the amount of candidates before the window (cracks of these candidates can no longer be located).
+        '''
+        if not self.blocks:
+            return self.candidates
+        return self.blocks[0][0]
+
+
+    def close(self):
+        ''' Adds the unterminated last candidate and gives up the pending passwords (end of the candidate stream).
+
+        :return: List of (password, guess number) tuples of the passwords located in the last candidate and the
+                 pending passwords with their fallback guess numbers.
+        '''
+        located = list()
+        if self.tail:
+            located = self.add_block([self.tail], len(self.tail))
+            self.tail = ''
+        located.extend(self.pending)
+        self.pending = list()
+        return located
@@ -6,6 +6,7 @@
 '''
 
 from pgf.exceptions.abstract_method import abstract_method
+from pgf.analysis.index.leak_index import LeakIndexBuilder
 
 class InputParser(object):
     ''' Abstract class used for different kinds of input files.
@@ -26,3 +27,10 @@ class InputParser(object):
         such as plain text passwords or hashvalues, usernames, hash algorithms, salts and so on.
         '''
         abstract_method(self)
+
+    def create_builder(self, batch_size=None):
+        ''' Returns the LeakIndexBuilder the lines of the password file are parsed into by 'parse_lines(lines, builder)'
+        (the occurrences of the lines of a key are added). Used by the ParallelParser as well, which requires the parser
+        to implement 'parse_lines'. Parsers without 'parse_lines' are always run in a single process.
+        '''
+        return LeakIndexBuilder(batch_size=batch_size)
@@ -5,11 +5,15 @@
 
 from pgf.log.logger import Logger
 from pgf.analysis.fileparser.abstract_parser import InputParser
+from binascii import unhexlify
+from pgf.analysis.index.digest_index import DigestIndex
 
 class HashPure(InputParser):
     ''' Parser for files containing one hash value per line.
     '''
 
+    BLOCK_SIZE = 1 << 24                    # bytes of the file converted into raw digests at once (see parse_digest_file())
+
     def __init__(self, pw_file):
         ''' Generator.
         '''
@@ -21,7 +25,7 @@ class HashPure(InputParser):
         
         self.hash_counter = 0                   # counter for the amount of passwords in the leak
         self.error_counter = 0                  # counter for the errors occuring during the file-parsing
-        self.hashes_multi = {}                  # Dict to store the hashes from the file including an occurence-counter for each hash
+        self.hashes_multi = None                # LeakIndex to store the hashes from the file including an occurence-counter for each hash
 
 
     def get_filetype(self):
@@ -35,7 +39,7 @@ class HashPure(InputParser):
 
         :requires: One password per line in the file.
 
-        :return: (Dict{'occ', 'lookups'}, Int, Int): Dict containing the parsed hashes and a dict of their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
+        :return: (LeakIndex, Int, Int): Index containing the parsed hashes and their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
         The integers are a password counter and a parsing-error counter.
         '''
         self.logger.debug("Start parsing the password file ...")
@@ -45,16 +49,92 @@ class HashPure(InputParser):
             self.logger.debug("The pw file could not be opened!\nAnalysis closed!")
             exit(-1)            #TODO: check if this is correct/smartest solution?!
 
-        for hashvalue in f:
+        builder = self.create_builder()                   # counts the hashes directly into the compact LeakIndex
+        self.hash_counter, self.error_counter = self.parse_lines(f, builder)
+        f.close()                                         # close the file
+        self.hashes_multi = builder.build()
+        self.logger.debug("Parsing done!")
+        return self.hashes_multi, self.hash_counter, self.error_counter
+
+
+    def parse_digest_file(self):
+        ''' Parses a file of hex encoded hashes of the same width (e.g. raw MD5 hashes) into a DigestIndex of their raw
+        digests. The file is converted block by block, each block by a single unhexlify() call.
+
+        :return: (DigestIndex, Int, Int) like parse_pw_file() or None if the lines are no hex encoded hashes of the same
+                 width (e.g. prefixed or salted hashes), then the file is parsed by parse_pw_file().
+        '''
+        with open(self.pw_file, 'rb') as f:
+            width = len(f.readline().rstrip('\r\n'))
+            if width < 8 or width % 2 != 0:
+                return None
+            f.seek(0)
+            self.hash_counter = 0
+            self.error_counter = 0
             try:
-                self.hash_counter += 1                    # increment counter
+                self.hashes_multi = DigestIndex.from_digests(self.read_digests(f, width), width / 2)
+            except ValueError:
+                return None
+        self.logger.debug("Parsed %d hashes as raw digests of %d bytes." % (self.hash_counter, width / 2))
+        return self.hashes_multi, self.hash_counter, self.error_counter
+
+
+    def read_digests(self, f, width):
+        ''' Yields the raw digests of the lines of the file [f] block by block (concatenated).
+
+        :param width: Amount of hex digits per line.
+        '''
+        tail = ''
+        while True:
+            data = f.read(self.BLOCK_SIZE)
+            if not data:
+                break
+            data = tail + data
+            end = data.rfind('\n') + 1
+            tail = data[end:]
+            if end > 0:
+                yield self.unhexlify_lines(data[:end], width)
+        if tail:
+            yield self.unhexlify_lines(tail + '\n', width)         # last line without a newline
+
+
+    def unhexlify_lines(self, block, width):
+        ''' Converts a [block] of complete lines of [width] hex digits into their raw digests.
+
+        :raises ValueError: If a line is no hex encoded hash of [width] digits.
+        '''
+        if '\r' in block:
+            block = block.replace('\r\n', '\n')
+        count = len(block) / (width + 1)
+        if len(block) != count * (width + 1) or block[width::width+1] != '\n' * count:
+            raise ValueError("Lines of different widths!")
+        try:
+            digests = unhexlify(block.replace('\n', ''))
+        except TypeError:
+            raise ValueError("No hex encoded hashes!")
+        self.hash_counter += count
+        return digests
+
+
+    def parse_lines(self, lines, builder):
+        ''' Parses the hash [lines] (the whole file or a chunk of it) into the LeakIndexBuilder [builder].
+
+        :return: (Int, Int): Amount of parsed lines and parsing errors.
+        '''
+        hash_counter = 0
+        error_counter = 0
+        counts = builder.counts                           # occurrences of the hashes of the current batch
+        batch_size = builder.batch_size
+        for hashvalue in lines:
+            try:
+                hash_counter += 1                         # increment counter
                 hashvalue = hashvalue[:len(hashvalue)-1]
-                if hashvalue not in self.hashes_multi:
-                    self.hashes_multi[hashvalue] = {'occ':1, 'lookups':0}        # add a dict to the dict-entry [pw] with init values 1 and 0
+                if hashvalue not in counts:
+                    counts[hashvalue] = 1                 # first occurrence of the hash (in the batch)
+                    if len(counts) >= batch_size:
+                        builder.flush()                   # merge the batch into the index
                 else:
-                    self.hashes_multi[hashvalue]['occ'] += 1                     # increment occurence counter for the current password
+                    counts[hashvalue] += 1                # increment occurence counter for the current hash
             except:
-                self.error_counter += 1                   # silently ignore decode-errors but count it
-        f.close()                                         # close the file
-        self.logger.debug("Parsing done!")
-        return self.hashes_multi, self.hash_counter, self.error_counter
+                error_counter += 1                        # silently ignore decode-errors but count it
+        return hash_counter, error_counter
@@ -0,0 +1,149 @@
+'''
+This module provides the parser of hash leaks with salts and/or usernames.
+'''
+
+import string
+from pgf.log.logger import Logger
+from pgf.analysis.fileparser.abstract_parser import InputParser
+
+HEX_DIGITS = frozenset(string.hexdigits)
+CRYPT_CHARS = frozenset('./' + string.digits + string.ascii_letters)     # base64 alphabet of crypt(3)
+HEX_LENGTHS = (16, 128)                                                 # lengths of hex encoded digests (e.g. mysql323 to sha512)
+CRYPT_LENGTHS = (13, 128)                                               # lengths of crypt outputs (DES to sha512crypt and longer)
+DES_LENGTH = 13                                                         # traditional DES crypt, the only crypt output without '$'
+
+
+def is_hash(hashvalue, crypt=False):
+    ''' Checks whether [hashvalue] looks like a digest: hex encoded with an even length of HEX_LENGTHS characters,
+    or in the base64 alphabet of crypt(3) with a length of CRYPT_LENGTHS characters if it is part of a crypt format
+    ([crypt]) or a traditional DES crypt hash.
+    '''
+    if HEX_DIGITS.issuperset(hashvalue):
+        return HEX_LENGTHS[0] <= len(hashvalue) <= HEX_LENGTHS[1] and len(hashvalue) % 2 == 0
+    if not CRYPT_CHARS.issuperset(hashvalue):
+        return False
+    if crypt:
+        return CRYPT_LENGTHS[0] <= len(hashvalue) <= CRYPT_LENGTHS[1]
+    return len(hashvalue) == DES_LENGTH
+
+
+def split_hash(line):
+    ''' Splits a line of a salted hash leak into the salt and the hash. Supported lines (the username is optional):
+
+        user:salt:hash                  salt and hash given separately (e.g. for md5($p.$s))
+        user:$dynamic_1$hash$salt       salted dynamic formats of JtR
+        user:$6$salt$hash[:...]         crypt formats (md5crypt, sha256crypt, sha512crypt, ...), e.g. lines of /etc/shadow
+        user:hash                       unsalted hashes with usernames (the salt is '')
+
+    The hash has to look like a digest (see is_hash()), so headers and other junk lines are counted as parsing errors.
+    Hex encoded hashes are converted to lower case.
+
+    :return: (salt, hash) tuple.
+
+    :raises ValueError: If the line holds no hash.
+    '''
+    fields = line.split(':')
+    if len(fields) == 1:
+        salt, ciphertext = None, fields[0]
+    elif len(fields) == 2 or fields[1].startswith('$'):
+        salt, ciphertext = None, fields[1]                          # 'user:hash' or a line of a passwd/shadow file
+    else:
+        salt, ciphertext = ':'.join(fields[1:-1]), fields[-1]       # 'user:salt:hash'
+    crypt = False
+    if salt is not None:
+        hashvalue = ciphertext
+    elif ciphertext.startswith('$dynamic_'):
+        _, _, hashvalue, salt = ciphertext.split('$', 3)            # '$dynamic_1$hash$salt'
+    elif ciphertext.startswith('$') and ciphertext.count('$') >= 3:
+        salt, hashvalue = ciphertext.rsplit('$', 1)                 # '$6$salt$hash', the salt keeps the id (and rounds) of the format
+        crypt = True
+    else:
+        salt, hashvalue = '', ciphertext
+    if not is_hash(hashvalue, crypt):
+        raise ValueError("No hash in line <%s>!" % line)
+    if HEX_DIGITS.issuperset(hashvalue):
+        hashvalue = hashvalue.lower()
+    return salt, hashvalue
+
+
+def get_salt(key):
+    ''' Returns the salt of a key of the LeakIndex of a salted leak ('[salt]$[hash]').
+    '''
+    return key[:key.rfind('$')]
+
+
+class HashSalted(InputParser):
+    ''' Parser for files containing one salted hash (or one hash with a username) per line, see split_hash().
+    Every line is an account. The hashes are stored as '[salt]$[hash]' keys (the crypt notation), so the occurrences
+    of a key are the amount of accounts sharing the salt and the hash, and the hashes of one salt are grouped by
+    group_by_salt(). A candidate has to be hashed only once per salt (not once per account) to evaluate it.
+    '''
+
+    def __init__(self, pw_file):
+        ''' Generator.
+        '''
+        # Initiate logger
+        self.logger = Logger()
+        self.logger.basicConfig('DEBUG')        # set logger level to DEBUG
+
+        self.pw_file = pw_file
+
+        self.hash_counter = 0                   # counter for the amount of accounts in the leak
+        self.error_counter = 0                  # counter for the errors occuring during the file-parsing
+        self.hashes_multi = None                # LeakIndex to store the salted hashes from the file including an occurence-counter for each hash
+
+
+    def get_filetype(self):
+        ''' Return the input type indicator to run the according analysis module and the execution module correctly.
+        '''
+        return 'hashvalues'
+
+
+    def parse_pw_file(self):
+        ''' Parses the salted hashes from the password leak and analyzes the occurences of the hashes.
+
+        :requires: One account per line in the file.
+
+        :return: (LeakIndex, Int, Int): Index containing the parsed '[salt]$[hash]' keys and their occurences in the leak ('occ').
+        The integers are an account counter and a parsing-error counter.
+        '''
+        self.logger.debug("Start parsing the password file ...")
+        builder = self.create_builder()                   # counts the accounts per salted hash directly into the compact LeakIndex
+        with open(self.pw_file, 'rU') as f:
+            self.hash_counter, self.error_counter = self.parse_lines(f, builder)
+        self.hashes_multi = builder.build()
+        salts = self.group_by_salt(self.hashes_multi)
+        self.logger.debug("Parsed %d accounts with %d unique hashes and %d salts." % (self.hash_counter, len(self.hashes_multi), len(salts)))
+        return self.hashes_multi, self.hash_counter, self.error_counter
+
+
+    def parse_lines(self, lines, builder):
+        ''' Parses the [lines] (the whole file or a chunk of it) into the LeakIndexBuilder [builder] ('[salt]$[hash]' keys).
+
+        :return: (Int, Int): Amount of parsed lines and parsing errors.
+        '''
+        hash_counter = 0
+        error_counter = 0
+        add = builder.add
+        for line in lines:
+            hash_counter += 1
+            try:
+                key = '%s$%s' % split_hash(line.rstrip('\n'))
+            except ValueError:
+                error_counter += 1                        # count lines without a hash
+                continue
+            add(key)
+        return hash_counter, error_counter
+
+
+    @staticmethod
+    def group_by_salt(index):
+        ''' Groups the keys of the LeakIndex of a salted leak by their salts.
+
+        :return: Dict {salt: amount of accounts}, the work of evaluating a candidate is one hash per salt.
+        '''
+        salts = dict()
+        for key, occ in zip(index.iterkeys(), index.occ):
+            salt = get_salt(key)
+            salts[salt] = salts.get(salt, 0) + occ
+        return salts
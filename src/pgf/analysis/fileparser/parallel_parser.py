@@ -0,0 +1,113 @@
+'''
+This module provides the parallel parsing of password files. The file is split into chunks at newline-aligned
+byte offsets and each chunk is parsed by a worker process into the runs of a LeakIndexBuilder, i.e. its keys are
+partitioned into buckets by their hash values. Afterwards every worker merges the runs of some buckets (of all chunks,
+in the order of the chunks), so the parent process only concatenates the distinct keys of the buckets into the index.
+'''
+
+import os
+import multiprocessing
+from cStringIO import StringIO
+from pgf.analysis.index.leak_index import LeakIndex, merge_runs
+
+
+def _parse_chunk(task):
+    ''' Parses a chunk of the password file in a worker process.
+
+    :param task: Tuple (parser class, path of the password file, start offset, end offset).
+
+    :return: (List, Int, Int): Runs of every bucket (see LeakIndexBuilder.get_runs()), amount of parsed lines and parsing errors.
+    '''
+    parser_class, pw_file, start, end = task
+    parser = parser_class(pw_file)
+    with open(pw_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    data = data.replace('\r\n', '\n').replace('\r', '\n')      # universal newlines, as the files are opened with 'rU' for serial parsing
+    builder = parser.create_builder()
+    pw_counter, error_counter = parser.parse_lines(StringIO(data), builder)
+    return builder.get_runs(), pw_counter, error_counter
+
+
+def _merge_bucket(task):
+    ''' Merges the runs of one bucket of all chunks in a worker process.
+
+    :param task: Tuple (list of runs in the order of the chunks, True if later occurrences replace earlier ones).
+
+    :return: Piece of the distinct keys of the bucket (see LeakIndex.from_pieces()).
+    '''
+    runs, replace = task
+    return merge_runs(runs, replace)
+
+
+class ParallelParser(object):
+    ''' Parses a password file with several processes. Requires an inputhandler implementing 'parse_lines' and 'create_builder'.
+
+    :param inputhandler: Parser of the password file.
+    :param processes: Amount of worker processes (None = amount of CPU cores).
+    :param logger: Logger instance.
+    '''
+
+    CHUNKS_PER_PROCESS = 4                  # more chunks than processes to balance the load
+    MIN_FILE_SIZE = 16 * 1024 * 1024        # smaller files are parsed faster in a single process
+
+    def __init__(self, inputhandler, processes, logger):
+        ''' Constructor.
+        '''
+        self.inputhandler = inputhandler
+        self.processes = processes or multiprocessing.cpu_count()
+        self.logger = logger
+
+
+    def split_file(self, pw_file, chunks):
+        ''' Splits the file into [chunks] byte ranges which all end directly behind a newline character
+        (except for the last one, if the file does not end with a newline).
+
+        :return: List of (start, end) tuples.
+        '''
+        size = os.path.getsize(pw_file)
+        ranges = list()
+        start = 0
+        with open(pw_file, 'rb') as f:
+            for i in range(1, chunks):
+                target = max(start, size * i / chunks)
+                f.seek(target)
+                f.readline()                            # move to the end of the line crossing the target offset
+                end = min(f.tell(), size)
+                if end > start:
+                    ranges.append((start, end))
+                    start = end
+        if size > start:
+            ranges.append((start, size))
+        return ranges
+
+
+    def parse(self, pw_file):
+        ''' Parses the password file.
+
+        :return: (LeakIndex, Int, Int): Index of the passwords/hashes, password counter and parsing-error counter.
+        '''
+        ranges = self.split_file(pw_file, self.processes * self.CHUNKS_PER_PROCESS)
+        self.logger.debug("Parsing the password file with %d processes in %d chunks ..." % (self.processes, len(ranges)))
+        parser_class = self.inputhandler.__class__
+        tasks = [(parser_class, pw_file, start, end) for start, end in ranges]
+        replace = self.inputhandler.create_builder().replace
+        buckets = None                                  # runs of every bucket, in the order of the chunks
+        pw_counter = 0
+        error_counter = 0
+        pool = multiprocessing.Pool(self.processes)     # forked after the parser was loaded, so all processes hash alike
+        try:
+            for runs, lines, errors in pool.imap(_parse_chunk, tasks):      # results are returned in the order of the chunks
+                if buckets is None:
+                    buckets = runs
+                else:
+                    for bucket_runs, chunk_runs in zip(buckets, runs):
+                        bucket_runs.extend(chunk_runs)
+                pw_counter += lines
+                error_counter += errors
+            tasks = [(bucket_runs, replace) for bucket_runs in buckets or []]
+            buckets = None                              # release the runs, the tasks hold the only references
+            pieces = pool.map(_merge_bucket, tasks)
+        finally:
+            pool.terminate()
+        return LeakIndex.from_pieces(pieces), pw_counter, error_counter
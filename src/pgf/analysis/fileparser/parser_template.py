@@ -33,7 +33,7 @@ class Template(InputParser):
         self.pw_file = pw_file                  # path of the input file
         self.pw_counter = 0                     # counter for the amount of passwords in the leak
         self.error_counter = 0                  # counter for the errors occuring during the file-parsing
-        self.pws_multi = {}                     # Dict to store the passwords from the file including an occurence-counter for each password
+        self.pws_multi = None                   # LeakIndex to store the passwords from the file including an occurence-counter for each password
 
 
     def get_filetype(self):
@@ -51,7 +51,7 @@ class Template(InputParser):
 
         :requires: One password per line in the file.
         
-        :return: (Dict{'occ', 'lookups'}, Int, Int): Dict containing the parsed passwords and a dict of their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser. The integers are a password counter and a parsing-error counter.
+        :return: (LeakIndex, Int, Int): Index containing the parsed passwords and their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser. The integers are a password counter and a parsing-error counter.
         '''
 
         self.logger.debug("Start parsing the password file ...")
@@ -61,6 +61,7 @@ class Template(InputParser):
             self.logger.debug("The pw file could not be opened!\nAnalysis closed!")
             exit(-1)
 
+        builder = self.create_builder()                 # counts the passwords directly into the compact LeakIndex
         for line in f:
             try:
                 self.pw_counter += 1                    # increment counter
@@ -86,30 +87,26 @@ class Template(InputParser):
                 # The following part remains the same if the occurences (as in withcount format) is not included in the line itself.
                 # For withcount formats, also parse the counter and apply the following change below:
                 '''
-                if pw not in self.pws_multi:
-                    self.pws_multi[pw] = {'occ':1, 'lookups':0}         # add a dict to the dict-entry [pw] with init values 1 and 0
-                else:
-                    self.pws_multi[pw]['occ'] += 1                      # increment occurence counter for the current password
+                builder.add(pw)                                         # add an occurrence of the password
                 '''
                 # --> is to be replaced with:
                 '''
                 # counter = [PARSE THE COUNTER FROM LINE HERE]
-                self.pws_multi[pw] = {'occ':counter, 'lookups':0}       # add a dict to the dict-entry [pw] with init values 1 and 0
+                builder.add(pw, counter)                                # set the occurrence counter parsed from the line
                 '''
+                # and the builder has to be created with 'LeakIndexBuilder(replace=True)' (see PlaintextWithcount.create_builder()).
                 # Note that 'pw' would be the hash value for hashed passwords.
                 # Explanation:
-                # Each password/hash (key of the dictionary) has a second dictionaly as value, storing an 
-                # occurence counter (accessable via: self.pws_multi['MyPassword']['occ']) and a 
-                # lookup counter (accessable via: self.pws_multi['MyPassword']['lookups']).
+                # The builder counts the passwords directly into a LeakIndex. The index stores every password/hash once
+                # and provides an occurence counter (accessable via: self.pws_multi['MyPassword']['occ']) and a 
+                # lookup counter (accessable via: self.pws_multi['MyPassword']['lookups']) for each of them.
                 # The latter is used to identify multiple guesses made by the guesser in the analysis module.
                 # The occurrence counter is needed to check how many passwords a
 
-                if pw not in self.pws_multi:
-                    self.pws_multi[pw] = {'occ':1, 'lookups':0}         # add a dict to the dict-entry [pw] with init values 1 and 0
-                else:
-                    self.pws_multi[pw]['occ'] += 1                      # increment occurence counter for the current password
+                builder.add(pw)                                         # add an occurrence of the password
             except:
                 self.error_counter += 1                 # silently ignore decode-errors but count it
         f.close()                                       # close the file
+        self.pws_multi = builder.build()
         self.logger.debug("Parsing done!")
         return self.pws_multi, self.pw_counter, self.error_counter
@@ -21,7 +21,7 @@ class PlaintextPure(InputParser):
         
         self.pw_counter = 0             # counter for the amount of passwords in the leak
         self.error_counter = 0           # counter for the errors occuring during the file-parsing
-        self.pws_multi = {}              # Dict to store the passwords from the file including an occurence-counter for each password
+        self.pws_multi = None            # LeakIndex to store the passwords from the file including an occurence-counter for each password
 
 
     def get_filetype(self):
@@ -35,7 +35,7 @@ class PlaintextPure(InputParser):
 
         :requires: One password per line in the file.
 
-        :return: (Dict{'occ', 'lookups'}, Int, Int): Dict containing the parsed passwords and a dict of their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
+        :return: (LeakIndex, Int, Int): Index containing the parsed passwords and their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
         The integers are a password counter and a parsing-error counter.
         '''
         self.logger.debug("Start parsing the password file ...")
@@ -45,16 +45,33 @@ class PlaintextPure(InputParser):
             self.logger.debug("The pw file could not be opened!\nAnalysis closed!")
             exit(-1)            #TODO: check if this is correct/smartest solution?!
 
-        for pw in f:
+        builder = self.create_builder()                 # counts the passwords directly into the compact LeakIndex
+        self.pw_counter, self.error_counter = self.parse_lines(f, builder)
+        f.close()                                       # close the file
+        self.pws_multi = builder.build()
+        self.logger.debug("Parsing done!")
+        return self.pws_multi, self.pw_counter, self.error_counter
+
+
+    def parse_lines(self, lines, builder):
+        ''' Parses the password [lines] (the whole file or a chunk of it) into the LeakIndexBuilder [builder].
+
+        :return: (Int, Int): Amount of parsed lines and parsing errors.
+        '''
+        pw_counter = 0
+        error_counter = 0
+        counts = builder.counts                         # occurrences of the passwords of the current batch
+        batch_size = builder.batch_size
+        for pw in lines:
             try:
-                self.pw_counter += 1                    # increment counter
+                pw_counter += 1                         # increment counter
                 pw = pw[:len(pw)-1]
-                if pw not in self.pws_multi:
-                    self.pws_multi[pw] = {'occ':1, 'lookups':0}         # add a dict to the dict-entry [pw] with init values 1 and 0
+                if pw not in counts:
+                    counts[pw] = 1                      # first occurrence of the password (in the batch)
+                    if len(counts) >= batch_size:
+                        builder.flush()                 # merge the batch into the index
                 else:
-                    self.pws_multi[pw]['occ'] += 1                      # increment occurence counter for the current password
+                    counts[pw] += 1                     # increment occurence counter for the current password
             except:
-                self.error_counter += 1                 # silently ignore decode-errors but count it
-        f.close()                                       # close the file
-        self.logger.debug("Parsing done!")
-        return self.pws_multi, self.pw_counter, self.error_counter
+                error_counter += 1                      # silently ignore decode-errors but count it
+        return pw_counter, error_counter
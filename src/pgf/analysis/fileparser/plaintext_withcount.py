@@ -6,6 +6,7 @@
 import re
 from pgf.log.logger import Logger
 from pgf.analysis.fileparser.abstract_parser import InputParser
+from pgf.analysis.index.leak_index import LeakIndexBuilder
 
 class PlaintextWithcount(InputParser):
     ''' Parser for files containing a password counter and the according plaintext password per line.
@@ -24,7 +25,7 @@ class PlaintextWithcount(InputParser):
         
         self.pw_counter = 0              # counter for the amount of passwords in the leak
         self.error_counter = 0           # counter for the errors occuring during the file-parsing
-        self.pws_multi = {}              # Dict to store the passwords from the file including an occurence-counter for each password
+        self.pws_multi = None            # LeakIndex to store the passwords from the file including an occurence-counter for each password
 
 
     def get_filetype(self):
@@ -38,27 +39,48 @@ class PlaintextWithcount(InputParser):
 
         :requires: One password per line in the file.
 
-        :return: (Dict{'occ', 'lookups'}, Int, Int): Dict containing the parsed passwords and a dict of their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
+        :return: (LeakIndex, Int, Int): Index containing the parsed passwords and their occurences in the leak ('occ') as well as a counter for the amount of lookups ('lookups') which is used to count the amout of duplicate candidates that might be generated by a guesser.
         The integers are a password counter and a parsing-error counter.
         '''
         self.logger.debug("Start parsing the password file ...")
 
-        counter_re = re.compile('^\s*[0-9]*')
-        pw_re = re.compile('^\s*[0-9]*\s')
-
         f = open(self.pw_file, 'rU')                    # open the password file
         if f is None:
             self.logger.debug("The pw file could not be opened!\nAnalysis closed!")
             exit(-1)            #TODO: check if this is correct/smartest solution?!
 
-        for line in f:
+        builder = self.create_builder()                 # counts the passwords directly into the compact LeakIndex
+        self.pw_counter, self.error_counter = self.parse_lines(f, builder)
+        f.close()                                       # close the file
+        self.pws_multi = builder.build()
+        self.logger.debug("Parsing done!")
+        return self.pws_multi, self.pw_counter, self.error_counter
+
+
+    def create_builder(self, batch_size=None):
+        ''' Returns the LeakIndexBuilder of the passwords: the counter of a password occurring in several lines is set
+        by the last of these lines.
+        '''
+        return LeakIndexBuilder(replace=True, batch_size=batch_size)
+
+
+    def parse_lines(self, lines, builder):
+        ''' Parses the [lines] (the whole file or a chunk of it) into the LeakIndexBuilder [builder].
+        The counter of a password occurring in several lines is set by the last of these lines.
+
+        :return: (Int, Int): Amount of parsed lines and parsing errors.
+        '''
+        counter_re = re.compile('^\s*[0-9]*')
+        pw_re = re.compile('^\s*[0-9]*\s')
+        pw_counter = 0
+        error_counter = 0
+        add = builder.add
+        for line in lines:
             try:
-                self.pw_counter += 1                    # increment counter
+                pw_counter += 1                         # increment counter
                 pw = line.replace(pw_re.findall(line)[0], '')[:-1]
                 occ = int(counter_re.findall(line)[0].replace(' ', ''))
-                self.pws_multi[pw] = {'occ':occ, 'lookups':0}         # add a dict to the dict-entry [pw] with init values 1 and 0
+                add(pw, occ)                            # set the occurrence counter parsed from the line
             except:
-                self.error_counter += 1                 # silently ignore decode-errors but count it
-        f.close()                                       # close the file
-        self.logger.debug("Parsing done!")
-        return self.pws_multi, self.pw_counter, self.error_counter
+                error_counter += 1                      # silently ignore decode-errors but count it
+        return pw_counter, error_counter
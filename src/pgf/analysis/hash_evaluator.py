@@ -0,0 +1,175 @@
+'''
+This module provides the built-in evaluator of hash jobs for unsalted fast hashes. Instead of piping the candidates
+through JtR, the analysis hashes them itself and matches the digests against an index of the raw digests of the leak,
+so hash jobs are evaluated candidate by candidate like plaintext jobs (see DigestAnalysis).
+
+The formats are named like the '--format' values of JtR ('jtr_input_format'):
+
+    raw-md5, raw-sha1, raw-sha256, nt (MD4 of the UTF-16LE encoded candidate, candidates are read as ISO-8859-1 like JtR does)
+
+Salted leaks ('hash_salted', see HashSalted) are evaluated salt by salt, each candidate is hashed once per salt:
+
+    dynamic_1 (md5($p.$s)), dynamic_4 (md5($s.$p)), md5crypt, sha256crypt, sha512crypt (crypt() of the system)
+    and the unsalted formats above (hashes with usernames)
+'''
+
+import hashlib
+import struct
+from binascii import hexlify, unhexlify
+from pgf.analysis.index.digest_index import DigestIndex
+try:
+    import crypt
+except ImportError:
+    crypt = None                                # no crypt() on this platform --> crypt formats are evaluated by JtR
+
+
+def _md4(data):
+    ''' MD4 (RFC 1320) for Python builds whose OpenSSL does not provide it (OpenSSL 3 without the legacy provider).
+    '''
+    def f(x, y, z): return (x & y) | (~x & z)
+    def g(x, y, z): return (x & y) | (x & z) | (y & z)
+    def h(x, y, z): return x ^ y ^ z
+    def rotl(x, n): return ((x << n) | (x >> (32 - n))) & 0xffffffff
+    length = len(data)
+    data += '\x80' + '\x00' * ((55 - length) % 64) + struct.pack('<Q', (length * 8) & 0xffffffffffffffff)
+    state = [0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476]
+    for offset in xrange(0, len(data), 64):
+        x = struct.unpack('<16I', data[offset:offset+64])
+        a, b, c, d = state
+        for i in (0, 4, 8, 12):
+            a = rotl((a + f(b, c, d) + x[i]) & 0xffffffff, 3)
+            d = rotl((d + f(a, b, c) + x[i+1]) & 0xffffffff, 7)
+            c = rotl((c + f(d, a, b) + x[i+2]) & 0xffffffff, 11)
+            b = rotl((b + f(c, d, a) + x[i+3]) & 0xffffffff, 19)
+        for i in (0, 1, 2, 3):
+            a = rotl((a + g(b, c, d) + x[i] + 0x5a827999) & 0xffffffff, 3)
+            d = rotl((d + g(a, b, c) + x[i+4] + 0x5a827999) & 0xffffffff, 5)
+            c = rotl((c + g(d, a, b) + x[i+8] + 0x5a827999) & 0xffffffff, 9)
+            b = rotl((b + g(c, d, a) + x[i+12] + 0x5a827999) & 0xffffffff, 13)
+        for i in (0, 2, 1, 3):
+            a = rotl((a + h(b, c, d) + x[i] + 0x6ed9eba1) & 0xffffffff, 3)
+            d = rotl((d + h(a, b, c) + x[i+8] + 0x6ed9eba1) & 0xffffffff, 9)
+            c = rotl((c + h(d, a, b) + x[i+4] + 0x6ed9eba1) & 0xffffffff, 11)
+            b = rotl((b + h(c, d, a) + x[i+12] + 0x6ed9eba1) & 0xffffffff, 15)
+        state = [(s + v) & 0xffffffff for s, v in zip(state, (a, b, c, d))]
+    return struct.pack('<4I', *state)
+
+
+def _get_md4():
+    ''' Returns the fastest available MD4 function (str --> raw digest).
+    '''
+    try:
+        hashlib.new('md4', '')
+        return lambda data: hashlib.new('md4', data).digest()
+    except ValueError:
+        return _md4
+
+
+def _nt(md4):
+    ''' Returns the NT hash function using [md4].
+    '''
+    return lambda candidates: [md4(candidate.decode('latin-1').encode('utf-16-le')) for candidate in candidates]
+
+
+# format --> (digest size, prefixes of the hashes in the leak, function hashing a list of candidates into their raw digests)
+FORMATS = {'raw-md5': (16, ['$dynamic_0$'], lambda candidates, md5=hashlib.md5: [md5(c).digest() for c in candidates]),
+           'raw-sha1': (20, ['$dynamic_26$'], lambda candidates, sha1=hashlib.sha1: [sha1(c).digest() for c in candidates]),
+           'raw-sha256': (32, ['$SHA256$'], lambda candidates, sha256=hashlib.sha256: [sha256(c).digest() for c in candidates]),
+           'nt': (16, ['$NT$'], _nt(_get_md4()))}
+
+
+def _crypt(candidates, salt):
+    ''' Hashes the candidates with crypt() and the [salt] setting (e.g. '$6$salt'), which returns the '[salt]$[hash]' keys.
+    '''
+    keys = list()
+    for candidate in candidates:
+        try:
+            keys.append(crypt.crypt(candidate, salt) or '')
+        except TypeError:
+            keys.append('')                     # candidates with null bytes
+    return keys
+
+
+# format --> function hashing a list of candidates with a salt into their '[salt]$[hash]' keys (see HashSalted)
+SALTED_FORMATS = {'dynamic_1': lambda candidates, salt, md5=hashlib.md5: ['%s$%s' % (salt, md5(c + salt).hexdigest()) for c in candidates],
+                  'dynamic_4': lambda candidates, salt, md5=hashlib.md5: ['%s$%s' % (salt, md5(salt + c).hexdigest()) for c in candidates]}
+if crypt is not None:
+    SALTED_FORMATS.update(dict.fromkeys(['md5crypt', 'sha256crypt', 'sha512crypt'], _crypt))
+
+
+def is_supported(hash_format, salted=False):
+    ''' Returns True if the built-in evaluator supports the JtR format [hash_format].
+
+    :param salted: True for salted leaks ('hash_salted'), which support the salted and the unsalted formats.
+    '''
+    if hash_format is None:
+        return False
+    hash_format = str(hash_format).lower()
+    return hash_format in FORMATS or (salted and hash_format in SALTED_FORMATS)
+
+
+def get_digest(hash_format):
+    ''' Returns the function hashing a list of candidates into the list of their raw digests.
+    '''
+    return FORMATS[hash_format.lower()][2]
+
+
+def get_salted_hash(hash_format):
+    ''' Returns the function hashing a list of candidates with a salt into the list of their '[salt]$[hash]' keys.
+    '''
+    hash_format = hash_format.lower()
+    if hash_format in SALTED_FORMATS:
+        return SALTED_FORMATS[hash_format]
+    digest = get_digest(hash_format)
+    return lambda candidates, salt: ['%s$%s' % (salt, hexlify(d)) for d in digest(candidates)]
+
+
+def get_matcher(hash_format, index, salts=None):
+    ''' Returns the function matching a list of candidates against the [index] of a hash leak.
+
+    :param salts: List of the salts of a salted leak (see HashSalted.group_by_salt()), None for a DigestIndex.
+
+    :return: Function returning the list of (position among the candidates, position in the index) tuples of the hits,
+             in the order of the candidates.
+    '''
+    if salts is None:
+        digest = get_digest(hash_format)
+        return lambda candidates: index.match(digest(candidates))
+    salted_hash = get_salted_hash(hash_format)
+    def match(candidates):
+        hits = list()
+        for salt in salts:                      # each candidate is hashed once per salt
+            hits.extend(index.match(salted_hash(candidates, salt)))
+        hits.sort()
+        return hits
+    return match
+
+
+def to_digest_index(index, hash_format):
+    ''' Converts the LeakIndex of the hex encoded hashes of a leak (see HashPure) into a DigestIndex of their raw digests.
+    The hex encoding is case-insensitive and the prefixes used by JtR (e.g. '$NT$') are removed.
+    A DigestIndex parsed by HashPure is used as it is if its digests have the size of the format.
+
+    :return: (DigestIndex, Int): Digest index and amount of hashes that are no valid hashes of the format (parsing errors).
+    '''
+    size, prefixes, _ = FORMATS[hash_format.lower()]
+    if isinstance(index, DigestIndex):
+        if index.size == size:
+            return index, 0
+        return DigestIndex(size), sum(index.occ)                # all hashes have a different width
+    counts = dict()
+    errors = 0
+    for key, occ in zip(index.iterkeys(), index.occ):
+        for prefix in prefixes:
+            if key.startswith(prefix):
+                key = key[len(prefix):]
+        key = key.strip()
+        try:
+            digest = unhexlify(key)
+        except TypeError:
+            digest = None                       # odd length or no hex digits
+        if digest is None or len(digest) != size:
+            errors += occ
+            continue
+        counts[digest] = counts.get(digest, 0) + occ
+    return DigestIndex.from_counts(counts, size), errors
@@ -0,0 +1,267 @@
+'''
+This module provides a compact index of the raw digests of a hash leak (fixed-width keys in one sorted buffer).
+'''
+
+import heapq
+import mmap
+import struct
+from array import array
+from itertools import compress, groupby, imap, izip, repeat
+from operator import rshift
+from pgf.analysis.index.leak_index import LeakIndex
+
+
+def sorted_run(digests, size):
+    ''' Sorts the buffer [digests] of concatenated raw digests of [size] bytes and counts the duplicates.
+
+    :return: (str, array): Sorted unique digests (concatenated) and their occurrences.
+    '''
+    keys = sorted([digests[i:i+size] for i in xrange(0, len(digests), size)])
+    buf = bytearray()
+    occ = array('i')
+    for key, group in groupby(keys):
+        buf.extend(key)
+        occ.append(sum(1 for _ in group))
+    return str(buf), occ
+
+
+def iter_run(run, size):
+    ''' Yields the (digest, occ) tuples of a run returned by sorted_run().
+    '''
+    digests, occ = run
+    return izip((digests[i:i+size] for i in xrange(0, len(digests), size)), occ)
+
+
+class DigestIndex(LeakIndex):
+    ''' Index of the raw digests of a hash leak. All digests have the same width ([size] bytes) and are stored once,
+    sorted, in one contiguous buffer (str or read-only mmap); the counters are held in parallel typed arrays like
+    in the LeakIndex, so an index of 16 byte MD5 digests takes about 40 bytes per unique hash.
+
+    Digests are uniformly distributed, so their top bits locate them: a directory holds the position of the first
+    digest of every top-bits bucket (interpolation search) and the key is searched within its bucket of a few digests
+    (binary search). A byte filter over the top bits (about two buckets per digest) rejects most of the misses of a
+    block of candidates without touching the digests (see match()).
+
+    The index is immutable; the mapping API of the LeakIndex is kept (keys are the raw digests).
+
+    :param size: Width of the digests in bytes (at least 4).
+    :param digests: Sorted unique digests, concatenated (str or buffer).
+    :param occ: Array of the occurrences of the digests in the leak.
+    '''
+
+    def __init__(self, size, digests='', occ=None):
+        ''' Constructor.
+        '''
+        self.size = size                        # width of the digests in bytes
+        self.keys_buffer = digests              # all digests, sorted and concatenated
+        self.occ = occ if occ is not None else array('i')       # occurrences of the digest in the leak
+        n = len(self.occ)
+        self.lookups = array('i', [0]) * n      # amount of lookups of the digest by the analysis
+        self.guess = array('l', [0]) * n        # guess number which cracked the digest (0 = not cracked)
+        self.dir_bits = 0                       # amount of top bits of a digest selecting its bucket in the directory
+        self.starts = None                      # position of the first digest of every bucket (and the amount of digests)
+        self.filter_bits = 0                    # amount of top bits of a digest selecting its byte in the filter
+        self.filter = None                      # filter[top bits] == 1 if a digest with these top bits may be in the index
+        self.structs = dict()                   # amount of keys --> Struct unpacking the top 32 bits of every key of a block
+        if size < 4:
+            raise ValueError("Digests of <%d> bytes are too short for the DigestIndex!" % size)
+        self.build()
+
+
+    @classmethod
+    def from_digests(cls, digests, size, run_size=1 << 20):
+        ''' Builds an index from the unsorted raw digests of a leak (including duplicates).
+
+        :param digests: Iterable of buffers of concatenated digests of [size] bytes (e.g. chunks of the file).
+        :param run_size: Amount of digests sorted at once; sorted runs are merged.
+
+        :return: DigestIndex
+        '''
+        runs = list()
+        pending = list()
+        pending_len = 0
+        for chunk in digests:
+            pending.append(chunk)
+            pending_len += len(chunk)
+            if pending_len >= run_size * size:
+                runs.append(sorted_run(''.join(pending), size))
+                pending = list()
+                pending_len = 0
+        if pending_len > 0 or not runs:
+            runs.append(sorted_run(''.join(pending), size))
+        if len(runs) == 1:
+            return cls(size, *runs[0])
+        buf = bytearray()
+        occ = array('i')
+        last = None
+        for key, count in heapq.merge(*[iter_run(run, size) for run in runs]):
+            if key == last:
+                occ[-1] += count                # the digest occurs in several runs
+            else:
+                buf.extend(key)
+                occ.append(count)
+                last = key
+        return cls(size, str(buf), occ)
+
+
+    @classmethod
+    def from_counts(cls, counts, size):
+        ''' Builds an index from a dict of {raw digest: occ}.
+
+        :return: DigestIndex
+        '''
+        keys = sorted(counts)
+        if any(len(key) != size for key in keys):
+            raise ValueError("All digests of the DigestIndex must have <%d> bytes!" % size)
+        return cls(size, ''.join(keys), array('i', [counts[key] for key in keys]))
+
+
+    def build(self):
+        ''' Builds the directory and the filter from the sorted digests.
+        '''
+        n = len(self.occ)
+        self.dir_bits = min(32, max(0, n.bit_length() - 2))         # about 2-4 digests per bucket
+        self.filter_bits = min(32, n.bit_length() + 1)              # 2-4 filter bytes per digest
+        starts = array('l' if n >= 1 << 31 else 'i', [0]) * ((1 << self.dir_bits) + 1)
+        self.filter = bytearray(1 << self.filter_bits)
+        dir_shift = 32 - self.dir_bits
+        filter_shift = 32 - self.filter_bits
+        size = self.size
+        digests = self.keys_buffer
+        unpack = struct.Struct('>I').unpack
+        bucket = 0
+        for idx in xrange(n):
+            head = unpack(digests[idx*size:idx*size+4])[0]
+            while bucket < head >> dir_shift:
+                bucket += 1
+                starts[bucket] = idx
+            self.filter[head >> filter_shift] = 1
+        for bucket in xrange(bucket + 1, len(starts)):
+            starts[bucket] = n
+        self.starts = starts
+
+
+    def resize(self, size_hint, keys=None):
+        ''' Not needed, the directory only depends on the amount of digests (see build()).
+        '''
+        pass
+
+
+    def key(self, idx):
+        ''' Returns the digest at position [idx].
+        '''
+        return str(self.keys_buffer[idx*self.size:(idx+1)*self.size])
+
+
+    def search(self, key, head):
+        ''' Returns the position of [key] (with top 32 bits [head]) or -1 by a binary search in its bucket.
+        '''
+        size = self.size
+        digests = self.keys_buffer
+        bucket = head >> (32 - self.dir_bits)
+        lo = self.starts[bucket]
+        hi = self.starts[bucket+1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            digest = digests[mid*size:(mid+1)*size]
+            if digest < key:
+                lo = mid + 1
+            elif digest > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+
+    def find(self, key):
+        ''' Returns the position of the digest [key] in the index or -1 if it is not part of the leak.
+        '''
+        if len(key) != self.size:
+            return -1
+        head = struct.unpack('>I', key[:4])[0]
+        if not self.filter[head >> (32 - self.filter_bits)]:
+            return -1
+        return self.search(key, head)
+
+
+    def match(self, keys):
+        ''' Looks up a whole block of digests at once. The top bits of all digests are unpacked by a single struct call
+        and the filter lookups are done by C-level map() passes, only the digests passing the filter are searched.
+
+        :param keys: List of raw digests (e.g. the digests of a block of candidates).
+
+        :return: List of (position in [keys], position in the index) tuples of the keys found in the index, in the order of [keys].
+        '''
+        n = len(keys)
+        data = ''.join(keys)
+        if len(data) != n * self.size:
+            return [(pos, idx) for pos, idx in enumerate(imap(self.find, keys)) if idx >= 0]   # digests of a different width
+        unpacker = self.structs.get(n)
+        if unpacker is None:
+            if len(self.structs) > 16:
+                self.structs.clear()
+            unpacker = self.structs[n] = struct.Struct('>' + ('I%dx' % (self.size - 4)) * n)
+        heads = unpacker.unpack(data)
+        passed = compress(xrange(n), map(self.filter.__getitem__, imap(rshift, heads, repeat(32 - self.filter_bits))))
+        hits = list()
+        for pos in passed:
+            idx = self.search(keys[pos], heads[pos])
+            if idx >= 0:
+                hits.append((pos, idx))
+        return hits
+
+
+    def append(self, key, occ=1):
+        ''' The digests are sorted once, keys cannot be added.
+        '''
+        raise TypeError("The DigestIndex is immutable!")
+
+
+    def dump(self, f):
+        ''' Writes the index (occurrences, directory, filter and digests) to the binary file object [f].
+        The digests are written last, at an offset aligned for mmap, so load() can map them instead of reading them.
+
+        :return: Dict of header values to be passed to load().
+        '''
+        header = {'type': 'digest',
+                  'keys': len(self.occ),
+                  'size': self.size,
+                  'starts_type': self.starts.typecode}
+        self.occ.tofile(f)
+        self.starts.tofile(f)
+        f.write(self.filter)
+        pos = f.tell()
+        padding = -pos % mmap.ALLOCATIONGRANULARITY
+        f.write('\0' * padding)
+        header['keys_offset'] = pos + padding           # absolute position in the file
+        f.write(self.keys_buffer)
+        return header
+
+
+    @classmethod
+    def load(cls, f, header):
+        ''' Loads an index written by dump(). The arrays are read, the digests are memory-mapped (read-only).
+
+        :param f: Binary file object, positioned where dump() started writing.
+        :param header: Dict of header values returned by dump().
+
+        :return: DigestIndex
+        '''
+        n = header['keys']
+        size = header['size']
+        index = cls.__new__(cls)
+        index.size = size
+        index.occ = array('i')
+        index.occ.fromfile(f, n)
+        index.lookups = array('i', [0]) * n
+        index.guess = array('l', [0]) * n
+        index.dir_bits = min(32, max(0, n.bit_length() - 2))
+        index.filter_bits = min(32, n.bit_length() + 1)
+        index.starts = array(str(header['starts_type']))
+        index.starts.fromfile(f, (1 << index.dir_bits) + 1)
+        index.filter = bytearray(f.read(1 << index.filter_bits))
+        index.structs = dict()
+        index.keys_buffer = ''
+        if n > 0:
+            index.keys_buffer = mmap.mmap(f.fileno(), n * size, access=mmap.ACCESS_READ, offset=header['keys_offset'])
+        return index
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+'''
+This module provides a persistent on-disk cache of parsed leaks (LeakIndex, password counter and error counter).
+All jobs using the same password file share one cache entry, which is memory-mapped by the analysis module.
+
+Entries can be invalidated explicitly from the command line:
+
+    python pgf/analysis/index/leak_cache.py [cache_dir] --invalidate [pw_file]
+    python pgf/analysis/index/leak_cache.py [cache_dir] --clear
+'''
+
+import sys
+import os
+sys.path.insert(1, os.path.abspath('./'))
+import errno
+import fcntl
+import hashlib
+import json
+import time
+from pgf.log.logger import Logger
+from pgf.analysis.index.leak_index import LeakIndex
+from pgf.analysis.index.digest_index import DigestIndex
+
+
+class LeakCache(object):
+    ''' Size-bounded cache of parsed leaks. The entries are keyed by path, size, modification time and
+    a content hash of the password file as well as its format. Least recently used entries are evicted first.
+
+    :param cache_dir: Directory of the cache files.
+    :param max_size: Maximum size of the cache directory in MB (None = unbounded).
+    :param logger: Logger instance.
+    '''
+
+    MAGIC = 'PGF-LEAK-CACHE 3\n'                # change the version whenever the parsers or the index format change
+    SUFFIX = '.leak'                            # file ending of the cache entries
+    TMP_SUFFIX = '.tmp'                         # file ending of entries being written ([key].leak.[pid].tmp)
+    TMP_GRACE = 60                              # seconds a temporary file is kept after its last change, even if its writer has ended
+    HEADER_SIZE = 4096                          # magic line and JSON header, the index is written behind it
+    SAMPLE_SIZE = 1 << 16                       # size of the blocks of the password file used for the content hash
+    SAMPLE_COUNT = 64                           # amount of blocks used for the content hash
+
+    def __init__(self, cache_dir, max_size=None, logger=None):
+        ''' Constructor.
+        '''
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.logger = logger
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+
+    def content_hash(self, pw_file):
+        ''' Hashes the content of the password file. Files up to SAMPLE_COUNT * SAMPLE_SIZE bytes are hashed entirely,
+        of larger files the first and last block and evenly spaced blocks in between are hashed,
+        so the hash is calculated in constant time even for multi-GB leaks.
+        '''
+        size = os.path.getsize(pw_file)
+        sha1 = hashlib.sha1()
+        with open(pw_file, 'rb') as f:
+            if size <= self.SAMPLE_COUNT * self.SAMPLE_SIZE:
+                sha1.update(f.read())
+            else:
+                step = (size - self.SAMPLE_SIZE) / (self.SAMPLE_COUNT - 1)
+                for i in range(self.SAMPLE_COUNT):
+                    f.seek(i * step)
+                    sha1.update(f.read(self.SAMPLE_SIZE))
+        return sha1.hexdigest()
+
+
+    def get_key(self, pw_file, pw_format):
+        ''' Returns the key of the cache entry for the password file in its current state.
+        '''
+        pw_file = os.path.abspath(pw_file)
+        stat = os.stat(pw_file)
+        key = '%s|%s|%d|%d|%s|%s' % (self.MAGIC, pw_file, stat.st_size, int(stat.st_mtime), self.content_hash(pw_file), pw_format)
+        return hashlib.sha1(key).hexdigest()
+
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, '%s%s' % (key, self.SUFFIX))
+
+
+    def load_or_parse(self, pw_file, pw_format, parse):
+        ''' Returns the cached leak or parses it with [parse] and stores the result in the cache.
+        The entry is locked while it is created, so concurrent jobs using the same leak parse it only once.
+
+        :param pw_file: Path of the password file.
+        :param pw_format: Format indicator of the password file.
+        :param parse: Function returning (LeakIndex, pw_counter, error_counter).
+
+        :return: (LeakIndex, Int, Int)
+        '''
+        key = self.get_key(pw_file, pw_format)
+        with open('%s.lock' % self.get_path(key), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)                    # released when the file is closed
+            entry = self.load(key)
+            if entry is not None:
+                self.logger.debug("Leak <%s> loaded from the cache (%s)." % (pw_file, key))
+                return entry
+            self.logger.debug("Leak <%s> not cached yet." % pw_file)
+            index, pw_counter, error_counter = parse()
+            try:
+                self.store(key, pw_file, pw_format, index, pw_counter, error_counter)
+            except (IOError, OSError), e:
+                self.logger.warning("The leak could not be cached: <%s>" % str(e))
+        return index, pw_counter, error_counter
+
+
+    def load(self, key):
+        ''' Loads the cache entry [key]. The key buffer of the index is memory-mapped.
+
+        :return: (LeakIndex, Int, Int) or None if there is no such entry (a DigestIndex for hash leaks of raw digests).
+        '''
+        path = self.get_path(key)
+        header = self.read_header(path)
+        if header is None:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(self.HEADER_SIZE)
+            index_class = DigestIndex if header['index'].get('type') == 'digest' else LeakIndex
+            index = index_class.load(f, header['index'])        # the mapping stays valid after closing the file
+        os.utime(path, None)                                    # mark entry as recently used
+        return index, header['pw_counter'], header['error_counter']
+
+
+    def store(self, key, pw_file, pw_format, index, pw_counter, error_counter):
+        ''' Writes a new cache entry (atomically) and evicts stale and least recently used entries.
+        '''
+        path = self.get_path(key)
+        tmp_path = '%s.%d%s' % (path, os.getpid(), self.TMP_SUFFIX)
+        with open(tmp_path, 'wb') as f:
+            f.seek(self.HEADER_SIZE)
+            index_header = index.dump(f)
+            header = '%s%s\n' % (self.MAGIC, json.dumps({'pw_file': os.path.abspath(pw_file),
+                                                         'pw_format': pw_format,
+                                                         'pw_counter': pw_counter,
+                                                         'error_counter': error_counter,
+                                                         'index': index_header}))
+            if len(header) > self.HEADER_SIZE:
+                raise IOError("Header of the cache entry too long!")
+            f.seek(0)
+            f.write(header)                                     # written last, as the header contains the offsets of the index
+        os.rename(tmp_path, path)
+        self.logger.debug("Leak <%s> stored in the cache (%s)." % (pw_file, key))
+        self.invalidate(pw_file, pw_format, keep=key)           # entries of previous versions of the file are stale
+        self.evict(keep=key)
+
+
+    def entries(self):
+        ''' Returns a list of (path, size, last_used) of all cache entries.
+        '''
+        entries = list()
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(self.SUFFIX):
+                path = os.path.join(self.cache_dir, filename)
+                stat = os.stat(path)
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+
+    def read_header(self, path):
+        ''' Returns the header dict of the cache entry at [path] or None if it is not readable.
+        '''
+        try:
+            with open(path, 'rb') as f:
+                if f.readline() != self.MAGIC:
+                    return None
+                return json.loads(f.readline())
+        except (IOError, ValueError):
+            return None
+
+
+    def invalidate(self, pw_file=None, pw_format=None, keep=None):
+        ''' Removes the cache entries of [pw_file] (in format [pw_format]) or all entries if no file is given.
+
+        :param keep: Key of an entry not to remove.
+        '''
+        if pw_file is not None:
+            pw_file = os.path.abspath(pw_file)
+        for path, _, _ in self.entries():
+            if keep is not None and path == self.get_path(keep):
+                continue
+            if pw_file is not None:
+                header = self.read_header(path)
+                if header is not None:
+                    if header['pw_file'] != pw_file or (pw_format is not None and header['pw_format'] != pw_format):
+                        continue
+            self.remove(path)
+            self.logger.debug("Removed cache entry <%s>." % os.path.basename(path))
+
+
+    def remove(self, path):
+        ''' Removes the cache entry at [path]. Its lock file is kept, as other processes may be waiting on it:
+        a process locking an unlinked file would not exclude a process creating the lock file anew.
+        '''
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+    def sweep(self):
+        ''' Removes the temporary files of entries whose writing process no longer exists (e.g. after a crash).
+        Files changed within the last TMP_GRACE seconds are kept, as they may be committed by another process
+        right after their writer has ended (see CandidateStore).
+        '''
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(self.TMP_SUFFIX):
+                continue
+            try:
+                pid = int(filename[:-len(self.TMP_SUFFIX)].rsplit('.', 1)[1])
+            except (IndexError, ValueError):
+                continue
+            try:
+                os.kill(pid, 0)
+                continue                                        # still being written
+            except OSError, e:
+                if e.errno != errno.ESRCH:
+                    continue                                    # the process exists, but belongs to another user
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                if time.time() - os.path.getmtime(path) < self.TMP_GRACE:
+                    continue
+            except OSError:
+                continue                                        # removed in the meantime
+            self.remove(path)
+            self.logger.debug("Removed stale temporary cache file <%s>." % filename)
+
+
+    def evict(self, keep=None):
+        ''' Removes the least recently used entries until the cache is not larger than [max_size] MB.
+
+        Stale temporary files of crashed builds are removed as well.
+
+        :param keep: Key of an entry not to remove (the entry that has just been created).
+        '''
+        self.sweep()
+        if self.max_size is None:
+            return
+        entries = sorted(self.entries(), key=lambda entry: entry[2])        # least recently used first
+        total = sum(entry[1] for entry in entries)
+        for path, size, _ in entries:
+            if total <= self.max_size * 1024 * 1024:
+                break
+            if keep is not None and path == self.get_path(keep):
+                continue
+            self.remove(path)
+            total -= size
+            self.logger.debug("Evicted cache entry <%s>." % os.path.basename(path))
+
+
+
+def main():
+    ''' Invalidates cache entries.
+    '''
+    if len(sys.argv) < 3 or sys.argv[2] not in ('--invalidate', '--clear'):
+        print "Usage: %s [cache_dir] --invalidate [pw_file] | --clear" % sys.argv[0]
+        exit(-1)
+    cache = LeakCache(sys.argv[1], logger=Logger())
+    if sys.argv[2] == '--invalidate':
+        cache.invalidate(sys.argv[3])
+    else:
+        cache.invalidate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,553 @@
+'''
+This module provides a compact, array-backed index of the passwords (or hashes) of a leak.
+'''
+
+import mmap
+from array import array
+from itertools import compress, imap, islice, izip, repeat
+from operator import add, and_, getslice
+
+
+HASH_CHECK = 'PGF LeakIndex'           # hash value is stored with dumped indexes to detect a different hash function
+
+
+class LeakEntry(object):
+    ''' Dict-like view of the counters of a single key in a LeakIndex.
+    Provides the same access as the former inner dicts of 'pws_multi', e.g. "pws_multi[pw]['occ']".
+
+    :param index: LeakIndex the entry belongs to.
+    :param idx: Position of the key in the index.
+    '''
+
+    __slots__ = ('index', 'idx')
+
+    fields = ('occ', 'lookups', 'guess')
+
+    def __init__(self, index, idx):
+        ''' Constructor.
+        '''
+        self.index = index
+        self.idx = idx
+
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError(field)
+        return getattr(self.index, field)[self.idx]
+
+    def __setitem__(self, field, value):
+        if field not in self.fields:
+            raise KeyError(field)
+        getattr(self.index, field)[self.idx] = value
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.fields)
+
+    def items(self):
+        return [(field, self[field]) for field in self.fields]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class LeakIndex(object):
+    ''' Compact replacement for the dict-of-dicts 'pws_multi' ({pw: {'occ': n, 'lookups': m}}).
+    All keys are stored once in a contiguous buffer, the counters are held in parallel typed arrays.
+    Lookups are done with an open addressing hash table (linear probing, load factor <= 0.5) of 32 bit slots.
+    Every slot holds the position of a key in its low bits and a fingerprint of the key's hash value in its
+    high bits, so probing only touches the slot array and the key bytes are compared for real matches only.
+    A byte filter (one byte per hash value bucket, twice as many buckets as slots) rejects most of the misses
+    of a whole block of candidates without probing (see match()).
+
+    The mapping API ('in', [], len(), iterkeys(), iteritems(), ...) is kept so the analysis schemes
+    and the analysis plugins can use the index like the former dict.
+
+    :param size_hint: Expected amount of unique keys (used to size the hash table).
+    '''
+
+    def __init__(self, size_hint=0):
+        ''' Constructor.
+        '''
+        self.keys_buffer = ''                   # all keys, concatenated (str, converted into a bytearray while keys are appended)
+        self.offsets = array('i', [0])          # key [i] is keys_buffer[offsets[i]:offsets[i+1]] (widened to 'l' for buffers > 2 GB)
+        self.occ = array('i')                   # occurrences of the key in the leak
+        self.lookups = array('i')               # amount of lookups of the key by the analysis (^= times the candidate was generated)
+        self.guess = array('l')                 # guess number which cracked the key (0 = not cracked)
+        self.slots = None                       # hash table: (fingerprint << idx_bits | position of the key) or -1 for empty slots
+        self.mask = 0                           # size of the hash table - 1
+        self.idx_bits = 0                       # amount of low bits of a slot used for the position of the key
+        self.fp_mask = 0                        # mask of the fingerprint stored in the remaining high bits
+        self.filter = None                      # filter[hash & filter_mask] == 1 if a key with this hash value bucket may be in the index
+        self.filter_mask = 0                    # size of the filter - 1
+        self.resize(size_hint)
+
+
+    @classmethod
+    def from_counts(cls, counts):
+        ''' Builds an index from a dict of {key: occ}.
+        Dicts in the former 'pws_multi' format ({key: {'occ': n, 'lookups': m}}) are accepted as well.
+
+        :param counts: Dict of the keys and their occurrences.
+
+        :return: LeakIndex
+        '''
+        index = cls()
+        keys = counts.keys()
+        occs = [occ['occ'] if isinstance(occ, dict) else occ for occ in counts.itervalues()]
+        index.keys_buffer = ''.join(keys)
+        if len(index.keys_buffer) >= 1 << 31:
+            index.offsets = array('l', index.offsets)
+        offsets = index.offsets
+        pos = 0
+        for key in keys:
+            pos += len(key)
+            offsets.append(pos)
+        index.occ = array('i', occs)
+        index.lookups = array('i', [0]) * len(keys)
+        index.guess = array('l', [0]) * len(keys)
+        index.resize(len(keys), keys)
+        return index
+
+
+    @classmethod
+    def from_pieces(cls, pieces):
+        ''' Builds an index from pieces of distinct keys (no key may occur in two pieces, see LeakIndexBuilder).
+
+        :param pieces: List of (keys, offsets, occ, hashes) tuples: the concatenated keys of the piece, the end offsets of the
+                       keys in it and arrays of their occurrences and hash values.
+
+        :return: LeakIndex
+        '''
+        index = cls(sum([len(piece[2]) for piece in pieces]))
+        keys_len = sum([len(piece[0]) for piece in pieces])
+        if keys_len >= 1 << 31:
+            index.offsets = array('l', index.offsets)
+        base = 0
+        for keys, offsets, occ, _ in pieces:
+            index.offsets.extend(imap(add, offsets, repeat(base)))
+            index.occ.extend(occ)
+            base += len(keys)
+        index.keys_buffer = ''.join([piece[0] for piece in pieces])
+        n = len(index.occ)
+        index.lookups = array('i', [0]) * n
+        index.guess = array('l', [0]) * n
+        slots = index.slots
+        mask = index.mask
+        idx_bits = index.idx_bits
+        fp_mask = index.fp_mask
+        filter_ = index.filter
+        filter_mask = index.filter_mask
+        idx = 0
+        for piece in pieces:
+            for h in piece[3]:                          # insert the keys by their hash values
+                i = h & mask
+                while slots[i] >= 0:
+                    i = (i + 1) & mask
+                slots[i] = (((h >> 32) & fp_mask) << idx_bits) | idx
+                filter_[h & filter_mask] = 1
+                idx += 1
+        return index
+
+
+    def resize(self, size_hint, keys=None):
+        ''' (Re)builds the hash table for at least [size_hint] keys.
+
+        :param keys: List of all keys in the index (optional, otherwise read from the key buffer).
+        '''
+        size = 1024
+        while size < 2 * max(size_hint, len(self.occ)):
+            size <<= 1
+        if size > 1 << 32:
+            raise MemoryError("Too many keys for the LeakIndex <%d>!" % size_hint)
+        idx_bits = size.bit_length() - 2                # the table holds at most size/2 keys
+        fp_mask = (1 << (31 - idx_bits)) - 1
+        slots = array('i', [-1]) * size
+        mask = size - 1
+        filter_ = bytearray(2 * size)
+        filter_mask = 2 * size - 1
+        if keys is None:
+            keys = (self.key(idx) for idx in xrange(len(self.occ)))
+        for idx, key in enumerate(keys):                # (re-)insert all keys
+            h = hash(key)
+            i = h & mask
+            while slots[i] >= 0:
+                i = (i + 1) & mask
+            slots[i] = (((h >> 32) & fp_mask) << idx_bits) | idx
+            filter_[h & filter_mask] = 1
+        self.slots = slots
+        self.mask = mask
+        self.idx_bits = idx_bits
+        self.fp_mask = fp_mask
+        self.filter = filter_
+        self.filter_mask = filter_mask
+
+
+    def freeze(self):
+        ''' Converts the key buffer back into an immutable str after keys have been appended (faster comparisons).
+        '''
+        self.keys_buffer = str(self.keys_buffer)
+
+
+    def key(self, idx):
+        ''' Returns the key at position [idx].
+        '''
+        return str(self.keys_buffer[self.offsets[idx]:self.offsets[idx+1]])
+
+
+    def _probe(self, key, h):
+        ''' Returns the slot of [key] (with hash value [h]) and the position of the key or -1 if the slot is empty.
+        '''
+        slots = self.slots
+        mask = self.mask
+        i = h & mask
+        slot = slots[i]
+        if slot < 0:
+            return i, -1                                # empty slot --> most of the candidates end here
+        idx_bits = self.idx_bits
+        idx_mask = (1 << idx_bits) - 1
+        fp = (h >> 32) & self.fp_mask
+        offsets = self.offsets
+        while slot >= 0:
+            if slot >> idx_bits == fp:
+                idx = slot & idx_mask
+                if self.keys_buffer[offsets[idx]:offsets[idx+1]] == key:
+                    return i, idx
+            i = (i + 1) & mask
+            slot = slots[i]
+        return i, -1
+
+
+    def find(self, key):
+        ''' Returns the position of [key] in the index or -1 if the key is not part of the leak.
+        Same as _probe(), inlined as it is called for every candidate.
+        '''
+        h = hash(key)
+        slots = self.slots
+        mask = self.mask
+        i = h & mask
+        slot = slots[i]
+        if slot < 0:
+            return -1
+        idx_bits = self.idx_bits
+        fp = (h >> 32) & self.fp_mask
+        while slot >= 0:
+            if slot >> idx_bits == fp:
+                idx = slot & ((1 << idx_bits) - 1)
+                if self.keys_buffer[self.offsets[idx]:self.offsets[idx+1]] == key:
+                    return idx
+            i = (i + 1) & mask
+            slot = slots[i]
+        return -1
+
+
+    def match(self, keys):
+        ''' Looks up a whole block of keys at once. Hashing and the filter lookups are done by C-level map() passes,
+        only the keys passing the filter (the hits and a small share of the misses) are probed in the hash table.
+
+        :param keys: List of keys (e.g. a block of candidates).
+
+        :return: List of (position in [keys], position in the index) tuples of the keys found in the index, in the order of [keys].
+        '''
+        hashes = map(hash, keys)
+        passed = compress(xrange(len(keys)), map(self.filter.__getitem__, imap(and_, hashes, repeat(self.filter_mask))))
+        slots = self.slots
+        mask = self.mask
+        idx_bits = self.idx_bits
+        idx_mask = (1 << idx_bits) - 1
+        fp_mask = self.fp_mask
+        offsets = self.offsets
+        keys_buffer = self.keys_buffer
+        hits = list()
+        for pos in passed:
+            h = hashes[pos]
+            i = h & mask
+            slot = slots[i]
+            fp = (h >> 32) & fp_mask
+            while slot >= 0:
+                if slot >> idx_bits == fp:
+                    idx = slot & idx_mask
+                    if keys_buffer[offsets[idx]:offsets[idx+1]] == keys[pos]:
+                        hits.append((pos, idx))
+                        break
+                i = (i + 1) & mask
+                slot = slots[i]
+        return hits
+
+
+    def append(self, key, occ=1):
+        ''' Adds [occ] occurrences of [key] to the index.
+
+        :return: Position of the key in the index.
+        '''
+        h = hash(key)
+        i, idx = self._probe(key, h)
+        if idx >= 0:
+            self.occ[idx] += occ                        # known key --> increment occurrence counter
+            return idx
+        idx = len(self.occ)
+        if not isinstance(self.keys_buffer, bytearray):
+            self.keys_buffer = bytearray(self.keys_buffer)
+        self.keys_buffer.extend(key)
+        if self.offsets.typecode == 'i' and len(self.keys_buffer) >= 1 << 31:
+            self.offsets = array('l', self.offsets)
+        self.offsets.append(len(self.keys_buffer))
+        self.occ.append(occ)
+        self.lookups.append(0)
+        self.guess.append(0)
+        if 2 * len(self.occ) > len(self.slots):
+            self.resize(len(self.occ))                  # re-inserts the new key as well
+        else:
+            self.slots[i] = (((h >> 32) & self.fp_mask) << self.idx_bits) | idx
+            self.filter[h & self.filter_mask] = 1
+        return idx
+
+
+    def dump(self, f):
+        ''' Writes the index (keys, offsets, occurrences, hash table and filter) to the binary file object [f].
+        The key buffer is written last, at an offset aligned for mmap, so load() can map it instead of reading it.
+
+        :return: Dict of header values to be passed to load().
+        '''
+        header = {'keys': len(self.occ),
+                  'keys_len': len(self.keys_buffer),
+                  'offsets_type': self.offsets.typecode,
+                  'slots': len(self.slots),
+                  'hash_check': hash(HASH_CHECK)}
+        self.offsets.tofile(f)
+        self.occ.tofile(f)
+        self.slots.tofile(f)
+        f.write(self.filter)
+        pos = f.tell()
+        padding = -pos % mmap.ALLOCATIONGRANULARITY
+        f.write('\0' * padding)
+        header['keys_offset'] = pos + padding           # absolute position in the file
+        f.write(self.keys_buffer)
+        return header
+
+
+    @classmethod
+    def load(cls, f, header):
+        ''' Loads an index written by dump(). The arrays are read, the key buffer is memory-mapped (read-only).
+
+        :param f: Binary file object, positioned where dump() started writing.
+        :param header: Dict of header values returned by dump().
+
+        :return: LeakIndex
+        '''
+        index = cls()
+        n = header['keys']
+        index.offsets = array(str(header['offsets_type']))
+        index.offsets.fromfile(f, n + 1)
+        index.occ.fromfile(f, n)
+        index.lookups = array('i', [0]) * n
+        index.guess = array('l', [0]) * n
+        if header['keys_len'] > 0:
+            index.keys_buffer = mmap.mmap(f.fileno(), header['keys_len'], access=mmap.ACCESS_READ, offset=header['keys_offset'])
+        if header['hash_check'] == hash(HASH_CHECK):
+            index.slots = array('i')
+            index.slots.fromfile(f, header['slots'])
+            size = len(index.slots)
+            index.mask = size - 1
+            index.idx_bits = size.bit_length() - 2
+            index.fp_mask = (1 << (31 - index.idx_bits)) - 1
+            index.filter = bytearray(f.read(2 * size))
+            index.filter_mask = 2 * size - 1
+        else:
+            index.resize(n)                             # hash values differ from the dumping process (e.g. 'python -R') --> rebuild
+        return index
+
+
+    # **** MAPPING API ****
+    def __len__(self):
+        return len(self.occ)
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def __getitem__(self, key):
+        idx = self.find(key)
+        if idx < 0:
+            raise KeyError(key)
+        return LeakEntry(self, idx)
+
+    def __setitem__(self, key, value):
+        ''' Sets the counters of [key] from a dict {'occ': n, 'lookups': m} (former 'pws_multi' format).
+        '''
+        idx = self.find(key)
+        if idx < 0:
+            idx = self.append(key, 0)
+        entry = LeakEntry(self, idx)
+        for field, count in value.iteritems():
+            entry[field] = count
+
+    def get(self, key, default=None):
+        idx = self.find(key)
+        if idx < 0:
+            return default
+        return LeakEntry(self, idx)
+
+    def iterkeys(self):
+        for idx in xrange(len(self.occ)):
+            yield self.key(idx)
+
+    __iter__ = iterkeys
+
+    def itervalues(self):
+        for idx in xrange(len(self.occ)):
+            yield LeakEntry(self, idx)
+
+    def iteritems(self):
+        for idx in xrange(len(self.occ)):
+            yield self.key(idx), LeakEntry(self, idx)
+
+    def keys(self):
+        buffer_ = self.keys_buffer
+        keys = imap(getslice, repeat(buffer_), self.offsets, islice(self.offsets, 1, len(self.occ) + 1))
+        if isinstance(buffer_, bytearray):
+            keys = imap(str, keys)              # keys are being appended
+        return list(keys)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+
+
+def join_keys(keys):
+    ''' Concatenates the list of [keys], separated by newlines (or by their lengths if a key contains a newline).
+
+    :return: (str, array or None): The concatenated keys and their lengths (None if they are separated by newlines).
+    '''
+    joined = '\n'.join(keys)
+    if joined.count('\n') == len(keys) - 1:
+        return joined, None
+    return ''.join(keys), array('i', imap(len, keys))
+
+
+def split_keys(joined, lengths):
+    ''' Returns the list of the keys concatenated by join_keys().
+    '''
+    if lengths is None:
+        return joined.split('\n')
+    keys = list()
+    pos = 0
+    for length in lengths:
+        keys.append(joined[pos:pos+length])
+        pos += length
+    return keys
+
+
+def merge_runs(runs, replace=False):
+    ''' Merges the runs of one bucket of a LeakIndexBuilder (in the order of the lines they were parsed from).
+
+    :param runs: List of (joined keys, lengths, occ) tuples, see join_keys().
+    :param replace: True if the occurrences of later runs replace the ones of earlier runs, otherwise they are added.
+
+    :return: (keys, offsets, occ, hashes) piece of the distinct keys of the bucket (see LeakIndex.from_pieces()).
+    '''
+    counts = dict()
+    for joined, lengths, occs in runs:
+        if replace:
+            counts.update(izip(split_keys(joined, lengths), occs))
+        else:
+            get = counts.get
+            for key, occ in izip(split_keys(joined, lengths), occs):
+                counts[key] = get(key, 0) + occ
+    return to_piece(counts.keys(), counts.values())
+
+
+def to_piece(keys, occs):
+    ''' Returns the (keys, offsets, occ, hashes) piece of the distinct [keys] and their occurrences [occs]
+    (see LeakIndex.from_pieces()).
+    '''
+    offsets = array('l')
+    pos = 0
+    for length in imap(len, keys):
+        pos += length
+        offsets.append(pos)
+    return ''.join(keys), offsets, array('i', occs), array('l', imap(hash, keys))
+
+
+class LeakIndexBuilder(object):
+    ''' Builds a LeakIndex while a password file is parsed, without a dict of all keys. The parsers count the keys of the
+    next lines in a small dict ([counts], at most [batch_size] keys). Whenever it is full, its keys are split into [buckets]
+    by their hash values and stored as compact runs (concatenated keys and arrays of offsets and occurrences, see flush()).
+    The runs of a bucket hold all occurrences of its keys, so build() merges the runs bucket by bucket with a small dict
+    and concatenates the distinct keys of all buckets into the index.
+    The bucket of a key is given by its hash value, so the keys have to be hashed alike by all processes using the builder.
+
+    :param replace: True if the occurrences of a key replace the ones of its earlier lines (e.g. for 'plaintext_withcount'),
+                    otherwise they are added.
+    :param batch_size: Maximum amount of keys counted in the dict before it is stored as runs.
+    :param buckets: Amount of buckets (the dict of build() holds the keys of one bucket).
+    '''
+
+    BATCH_SIZE = 1 << 16
+    BUCKETS = 64
+
+    def __init__(self, replace=False, batch_size=None, buckets=None):
+        ''' Constructor.
+        '''
+        self.replace = replace
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.buckets = buckets or self.BUCKETS
+        self.counts = dict()                    # keys of the current batch --> occurrences
+        self.runs = [list() for _ in xrange(self.buckets)]     # runs of every bucket, in the order of the batches
+
+
+    def add(self, key, occ=1):
+        ''' Adds (or sets, see [replace]) the [occ] occurrences of [key].
+        '''
+        counts = self.counts
+        if self.replace:
+            counts[key] = occ
+        else:
+            counts[key] = counts.get(key, 0) + occ
+        if len(counts) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+        ''' Stores the keys of the current batch as one run per bucket. The dict [counts] is cleared, not replaced, so the
+        parsers can keep a reference to it.
+        '''
+        if not self.counts:
+            return
+        buckets = self.buckets
+        keys = [list() for _ in xrange(buckets)]
+        appends = [bucket_keys.append for bucket_keys in keys]
+        for key in self.counts:
+            appends[hash(key) % buckets](key)
+        for runs, bucket_keys in izip(self.runs, keys):
+            if bucket_keys:
+                runs.append(join_keys(bucket_keys) + (array('i', imap(self.counts.__getitem__, bucket_keys)),))
+        self.counts.clear()
+
+
+    def get_runs(self):
+        ''' Stores the last batch and returns the runs of all buckets (list per bucket), e.g. to merge them in another process.
+        '''
+        self.flush()
+        runs = self.runs
+        self.runs = [list() for _ in xrange(self.buckets)]
+        return runs
+
+
+    def build(self):
+        ''' Merges the runs bucket by bucket and returns the index.
+
+        :return: LeakIndex
+        '''
+        runs = self.get_runs()
+        pieces = list()
+        for bucket in xrange(len(runs)):
+            pieces.append(merge_runs(runs[bucket], self.replace))
+            runs[bucket] = None                 # release the runs of the merged bucket
+        return LeakIndex.from_pieces(pieces)
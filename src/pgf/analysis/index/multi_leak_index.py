@@ -0,0 +1,77 @@
+'''
+This module provides the combined index of the leaks of a job group, matching the candidates against all leaks at once.
+'''
+
+from array import array
+from itertools import count, ifilterfalse, imap, izip, repeat
+from operator import mul, or_
+from pgf.analysis.index.leak_index import LeakIndex, to_piece
+
+
+class MultiLeakIndex(object):
+    ''' Combined index of several leaks (the LeakIndexes of the jobs of a job group).
+    The union of the keys is held in a single LeakIndex, so every candidate is hashed and probed only once for all leaks.
+    For every key of the union a bitmask of the leaks containing it is stored ('masks', bit [n] = leak [n]),
+    as well as the position of the key in the LeakIndex of every leak ('positions', -1 if not part of the leak).
+    The counters (occurrences, lookups, guess numbers) stay in the LeakIndexes of the leaks, so every job keeps its own counts.
+    The union, masks and positions are built with dicts and iterators of whole key lists instead of a lookup per key and leak.
+
+    :param indexes: List of the LeakIndexes of the leaks (at most 63).
+    '''
+
+    MAX_LEAKS = 63                  # bits of the 'l' typed mask array
+
+    def __init__(self, indexes):
+        ''' Constructor.
+        '''
+        if len(indexes) > self.MAX_LEAKS:
+            raise ValueError("Too many leaks for the MultiLeakIndex <%d>!" % len(indexes))
+        self.indexes = indexes
+        union_keys = list()                     # keys of the union, in the order of the leaks
+        union_positions = dict()                # key --> position in the union
+        leak_keys = list()
+        for index in indexes:
+            keys = index.keys()
+            new_keys = list(ifilterfalse(union_positions.__contains__, keys))
+            union_positions.update(izip(new_keys, count(len(union_keys))))
+            union_keys.extend(new_keys)
+            leak_keys.append(keys)
+        union_positions = None
+        self.union = LeakIndex.from_pieces([to_piece(union_keys, repeat(0, len(union_keys)))])
+        self.masks = array('l', [0]) * len(union_keys)
+        self.positions = list()
+        for bit, keys in enumerate(leak_keys):
+            positions = dict(izip(keys, count()))           # key --> position in the LeakIndex of the leak
+            self.positions.append(array('i', imap(positions.get, union_keys, repeat(-1))))
+            self.masks = array('l', imap(or_, self.masks, imap(mul, imap(positions.__contains__, union_keys), repeat(1 << bit))))
+
+
+    def match(self, keys):
+        ''' Looks up a whole block of keys in the union of the leaks (see LeakIndex.match()).
+
+        :return: List of (position in [keys], position in the union) tuples of the keys found in any of the leaks, in the order of [keys].
+        '''
+        return self.union.match(keys)
+
+
+    def split(self, hits):
+        ''' Splits the hits returned by match() by leak.
+
+        :return: List (one item per leak) of lists of (position in [keys], position in the LeakIndex of the leak) tuples.
+        '''
+        hits_per_leak = [list() for _ in self.indexes]
+        masks = self.masks
+        positions = self.positions
+        for pos, u in hits:
+            mask = masks[u]
+            leak = 0
+            while mask:
+                if mask & 1:
+                    hits_per_leak[leak].append((pos, positions[leak][u]))
+                mask >>= 1
+                leak += 1
+        return hits_per_leak
+
+
+    def __len__(self):
+        return len(self.union)
@@ -0,0 +1,141 @@
+'''
+This module provides the bulk intake of the candidate stream of the guesser.
+'''
+
+import os
+import errno
+import select
+import timeit
+
+
+class BlockReader(object):
+    ''' Reads the candidates from a pipe in large blocks instead of line by line and yields them in batches.
+    Every block is split with a single str.split(), the partial line at its end is carried over to the next block.
+    The raw blocks can be processed as well (see blocks()), e.g. to have them split by worker processes.
+
+    :param fd: File descriptor of the candidate stream (e.g. sys.stdin.fileno()).
+    :param block_size: Amount of bytes read from the stream at once.
+    :param batch_size: Amount of candidates per batch (the analysis_interval); only the last batch may be smaller.
+    :param limit: Maximum amount of candidates to read (None = read until the end of the stream).
+    :param metrics: StageMetrics of the analysis (None = not instrumented).
+    :param skip: Amount of candidates at the beginning of the stream that are discarded (e.g. analyzed before a checkpoint).
+    :param idle: Function called before every read and every [idle_interval] seconds while waiting for data (None = the reads just block).
+    '''
+
+    IDLE_INTERVAL = 1.0                 # seconds waited for data before [idle] is called again
+
+    def __init__(self, fd, block_size, batch_size, limit=None, metrics=None, skip=0, idle=None):
+        ''' Constructor.
+        '''
+        self.fd = fd
+        self.block_size = block_size
+        self.batch_size = batch_size
+        if limit is not None and limit < 1:
+            limit = None                # never reached by the line-by-line intake either
+        self.limit = limit
+        self.metrics = metrics
+        self.skip = skip
+        self.count = 0                  # amount of candidates read so far
+        self.limit_reached = False      # True as soon as [limit] candidates have been read
+        self.idle = idle
+        self.poll = None
+        if idle is not None:
+            self.poll = select.poll()
+            self.poll.register(fd, select.POLLIN | select.POLLPRI)
+
+
+    def read(self):
+        ''' Reads the next block from the stream ('' at the end of the stream).
+        '''
+        start = timeit.default_timer()
+        while True:
+            try:
+                if self.idle is not None:
+                    self.idle()
+                    if not self.poll.poll(self.IDLE_INTERVAL * 1000):
+                        continue                        # no data yet
+                data = os.read(self.fd, self.block_size)
+                if self.metrics is not None:
+                    self.metrics.read_wait += timeit.default_timer() - start
+                return data
+            except (OSError, select.error), e:
+                if e.args[0] != errno.EINTR:            # retry reads interrupted by a signal
+                    raise
+
+
+    def discard(self):
+        ''' Discards the first [skip] candidates of the stream. The newlines are counted per block, only the last block is searched.
+
+        :return: The data of the last block behind the discarded candidates.
+        '''
+        skip = self.skip
+        self.skip = 0
+        while True:
+            data = self.read()
+            if not data:
+                return ''
+            lines = data.count('\n')
+            if lines < skip:
+                skip -= lines
+                continue
+            end = -1
+            for _ in xrange(skip):
+                end = data.find('\n', end + 1)
+            return data[end + 1:]
+
+
+    def blocks(self):
+        ''' Generator. Yields blocks of complete lines (each ending with a newline), [limit] candidates at most.
+        '''
+        carry = ''                                      # incomplete last line of the previous block
+        pending = self.discard() if self.skip else ''   # rest of the block of the last discarded candidate
+        while not self.limit_reached:
+            data = pending or self.read()
+            pending = ''
+            if not data:
+                break
+            end = data.rfind('\n') + 1
+            if end == 0:
+                carry += data                           # no complete line in the data yet
+                continue
+            block = carry + data[:end]
+            carry = data[end:]
+            count = block.count('\n')
+            if self.limit is not None and self.count + count >= self.limit:
+                count = self.limit - self.count         # candidates exceeding the limit are dropped
+                block = '%s\n' % '\n'.join(block.split('\n', count)[:count])
+                carry = ''
+                self.limit_reached = True
+            self.count += count
+            if self.metrics is not None:
+                self.metrics.add(count, len(block))
+            yield block
+        if carry:
+            # unterminated last line, its last character is cut off like in the line-by-line intake ('candidate[:-1]')
+            self.count += 1
+            if self.limit is not None and self.count >= self.limit:
+                self.limit_reached = True
+            if self.metrics is not None:
+                self.metrics.add(1, len(carry))
+            yield '%s\n' % carry[:-1]
+
+
+    def __iter__(self):
+        ''' Generator. Yields lists of candidates (without the trailing newline).
+        '''
+        batch_size = self.batch_size
+        pending = list()                                # candidates not yet yielded (less than batch_size)
+        for block in self.blocks():
+            lines = block.split('\n')
+            lines.pop()                                 # empty string behind the last newline
+            if pending:
+                pending.extend(lines)
+            else:
+                pending = lines
+            pos = 0
+            while len(pending) - pos >= batch_size:
+                yield pending[pos:pos+batch_size]
+                pos += batch_size
+            pending = pending[pos:]
+        if pending:
+            yield pending
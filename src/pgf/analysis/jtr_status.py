@@ -0,0 +1,60 @@
+'''
+This module provides the decoder of the lines JtR prints to stderr while evaluating the candidates of a hash job
+(status lines printed by the '--external=AutoStatus' mode, session lines and other messages).
+'''
+
+import re
+
+STATUS = 'status'                               # e.g. '736g 4008p 0:00:00:04  152.0g/s 828.0p/s 828.0c/s 885086C/s carama..marcia'
+COMPLETED = 'completed'                         # 'Session completed': all hashes cracked or the candidates are exhausted
+ABORTED = 'aborted'                             # 'Session aborted', 'Session stopped (max run-time reached)', ...
+OTHER = 'other'                                 # 'Loaded 1000 password hashes ...', warnings, ...
+
+SUFFIXES = {'': 1, 'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9, 'T': 10 ** 12}     # JtR shortens large counters, e.g. '4008Kp'
+
+STATUS_RE = re.compile(r'(\d+(?:\.\d+)?)([KMGT]?)g\s+(\d+(?:\.\d+)?)([KMGT]?)p\s')
+
+
+class StatusLine(object):
+    ''' Decoded line of JtR.
+
+    :param kind: STATUS, COMPLETED, ABORTED or OTHER.
+    :param cracked: Amount of cracked hashes (status lines only, else None).
+    :param candidates: Amount of candidates processed by JtR (status lines only, else None). Shortened counters (e.g. '4008K')
+                       are a lower bound of the exact amount.
+    :param line: The line printed by JtR.
+    '''
+
+    __slots__ = ('kind', 'cracked', 'candidates', 'line')
+
+    def __init__(self, kind, cracked, candidates, line):
+        ''' Constructor.
+        '''
+        self.kind = kind
+        self.cracked = cracked
+        self.candidates = candidates
+        self.line = line
+
+
+def to_int(value, suffix):
+    ''' Returns the counter [value] ('4008', '4.5') shortened by [suffix] ('', 'K', 'M', ...) as integer.
+    '''
+    if '.' in value:
+        return int(float(value) * SUFFIXES[suffix])
+    return int(value) * SUFFIXES[suffix]
+
+
+def decode_status_line(line):
+    ''' Decodes a line printed by JtR (each line is matched only once).
+
+    :return: StatusLine
+    '''
+    match = STATUS_RE.match(line)
+    if match is not None:
+        cracked, cracked_suffix, candidates, candidates_suffix = match.groups()
+        return StatusLine(STATUS, to_int(cracked, cracked_suffix), to_int(candidates, candidates_suffix), line)
+    if line.startswith('Session '):
+        if line.startswith('Session completed'):
+            return StatusLine(COMPLETED, None, None, line)
+        return StatusLine(ABORTED, None, None, line)
+    return StatusLine(OTHER, None, None, line)
@@ -0,0 +1,68 @@
+'''
+This module provides the worker processes matching blocks of candidates against the leak in parallel.
+'''
+
+import signal
+import multiprocessing
+
+
+_index = None               # LeakIndex of the leak, inherited by the forked worker processes (copy-on-write, never written by the workers)
+_match = None               # function hashing and matching the candidates (built-in hash evaluator) or None for plaintext leaks
+
+
+def _init_worker():
+    ''' Initializes a worker process. SIGINT is handled by the analysis process only.
+    '''
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _match_block(block):
+    ''' Splits a block of candidates and matches them against the leak in a worker process.
+
+    :param block: String of candidates, each terminated by a newline.
+
+    :return: (Int, List, List): Amount of candidates in the block, the hits as (position in the block, position in the index) tuples
+             and the candidates of the hits if they are hashed (None for plaintext leaks).
+    '''
+    keys = block.split('\n')
+    keys.pop()                                      # empty string behind the last newline
+    if _match is None:
+        return len(keys), _index.match(keys), None
+    hits = _match(keys)
+    return len(keys), hits, [keys[pos] for pos, _ in hits]
+
+
+class MatchPool(object):
+    ''' Pool of worker processes matching blocks of candidates against the leak.
+    Every worker matches whole blocks against the complete index, which is shared with the analysis process
+    by forking the workers after the leak has been parsed. Only the hits are sent back, in the order of the blocks,
+    so the analysis process just has to do the bookkeeping of the cracked passwords.
+
+    :param index: LeakIndex of the leak.
+    :param processes: Amount of worker processes.
+    :param match: Function hashing a list of candidates and matching them against [index], if it holds the hashes of a hash leak
+                  (see hash_evaluator.get_matcher()).
+    '''
+
+    def __init__(self, index, processes, match=None):
+        ''' Constructor.
+        '''
+        global _index, _match
+        _index = index
+        _match = match
+        self.pool = multiprocessing.Pool(processes, _init_worker)
+
+
+    def imap(self, blocks):
+        ''' Matches the [blocks] (iterable of candidate strings, see BlockReader.blocks()).
+
+        :return: Iterator of (count, hits, candidates of the hits) per block, in the order of the blocks.
+        '''
+        return self.pool.imap(_match_block, blocks)
+
+
+    def close(self):
+        ''' Terminates the worker processes.
+        '''
+        self.pool.terminate()
+        self.pool.join()
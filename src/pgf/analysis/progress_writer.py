@@ -0,0 +1,120 @@
+'''
+This module provides the buffered writer of the progress file ('[output_file]_progress.csv') and of the statistics file
+('[output_file]_stats.json').
+'''
+
+import json
+import os
+import time
+
+
+class ProgressWriter(object):
+    ''' Writes the progress rows (guesses, cracked passwords, percentage) of a job.
+    The file is kept open, rows are buffered and flushed every [flush_interval] seconds and when the writer is closed.
+    Rows are flushed by write() and by poll(), which the analysis calls while it is waiting for input, so the buffered rows
+    are not held back while the guesser (or JtR) is stalled.
+    Optionally, the rows are thinned out logarithmically: only [rows_per_decade] rows are kept per power of ten of guesses,
+    so the file stays small for very long runs. The last row is always written.
+
+    Along with the rows, a snapshot of the statistics of the report of the job (see AnalysisScheme.get_statistics()) is written
+    to the statistics file at most every SNAPSHOT_INTERVAL seconds and when the writer is closed. The file is replaced atomically,
+    so it can be read at any time while the job is running.
+
+    :param path: Path of the progress file.
+    :param flush_interval: Seconds between two flushes of the buffered rows (None = flush every row).
+    :param rows_per_decade: Amount of rows kept per power of ten of guesses (None = keep all rows).
+    :param stats_file: Path of the statistics file (None = no snapshots).
+    '''
+
+    SNAPSHOT_INTERVAL = 1.0                     # minimum seconds between two snapshots of the statistics
+
+    def __init__(self, path, flush_interval=None, rows_per_decade=None, stats_file=None):
+        ''' Constructor.
+        '''
+        self.path = path
+        self.flush_interval = flush_interval
+        self.rows_per_decade = rows_per_decade
+        self.stats_file = stats_file
+        self.snapshot = None                    # callable returning the statistics (Dict), set by the analysis
+        self.last_snapshot = 0
+        self.f = open(path, 'a')
+        self.buffer = list()                    # rows not yet written to the file
+        self.last_flush = time.time()
+        self.next_guesses = 0                   # rows below this amount of guesses are skipped (thinning)
+        self.skipped_row = None                 # last skipped row, written when the writer is closed
+
+
+    def write(self, guesses, cracked_counter, percentage_cracked):
+        ''' Adds a row to the progress file.
+        '''
+        row = '%d,%d,%7.3f\n' % (guesses, cracked_counter, percentage_cracked)
+        if self.rows_per_decade is not None:
+            if guesses < self.next_guesses:
+                self.skipped_row = row
+                return
+            self.skipped_row = None
+            self.next_guesses = guesses * 10 ** (1.0 / self.rows_per_decade)
+        self.buffer.append(row)
+        if self.flush_interval is None or time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+
+    def flush(self):
+        ''' Writes the buffered rows to the file.
+        '''
+        if self.buffer:
+            self.f.write(''.join(self.buffer))
+            self.buffer = list()
+        self.f.flush()
+        self.last_flush = time.time()
+        if self.last_flush - self.last_snapshot >= self.SNAPSHOT_INTERVAL:
+            self.write_snapshot()
+
+
+    def poll(self):
+        ''' Flushes the buffered rows (and writes a snapshot of the statistics) if [flush_interval] seconds have passed
+        since the last flush.
+        '''
+        if not self.f.closed and time.time() - self.last_flush >= (self.flush_interval or 0):
+            self.flush()
+
+
+    def write_snapshot(self):
+        ''' Writes the current statistics to the statistics file (replaced atomically).
+        '''
+        if self.stats_file is None or self.snapshot is None:
+            return
+        tmp_file = '%s.tmp' % self.stats_file
+        with open(tmp_file, 'w') as f:
+            json.dump(self.snapshot(), f, sort_keys=True, indent=4)
+        os.rename(tmp_file, self.stats_file)
+        self.last_snapshot = time.time()
+
+
+    def get_state(self):
+        ''' Writes the buffered rows and returns the state of the writer for a checkpoint (size of the file and thinning state).
+        '''
+        self.flush()
+        return {'size': os.fstat(self.f.fileno()).st_size, 'next_guesses': self.next_guesses, 'skipped_row': self.skipped_row}
+
+
+    def restore(self, state):
+        ''' Restores the state of a checkpoint (see get_state()). The rows written after the checkpoint are removed from the file.
+        '''
+        self.buffer = list()
+        self.f.truncate(state['size'])
+        self.next_guesses = state['next_guesses']
+        self.skipped_row = state['skipped_row']
+
+
+    def close(self):
+        ''' Writes the remaining rows (including the last skipped one) and closes the file.
+        '''
+        if self.f.closed:
+            return
+        if self.skipped_row is not None:
+            self.buffer.append(self.skipped_row)
+            self.skipped_row = None
+        self.flush()
+        self.f.close()
+        self.write_snapshot()               # final statistics
@@ -0,0 +1,85 @@
+'''
+This module provides the class to analyse leaked password hashes with the built-in hash evaluator.
+'''
+
+from pgf.analysis.hash_evaluator import get_matcher
+from pgf.analysis.schemes.plaintext_analysis import PlaintextAnalysis
+
+
+class DigestAnalysis(PlaintextAnalysis):
+    ''' Analysis class for hashed password leaks evaluated by the built-in hash evaluator (see hash_evaluator).
+    The candidates are hashed and their digests are matched against the DigestIndex of the raw digests of the leak,
+    so the accounting is exactly the one of plaintext leaks (guess numbers, duplicates, occurrences per hash).
+    The cracked passwords are the candidates whose digests have been found.
+
+    Salted leaks (see HashSalted) are evaluated salt by salt: every candidate is hashed once per salt and matched against
+    the '[salt]$[hash]' keys of the leak, a cracked key counts the accounts sharing it ('occ').
+
+    :param hash_format: JtR name of the hash format (e.g. 'raw-md5', see hash_evaluator.FORMATS and SALTED_FORMATS).
+    :param salts: Dict {salt: amount of accounts} of a salted leak (see HashSalted.group_by_salt()), None for a DigestIndex.
+
+    See PlaintextAnalysis for the other parameters ([pws_multi] holds the raw digests).
+    '''
+
+    def __init__(self, label, pws_multi, pw_counter, error_counter, output_file, progress_file, plot_file, plot_series_file, hash_format, progress_writer=None, metrics=None, salts=None):
+        ''' Generator.
+        '''
+        PlaintextAnalysis.__init__(self, label, pws_multi, pw_counter, error_counter, output_file, progress_file, plot_file, plot_series_file, progress_writer, metrics)
+        self.logger.debug('Evaluating the candidates with the built-in %s evaluator' % hash_format)
+        self.salts = salts
+        self.accounts = sum(salts.itervalues()) if salts else 0                 # accounts of all salts
+        self.max_accounts = max(salts.itervalues()) if salts else 0             # accounts of the largest salt
+        if salts is not None:
+            self.logger.debug('Hashing every candidate once per salt: %d salts for %d accounts' % (len(salts), pw_counter))
+        self.match = get_matcher(hash_format, pws_multi, None if salts is None else sorted(salts))     # candidates --> hits
+        self.plaintexts = dict()                # position in the LeakIndex --> candidate, for the hits not yet booked
+
+
+    def process_candidates(self, candidate_block):
+        ''' Hashes a block of candidates and matches their digests against the leak.
+
+        :param candidate_block: list-type collection of password candidates received by the server.
+        '''
+        hits = self.match(candidate_block)
+        self.add_plaintexts(hits, [candidate_block[pos] for pos, _ in hits])
+        self.process_hits(hits, len(candidate_block))
+        self.write_progress()
+
+
+    def add_plaintexts(self, hits, plaintexts):
+        ''' Stores the candidates of the [hits] of the next candidates, before the hits are processed (see process_hits()).
+
+        :param hits: List of (position among the candidates, position in the LeakIndex) tuples.
+        :param plaintexts: List of the candidates of the hits.
+        '''
+        lookups = self.pws_multi.lookups
+        for (_, idx), plaintext in zip(hits, plaintexts):
+            if lookups[idx] == 0:
+                self.plaintexts.setdefault(idx, plaintext)
+
+
+    def cracked_key(self, idx):
+        ''' Returns the candidate that cracked the hash at position [idx] of the LeakIndex.
+        '''
+        return self.plaintexts.pop(idx)
+
+
+    def get_occurrences(self, pw):
+        ''' Returns the amount of occurrences of the hash of the cracked password [pw] in the leak (accounts of all salts).
+        '''
+        return sum(self.pws_multi.occ[idx] for _, idx in self.match([pw]))
+
+
+    def evaluation_report(self):
+        ''' Returns the report lines of the work of the evaluation of a salted leak (hashes per salt).
+        '''
+        if self.salts is None:
+            return list()
+        output = list()
+        output.append("")
+        output.append("                   Salts: %15s" % '{:,}'.format(len(self.salts)))
+        output.append("  Max. accounts per salt: %15s" % '{:,}'.format(self.max_accounts))
+        output.append("         Hashes per salt: %15s (each candidate is hashed once per salt)" % '{:,}'.format(self.guesses))
+        output.append("         Hashes computed: %15s (instead of %s when hashing once per account)" % ('{:,}'.format(self.guesses * len(self.salts)),
+                                                                                                   '{:,}'.format(self.guesses * self.accounts)))
+        return output
@@ -0,0 +1,68 @@
+'''
+This module provides the class to analyse the candidates of a guesser shared by a job group.
+'''
+
+from pgf.log.logger import Logger
+
+
+class GroupAnalysis(object):
+    ''' Fans the candidates of a single guesser out to the analysis schemes of the jobs of a job group
+    (jobs with the same guesser configuration but different leaks, see ConfigHelper.group_jobs()).
+    Every block of candidates is matched once against the MultiLeakIndex of all leaks, the hits are split by leak
+    and passed to the scheme of the job. Every job writes its own progress file, plot series and report,
+    exactly as if its guesser had been run on its own.
+
+    :param schemes: List of the PlaintextAnalysis schemes of the jobs, in the order of the leaks of [index].
+    :param index: MultiLeakIndex of the leaks of the jobs.
+    '''
+
+    def __init__(self, schemes, index):
+        ''' Generator.
+        '''
+        # Initiate logger
+        self.logger = Logger()
+        self.logger.basicConfig('DEBUG')                     # set logger level to DEBUG
+
+        self.logger.debug('Starting Group Analysis of %d jobs' % len(schemes))
+
+        self.schemes = schemes
+        self.index = index
+
+
+    def process_candidates(self, candidate_block):
+        ''' Matches a block of candidates against all leaks and writes the progress of every job.
+
+        :param candidate_block: list-type collection of password candidates received by the server.
+        '''
+        self.process_hits(self.index.match(candidate_block), len(candidate_block))
+        self.write_progress()
+
+
+    def process_hits(self, hits, count):
+        ''' Passes the hits of the next [count] candidates to the schemes of the jobs.
+
+        :param hits: List of (position among the candidates, position in the MultiLeakIndex) tuples.
+        :param count: Amount of candidates.
+        '''
+        for scheme, scheme_hits in zip(self.schemes, self.index.split(hits)):
+            scheme.process_hits(scheme_hits, count)
+
+
+    def write_progress(self):
+        ''' Writes the current status into the progress files of the jobs.
+        '''
+        for scheme in self.schemes:
+            scheme.write_progress()
+
+
+    def parse_jtr_pot_file(self):
+        ''' Required for hash analysis, but will be called from analysis.py.execute for plaintext as well.
+        '''
+        pass
+
+
+    def gen_report(self):
+        ''' Generates the analysis results of every job.
+        '''
+        for scheme in self.schemes:
+            scheme.gen_report()
@@ -7,10 +7,13 @@ This module provides the class to analyse leaked password hashes.
 :contact: robin.flume@rub.de
 '''
 
-import re
 import os
 import time
+from bisect import bisect_right, insort
+from collections import deque
 from pgf.log.logger import Logger
+from pgf.analysis.progress_writer import ProgressWriter
+from pgf.analysis.char_classes import CATEGORIES, classify
 from pgf.analysis.schemes.scheme_template import AnalysisScheme
 
 
@@ -18,7 +21,7 @@ class HashAnalysis(AnalysisScheme):
     ''' Analysis class for hashed password leaks.
 
     :param label: Label of the current job
-    :param pws_multi: Dict of passwords/hashes (key) and as values another dict of two counters. 
+    :param pws_multi: LeakIndex of passwords/hashes (key) providing a dict-like entry of counters per key.
     One for the occurrences of the pw/hash in the leak ('occ') and one to count the lookups ('lookups')
     by the analysis module (^=amount of duplicately generated candidate)
     :param pw_counter: Counter of overall passwords in the leak
@@ -26,10 +29,15 @@ class HashAnalysis(AnalysisScheme):
     :param jtr_pot_file: '.pot' file of JtR to parse for cracked candidates.
     :param output_file: Path to the output file.
     :param progress_file: Path to the progress file
-    :param plot_file: Path to the plot file
+    :param plot_file: Path to the plot file (header line with the x-axis values)
+    :param plot_series_file: Path to the file the plot values of the job are appended to
+    :param progress_writer: ProgressWriter of the progress file (None = every row is written immediately)
+    :param metrics: StageMetrics of the analysis, summarized in the report (None = the pipeline is not instrumented)
+    :param locate_cracks: True if the cracked passwords are added with their guess numbers while cracking (see add_crack()), so the
+    progress and plot files hold the hashes cracked by exactly the processed candidates. Otherwise the counter of JtR is used.
     :param analysis_interval: Analysis interval to update the progress file.
     '''
-    def __init__(self, label, pws_multi, pw_counter, error_counter, jtr_pot_file, output_file, progress_file, plot_file, analysis_interval):
+    def __init__(self, label, pws_multi, pw_counter, error_counter, jtr_pot_file, output_file, progress_file, plot_file, analysis_interval, plot_series_file, progress_writer=None, metrics=None, locate_cracks=False):
         ''' Generator.
         '''
         # Initiate logger
@@ -43,32 +51,31 @@ class HashAnalysis(AnalysisScheme):
         self.jtr_pot_file = jtr_pot_file
         self.output_file = output_file
         self.progress_file = progress_file
+        self.progress_writer = progress_writer or ProgressWriter(progress_file)
         self.plot_file = plot_file
+        self.plot_series_file = plot_series_file
+        self.metrics = metrics
+        self.locate_cracks = locate_cracks
 
         self.analysis_interval = analysis_interval
         self.interval_counter = 0
 
-        self.pws_multi = pws_multi                  # Dict to store the passwords from the file including an occurence-counter for each password
+        self.pws_multi = pws_multi                  # LeakIndex to store the passwords from the file including an occurence-counter for each password
         self.pw_counter = pw_counter                # counter for the amount of passwords (hashes) in the leak
         self.pws_unique_counter = 0                 # counter for the amount of unique passwords (hashes) in the leak
         self.guesses = 0                            # counter for the candidates
         self.cracked_counter = 0                    # counter for the no. of cracked passwords (multi)
         self.error_counter = error_counter          # counter for the errors occuring during the file-parsing
         self.cracked_pws = {}                       # Dict to store the cracked passwords and the number of guesses to crack the pw
+        self.crack_guesses = list()                 # sorted guess numbers of the cracked hashes (see add_crack())
+        self.last_crack = 0                         # highest guess number of the cracked hashes
+        self.pending_guesses = deque()              # (candidates, cracked) of the status lines not written to the progress yet
+        self.window_start = 0                       # cracks of the candidates before it can no longer be located (see CrackLocator)
         self.x_axis_values = list()                 # List to store the intervals for the plot file
 
-        # Definitions of regular expressions to parse the JtR status lines
-        self.guesses_re = re.compile('[0-9]*p')
-        self.cracked_counter_re = re.compile('^[0-9]*')
-
-        # Declaration of counters for analysis of cracked pws
-        self.only_letters_counter = 0
-        self.only_digits_counter = 0
-        self.only_symbols_counter = 0
-        self.letters_digits_counter = 0
-        self.letters_symbols_counter = 0
-        self.digits_symbols_counter = 0
-        self.letters_digits_symbols_counter = 0
+        # Declaration of counters for analysis of cracked pws (updated whenever a pw is cracked, see add_cracked_pw())
+        self.category_counters = dict.fromkeys(CATEGORIES, 0)     # category (e.g. 'only_letters', see char_classes) --> amount of cracked pws
+        self.char_counters = [0, 0, 0, 0]       # length, letters, digits and symbols of the cracked pws
 
         # Declarations for the calculation of average char occurences
         self.avg_length = 0.0
@@ -76,10 +83,13 @@ class HashAnalysis(AnalysisScheme):
         self.avg_digits = 0.0
         self.avg_symbols = 0.0
 
+        self.count_unique_hashes()              # the leak does not change during the analysis
+
         # Parse the values written into the plot file by the Preparation module.
         self.parse_x_axis_values()
-        # Write guesser label to file
-        self.write_line_to_file(self.plot_file, "%s,0.000" % self.label)
+        # Write guesser label to the plot series file
+        with open(self.plot_series_file, 'w') as f:
+            f.write("%s,0.000" % self.label)
 
 
     def write_line_to_file(self, path, lines):
@@ -114,47 +124,87 @@ class HashAnalysis(AnalysisScheme):
 
 
     def update_plot_file(self, percentage):
-        ''' Appends the provided value (percentage) to the last line of the plotfile.
+        ''' Appends the provided value (percentage) to the plot series file of the job (row of the plot file).
         '''
-        with open(self.plot_file, 'r') as f:
-            lines = f.readlines()
-        last_line = lines[len(lines)-1][:-1]  #.replace('\n', '')       # get last line and remove '\n'
-        last_line_new = "%s,%s\n" % (last_line, "%.3f" % percentage)    # append value to last line in file
-        lines[len(lines)-1] = last_line_new                             # update last line
-        with open(self.plot_file, 'w') as f:                            # write lines back to file
-            for line in lines:
-                f.write(line)
+        with open(self.plot_series_file, 'a') as f:
+            f.write(",%.3f" % percentage)
 
 
-    def process_status_line(self, line):
+    def process_status_line(self, status):
         ''' Processes the status lines of JtR.
         Received lines will look like this: '736g 4008p 0:00:00:04  152.0g/s 828.0p/s 828.0c/s 885086C/s carama..marcia'
-        
-        :param line: ONE status line, received by the analysos.py.exeute() method.
+
+        :param status: ONE status line decoded by the analysis.py.execute() method (see jtr_status.StatusLine).
         '''
-        # parse amount of processed candidates
-        temp = self.guesses_re.findall(line)[0]                         # get '4008p'
-        temp = temp[:-4] + '000'                                         # remove p and replace 8 by 0 (and resepctively '4' and '12')
-        self.guesses = int(temp)                                        # cast '4000' to int
-        try:
-            # parse amount of cracked pws
-            self.cracked_counter = int(self.cracked_counter_re.findall(line)[0])
-        except ValueError:
-            self.logger.debug("A parsing error occured for JtR terminal-line <%s>" % line)
-        # calculate the percentage of cracked passwords BEFORE entire block is processed
-        percentage_cracked = float(self.cracked_counter)/float(self.pw_counter)*100
-        try:
-            if self.guesses == self.x_axis_values[0]:
-                self.update_plot_file(percentage_cracked)               # update plotfile
-                self.x_axis_values.pop(0)                               # remove value already written value for
-        except IndexError:      # silently ignore 'Index Out of Range' errors if more candidates are generated than specified for the x_axis of the plotfile
-            pass
+        self.guesses = status.candidates                                # amount of processed candidates
+        self.cracked_counter = status.cracked                           # amount of cracked pws
+        if self.locate_cracks:
+            # JtR reports the cracked passwords with a delay, the progress is written when they are known (see add_crack())
+            self.pending_guesses.append((self.guesses, self.cracked_counter))
+            self.write_located_progress()
+        else:
+            self.update_progress(self.guesses)
+
+
+    def update_progress(self, guesses):
+        ''' Updates the plot and progress file with the hashes cracked by the first [guesses] candidates.
+        '''
+        # calculate the percentage of the hashes cracked by the first [guesses] candidates
+        percentage_cracked = float(self.count_cracked(guesses))/float(self.pw_counter)*100
+        # the status lines hardly ever hit an x-axis value exactly, so the plot is updated for all values passed by [guesses]
+        while self.x_axis_values and guesses >= self.x_axis_values[0]:
+            x_axis_value = self.x_axis_values.pop(0)                    # remove value already written value for
+            self.update_plot_file(float(self.count_cracked(x_axis_value))/float(self.pw_counter)*100)     # update plotfile
         # update progress_file
-        if self.guesses >= (self.analysis_interval * self.interval_counter):
+        if guesses >= (self.analysis_interval * self.interval_counter):
             self.interval_counter += 1
             # write the current status into the file '[output_file]_progress.txt'
-            status_line = '%d,%d,%7.3f\n' % (self.guesses, self.cracked_counter, percentage_cracked)
-            self.write_line_to_file(self.progress_file, str(status_line))
+            self.progress_writer.write(guesses, self.count_cracked(guesses), percentage_cracked)
+
+
+    def write_located_progress(self, complete=False):
+        ''' Updates the progress for the pending status lines whose cracked passwords are known, i.e. as many cracks have been
+        located up to the status line as JtR counted in it, a password cracked behind it has been reported by JtR, or its
+        candidates have left the window of the CrackLocator (or JtR is done if [complete] is True).
+        '''
+        pending_guesses = self.pending_guesses
+        while pending_guesses:
+            guesses, cracked = pending_guesses[0]
+            if not (complete or guesses < self.last_crack or guesses < self.window_start or self.count_cracked(guesses) >= cracked):
+                break
+            pending_guesses.popleft()
+            self.update_progress(guesses)
+
+
+    def set_window_start(self, window_start):
+        ''' Sets the first candidate of the window of the CrackLocator and writes the progress of the status lines before it.
+        '''
+        self.window_start = window_start
+        self.write_located_progress()
+
+
+    def add_crack(self, pw, guess_number):
+        ''' Adds a hash cracked by JtR (see CrackLocator).
+
+        :param pw: Cracked password.
+        :param guess_number: Position of the password in the candidate stream.
+        '''
+        insort(self.crack_guesses, guess_number)                        # the cracks arrive (almost) in order of their guess numbers
+        if pw not in self.cracked_pws:
+            self.add_cracked_pw(pw)
+        if guess_number < self.cracked_pws.get(pw, guess_number + 1):
+            self.cracked_pws[pw] = guess_number                         # several hashes (salts) may be cracked by the same password
+        if guess_number > self.last_crack:
+            self.last_crack = guess_number
+            self.write_located_progress()
+
+
+    def count_cracked(self, guesses):
+        ''' Returns the amount of hashes cracked by the first [guesses] candidates (JtR's counter if the cracks are not located).
+        '''
+        if not self.locate_cracks:
+            return self.cracked_counter
+        return bisect_right(self.crack_guesses, guesses)
 
 
     def process_candidates(self):
@@ -165,12 +215,15 @@ class HashAnalysis(AnalysisScheme):
 
     def parse_jtr_pot_file(self):
         ''' Parse the PGF.pot file of JtR to determine which passwords have been cracked.
+        The guess numbers of the passwords reported by JtR while cracking are kept (see add_crack()).
         '''
         with open(self.jtr_pot_file, 'r') as f:
             for line in f:
                 splitline = line.split(':')
                 pw = ':'.join(splitline[1:])[:-1]                       # get last element of split-list ('pw\n') and remove '\n'
-                self.cracked_pws[pw] = 0                                # add the candidate and a 0 for its guessing no. as not guessing-no. can be determined from the '.pot' file
+                if pw not in self.cracked_pws:
+                    self.add_cracked_pw(pw)
+                    self.cracked_pws[pw] = 0                            # add the candidate and a 0 for its guessing no. if JtR has not reported it while cracking
                 if len(self.cracked_pws) == self.cracked_counter:       # only read the cracked amount of pws from the jtr pot file
                     break
 
@@ -178,54 +231,20 @@ class HashAnalysis(AnalysisScheme):
     def count_unique_hashes(self):
         ''' Counts the total amount of unique hashes in the leak.
         '''
-        self.pws_unique_counter = 0                                     # reset prior to counting
-        for _, value in self.pws_multi.items():
-            if value['occ'] == 1:
-                self.pws_unique_counter += 1
-
-
-    def categorize_pws(self):
-        ''' Process the cracked passwords and categorize them.
-        The function sorts the pws by:
-        --> letters only
-        --> digits only
-        --> symbols only
-        --> includes letters and digits
-        --> includes letters and symbols
-        --> includes letters, digits and symbols
+        self.pws_unique_counter = self.pws_multi.occ.count(1)           # count the keys with a single occurrence directly in the occ-array
+
+
+    def add_cracked_pw(self, pw, occ=1, new=True):
+        ''' Updates the category and character counters with a cracked pw (counted once, the occurrences of its hash are unknown).
         '''
-        # Declaration of regular expressions
-        only_letters_re = re.compile('^[a-zA-Z]*$')
-        only_digits_re = re.compile('^[0-9]*$')
-        only_symbols_re = re.compile('^[\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        letters_digits_re = re.compile('^[a-zA-Z0-9]*$')
-        letters_symbols_re = re.compile('^[a-zA-Z\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        digits_symbols_re = re.compile('^[0-9\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        letters_digits_symbols_re = re.compile('^[a-zA-Z0-9\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-
-        # Start analysis of characters in the cracked pws
-        for pw in self.cracked_pws.iterkeys():
-            if only_letters_re.search(pw):
-                self.only_letters_counter += 1
-                continue
-            if only_digits_re.search(pw):
-                self.only_digits_counter += 1
-                continue
-            if only_symbols_re.search(pw):
-                self.only_symbols_counter += 1
-                continue
-            if letters_digits_re.search(pw):
-                self.letters_digits_counter += 1
-                continue
-            if letters_symbols_re.search(pw):
-                self.letters_symbols_counter += 1
-                continue
-            if digits_symbols_re.search(pw):
-                self.digits_symbols_counter += 1
-                continue
-            if letters_digits_symbols_re.search(pw):
-                self.letters_digits_symbols_counter += 1
-                continue
+        category, letters, digits, symbols = classify(pw)
+        if new and category is not None:
+            self.category_counters[category] += 1
+        char_counters = self.char_counters
+        char_counters[0] += len(pw) * occ
+        char_counters[1] += letters * occ
+        char_counters[2] += digits * occ
+        char_counters[3] += symbols * occ
 
 
     def calc_average_chars(self):
@@ -234,26 +253,9 @@ class HashAnalysis(AnalysisScheme):
         --> digits
         --> symbols
         '''
-        #  Declaration of regular expressions
-        letters_re = re.compile('[a-zA-Z]')
-        digits_re = re.compile('[0-9]')
-        symbols_re = re.compile('[\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]')
-
-        # Counter declarations
-        length_counter = 0
-        letters_counter = 0
-        digits_counter = 0
-        symbols_counter = 0
-
-        # iterate through all cracked pws (and the counters per pw)
-        for pw in self.cracked_pws.iterkeys():
-            length_counter += len(pw)                   # add length of pw to counter
-            # add (no. of found chars in pw * counter of pw occurrance) to the counters
-            letters_counter += len(letters_re.findall(pw))
-            digits_counter += len(digits_re.findall(pw))
-            symbols_counter += len(symbols_re.findall(pw))
-
-        # calc. the average(s)
+        length_counter, letters_counter, digits_counter, symbols_counter = self.char_counters
+
+        # calc. the averages
         try:
             self.avg_length = float(length_counter) / float(self.cracked_counter)
             self.avg_letters = float(letters_counter) / float(self.cracked_counter)
@@ -263,6 +265,25 @@ class HashAnalysis(AnalysisScheme):
             pass
 
 
+    def get_statistics(self):
+        ''' Returns a snapshot of the statistics of the report (see ProgressWriter.write_snapshot()), the counters are kept up to date while cracking.
+
+        :return: Dict of the counters and averages.
+        '''
+        self.calc_average_chars()
+        return {'label': self.label,
+                'pw_counter': self.pw_counter,
+                'pws_unique_counter': self.pws_unique_counter,
+                'error_counter': self.error_counter,
+                'guesses': self.guesses,
+                'cracked_counter': self.cracked_counter,
+                'cracked_pws': len(self.cracked_pws),
+                'categories': self.category_counters,
+                'avg_length': self.avg_length,
+                'avg_letters': self.avg_letters,
+                'avg_digits': self.avg_digits,
+                'avg_symbols': self.avg_symbols}
+
 
     def execute_analysis_plugins(self):
         ''' Searches the 'analysis_plugins' folder for scripts to execute along with the default analysis modules.
@@ -299,11 +320,11 @@ class HashAnalysis(AnalysisScheme):
         ''' Generates, edits and self.logger.debugs the analysis results.
         '''
         self.logger.debug("Generating analysis results. This may take a while!")
-
-        self.parse_jtr_pot_file()           # parse pot file of JtR
-        self.count_unique_hashes()          # call analysis function prior to printing the result below
-        self.categorize_pws()               # call analysis function prior to printing the results below
-        self.calc_average_chars()           # call analysis function prior to printing the results below
+        self.write_located_progress(complete=True)  # JtR is done
+        self.cracked_counter = self.count_cracked(self.guesses)    # without the hashes cracked behind 'terminate_guessing'
+        self.parse_jtr_pot_file()           # parse pot file of JtR (the cracked pws not reported while cracking)
+        self.progress_writer.close()        # write the buffered rows of the progress file and the final statistics
+        self.calc_average_chars()           # the counters are updated while cracking, see add_cracked_pw()
 
         output = list()                     # list of lines to write to the output file
 
@@ -321,19 +342,22 @@ class HashAnalysis(AnalysisScheme):
         output.append("")
         percentage_unique = (float(len(self.cracked_pws))/float(self.pw_counter)) * 100
         output.append("       Cracked hashes: %15s (%6.3f%%) (Multiple occurences cannot be determined from JtR output!)" % ('{:,}'.format(self.cracked_counter), percentage_unique))
-        output.append("-->  [a-Z           ]: %15s" % '{:,}'.format(self.only_letters_counter))
-        output.append("-->  [     0-9      ]: %15s" % '{:,}'.format(self.only_digits_counter))
-        output.append("-->  [          !?&%%]: %15s" % '{:,}'.format(self.only_symbols_counter))
-        output.append("-->  [a-Z  0-9      ]: %15s" % '{:,}'.format(self.letters_digits_counter))
-        output.append("-->  [a-Z       !?&%%]: %15s" % '{:,}'.format(self.letters_symbols_counter))
-        output.append("-->  [     0-9  !?&%%]: %15s" % '{:,}'.format(self.digits_symbols_counter))
-        output.append("-->  [a-Z  0-9  !?&%%]: %15s" % '{:,}'.format(self.letters_digits_symbols_counter))
+        output.append("-->  [a-Z           ]: %15s" % '{:,}'.format(self.category_counters['only_letters']))
+        output.append("-->  [     0-9      ]: %15s" % '{:,}'.format(self.category_counters['only_digits']))
+        output.append("-->  [          !?&%%]: %15s" % '{:,}'.format(self.category_counters['only_symbols']))
+        output.append("-->  [a-Z  0-9      ]: %15s" % '{:,}'.format(self.category_counters['letters_digits']))
+        output.append("-->  [a-Z       !?&%%]: %15s" % '{:,}'.format(self.category_counters['letters_symbols']))
+        output.append("-->  [     0-9  !?&%%]: %15s" % '{:,}'.format(self.category_counters['digits_symbols']))
+        output.append("-->  [a-Z  0-9  !?&%%]: %15s" % '{:,}'.format(self.category_counters['letters_digits_symbols']))
         output.append("")
         output.append("      Averages per pw:")
         output.append("               length: %15.2f" % self.avg_length)
         output.append("              letters: %15.2f" % self.avg_letters)
         output.append("               digits: %15.2f" % self.avg_digits)
         output.append("              symbols: %17.4f" % self.avg_symbols)
+        if self.metrics is not None:
+            output.append("")
+            output.extend(self.metrics.report())    # throughput and blocked time of the stages of the pipeline
         output.append("\n")
 
         # write analysis results to file
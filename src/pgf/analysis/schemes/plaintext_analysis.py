@@ -7,27 +7,32 @@ This module provides the class to analyse plaintext passwords.
 @conatct: robin.flume@rub.de
 '''
 
-import re
 import os
 import time
+from array import array
 from pgf.log.logger import Logger
+from pgf.analysis.progress_writer import ProgressWriter
+from pgf.analysis.char_classes import CATEGORIES, classify
 from pgf.analysis.schemes.scheme_template import AnalysisScheme
 
 class PlaintextAnalysis(AnalysisScheme):
     ''' Analysis class for plaintext password leaks.
 
     :param label: Label of the current job
-    :param pws_multi: Dict of passwords/hashes (key) and as values another dict of two counters. 
+    :param pws_multi: LeakIndex of passwords/hashes (key) providing a dict-like entry of counters per key.
     One for the occurrences of the pw/hash in the leak ('occ') and one to count the lookups ('lookups')
     by the analysis module (^=amount of duplicately generated candidate)
     :param pw_counter: Counter of overall passwords in the leak
     :param error_counter: Amount parsing errors
     :param output_file: Path to the output file.
     :param progress_file: Path to the progress file
-    :param plot_file: Path to the plot file
+    :param plot_file: Path to the plot file (header line with the x-axis values)
+    :param plot_series_file: Path to the file the plot values of the job are appended to
+    :param progress_writer: ProgressWriter of the progress file (None = every row is written immediately)
+    :param metrics: StageMetrics of the analysis, summarized in the report (None = the pipeline is not instrumented)
     '''
 
-    def __init__(self, label, pws_multi, pw_counter, error_counter, output_file, progress_file, plot_file):
+    def __init__(self, label, pws_multi, pw_counter, error_counter, output_file, progress_file, plot_file, plot_series_file, progress_writer=None, metrics=None):
         ''' Generator.
         '''
         # Initiate logger
@@ -40,9 +45,12 @@ class PlaintextAnalysis(AnalysisScheme):
 
         self.output_file = output_file
         self.progress_file = progress_file
+        self.progress_writer = progress_writer or ProgressWriter(progress_file)
         self.plot_file = plot_file
+        self.plot_series_file = plot_series_file
+        self.metrics = metrics
 
-        self.pws_multi = pws_multi              # Dict to store the passwords from the file including an occurence-counter for each password
+        self.pws_multi = pws_multi              # LeakIndex to store the passwords from the file including an occurence-counter for each password
         self.pw_counter = pw_counter            # counter for the amount of passwords in the leak
         self.pws_unique_counter = 0             # counter for the amount of unique passwords in the leak
         self.guesses = 0                        # counter for the candidates
@@ -54,14 +62,9 @@ class PlaintextAnalysis(AnalysisScheme):
         self.cracked_pws = {}                   # Dict to store the cracked passwords and the number of guesses to crack the pw
         self.x_axis_values = list()             # List to store the intervals for the plot file
 
-        # Declaration of counters for analysis of cracked pws
-        self.only_letters_counter = 0
-        self.only_digits_counter = 0
-        self.only_symbols_counter = 0
-        self.letters_digits_counter = 0
-        self.letters_symbols_counter = 0
-        self.digits_symbols_counter = 0
-        self.letters_digits_symbols_counter = 0
+        # Declaration of counters for analysis of cracked pws (updated whenever a pw is cracked, see add_cracked_pw())
+        self.category_counters = dict.fromkeys(CATEGORIES, 0)     # category (e.g. 'only_letters', see char_classes) --> amount of cracked pws
+        self.char_counters = [0, 0, 0, 0]       # length, letters, digits and symbols of the cracked pws (multiplied by their occurrences)
 
         # Declarations for the calculation of average char occurences
         self.avg_length = 0.0
@@ -69,10 +72,13 @@ class PlaintextAnalysis(AnalysisScheme):
         self.avg_digits = 0.0
         self.avg_symbols = 0.0
 
+        self.count_unique_pws()                 # the leak does not change during the analysis
+
         # Parse the values written into the plot file by the Preparation module.
         self.parse_x_axis_values()
-        # Write guesser label to file
-        self.write_line_to_file(self.plot_file, "%s,0.000" % self.label)
+        # Write guesser label to the plot series file
+        with open(self.plot_series_file, 'w') as f:
+            f.write("%s,0.000" % self.label)
 
 
     def write_line_to_file(self, path, lines):
@@ -107,48 +113,146 @@ class PlaintextAnalysis(AnalysisScheme):
 
 
     def update_plot_file(self, percentage):
-        ''' Appends the provided value (percentage) to the last line of the plotfile.
+        ''' Appends the provided value (percentage) to the plot series file of the job (row of the plot file).
         '''
-        with open(self.plot_file, 'r') as f:
-            lines = f.readlines()
-        last_line = lines[len(lines)-1][:-1]  #.replace('\n', '')       # get last line and remove '\n'
-        last_line_new = "%s,%s\n" % (last_line, "%.3f" % percentage)   # append value to last line in file
-        lines[len(lines)-1] = last_line_new                             # update last line
-        with open(self.plot_file, 'w') as f:                            # write lines back to file
-            for line in lines:
-                f.write(line)
+        with open(self.plot_series_file, 'a') as f:
+            f.write(",%.3f" % percentage)
 
 
     def process_candidates(self, candidate_block):
-        ''' Starts the analysis.
+        ''' Starts the analysis. The whole block is matched against the leak at once, the counters
+        and the plot file are only updated for the candidates which are part of the leak.
 
         :param candidate_block: list-type collection of password candidates received by the server.
         '''
-        for candidate in candidate_block:
-            self.guesses += 1                                                   # increment guessing counter
-            if candidate in self.pws_multi:                                     # did the candidate crack a password?
-                if self.pws_multi[candidate]['lookups'] == 0:                   # password has not yet been cracked
-                    self.pws_multi[candidate]['lookups'] += 1                   # increment lookup-counter --> candidate has already been received
-                    self.cracked_counter += self.pws_multi[candidate]['occ']    # add the amount of occurences in the leak of the cracked pw
-                    if self.pws_multi[candidate]['occ'] == 1:
-                        self.cracked_unique_counter += 1                        # increment counter of cracked pws that occured uniquely
-                    self.cracked_pws[candidate] = self.guesses                  # add the candidate and its guessing no. to the dict
-                else:
-                    self.pws_multi[candidate]['lookups'] += 1                   # increment lookup-counter --> candidate has already been received
-            try:
-                if self.guesses == self.x_axis_values[0]:
-                    # calculate the percentage of cracked passwords BEFORE entire block is processed
-                    percentage_cracked = float(self.cracked_counter)/float(self.pw_counter)*100
-                    self.update_plot_file(percentage_cracked)                   # update plotfile
-                    self.x_axis_values.pop(0)                                   # remove value already written value for
-            except IndexError:      # silently ignore 'Index Out of Range' errors if more candidates are generated than specified for the x_axis of the plotfile
-                pass
+        self.process_hits(self.pws_multi.match(candidate_block), len(candidate_block))
+        self.write_progress()
+
+
+    def process_hits(self, hits, count):
+        ''' Updates the counters and the plot file for the next [count] candidates.
+
+        :param hits: List of (position among the candidates, position in the LeakIndex) tuples of the candidates that are part of the leak.
+        :param count: Amount of candidates.
+        '''
+        start = self.guesses                                                    # amount of guesses before the candidates
+        pws_multi = self.pws_multi
+        lookups = pws_multi.lookups
+        plot_floor = start
+        for pos, idx in hits:                                                   # candidates that cracked a password
+            guess = start + pos + 1                                             # guessing no. of the candidate
+            plot_floor = self.update_plot_thresholds(plot_floor, guess - 1)     # plot values for the guesses before the candidate
+            if lookups[idx] == 0:                                               # password has not yet been cracked
+                lookups[idx] = 1                                                # increment lookup-counter --> candidate has already been received
+                self.cracked_counter += pws_multi.occ[idx]                      # add the amount of occurences in the leak of the cracked pw
+                if pws_multi.occ[idx] == 1:
+                    self.cracked_unique_counter += 1                            # increment counter of cracked pws that occured uniquely
+                pws_multi.guess[idx] = guess                                    # store the guessing no. in the index
+                pw = self.cracked_key(idx)
+                self.add_cracked_pw(pw, pws_multi.occ[idx], pw not in self.cracked_pws)
+                self.cracked_pws[pw] = guess                                    # add the candidate and its guessing no. to the dict
+            else:
+                lookups[idx] += 1                                               # increment lookup-counter --> candidate has already been received
+                self.add_duplicate(lookups[idx])
+        self.guesses = start + count                                            # increment guessing counter
+        self.update_plot_thresholds(plot_floor, self.guesses)
 
+
+    def cracked_key(self, idx):
+        ''' Returns the password cracked at position [idx] of the LeakIndex (the key itself for plaintext leaks).
+        '''
+        return self.pws_multi.key(idx)
+
+
+    def get_occurrences(self, pw):
+        ''' Returns the amount of occurrences of the cracked password [pw] in the leak.
+        '''
+        return self.pws_multi[pw]['occ']
+
+
+    def evaluation_report(self):
+        ''' Returns additional report lines on the evaluation of the candidates (none for plaintext leaks).
+        '''
+        return list()
+
+
+    def write_progress(self):
+        ''' Writes the current status into the progress file.
+        '''
         # calculate the percentage of cracked passwords at the end of any block processing to write it to the progress file
         percentage_cracked = float(self.cracked_counter)/float(self.pw_counter)*100
         # write the current status into the file '[output_file]_progress.txt'
-        status_line = '%d,%d,%7.3f\n' % (self.guesses, self.cracked_counter, percentage_cracked)
-        self.write_line_to_file(self.progress_file, str(status_line))
+        self.progress_writer.write(self.guesses, self.cracked_counter, percentage_cracked)
+
+
+    def update_plot_thresholds(self, plot_floor, guesses):
+        ''' Writes the plot values of all x-axis values reached by [guesses] to the plot file, the same way as
+        checking "guesses == x_axis_values[0]" after every single candidate: every guessing no. can only reach
+        the first remaining x-axis value, values not above [plot_floor] (already passed) are never reached.
+
+        :param plot_floor: Guessing no. up to which the x-axis values have already been checked.
+        :param guesses: Guessing no. up to which the x-axis values are checked.
+
+        :return: New plot floor.
+        '''
+        while self.x_axis_values and plot_floor < self.x_axis_values[0] <= guesses:
+            # calculate the percentage of cracked passwords BEFORE entire block is processed
+            percentage_cracked = float(self.cracked_counter)/float(self.pw_counter)*100
+            self.update_plot_file(percentage_cracked)                           # update plotfile
+            plot_floor = self.x_axis_values.pop(0)                              # remove value already written value for
+        return plot_floor
+
+
+    def get_checkpoint(self):
+        ''' Returns the state of the analysis for a checkpoint (see Checkpoint). Only the cracked passwords are stored,
+        so the cost of a checkpoint depends on the amount of cracked passwords, not on the size of the leak.
+
+        :return: (Dict, List): Counters and files of the job, arrays of the cracked passwords (keys, lookup counters, guessing no.).
+        '''
+        keys = self.cracked_pws.keys()
+        lookups = array('i', [self.pws_multi.lookups[self.pws_multi.find(key)] for key in keys])
+        guesses = array('l', [self.cracked_pws[key] for key in keys])
+        with open(self.plot_series_file, 'r') as f:
+            plot_series = f.read()
+        state = {'label': self.label,
+                 'pw_counter': self.pw_counter,
+                 'keys': len(self.pws_multi),
+                 'cracked': len(keys),
+                 'guesses': self.guesses,
+                 'cracked_counter': self.cracked_counter,
+                 'cracked_unique_counter': self.cracked_unique_counter,
+                 'x_axis_values': len(self.x_axis_values),      # amount of x-axis values not yet reached
+                 'plot_series': plot_series,
+                 'progress': self.progress_writer.get_state(),
+                 'files': {'output_file': self.output_file,
+                           'progress_file': self.progress_file,
+                           'plot_series_file': self.plot_series_file}}
+        return state, [array('c', '\n'.join(keys)), lookups, guesses]
+
+
+    def restore_checkpoint(self, state, arrays):
+        ''' Restores the state of a checkpoint (see get_checkpoint()). The progress and plot values written after the checkpoint are removed.
+        '''
+        if state['pw_counter'] != self.pw_counter or state['keys'] != len(self.pws_multi):
+            raise ValueError("The leak of the job <%s> has changed since the checkpoint!" % self.label)
+        keys, lookups, guesses = arrays
+        keys = keys.tostring().split('\n') if state['cracked'] > 0 else list()
+        for key, lookup, guess in zip(keys, lookups, guesses):
+            idx = self.pws_multi.find(key)
+            self.pws_multi.lookups[idx] = lookup
+            self.pws_multi.guess[idx] = guess
+            self.cracked_pws[key] = guess
+            self.add_cracked_pw(key, self.pws_multi.occ[idx])          # the statistics are rebuilt from the cracked pws
+            if lookup > 1:
+                self.duplicate_candidates += 1
+                self.duplicate_guesses_total += lookup
+        self.guesses = state['guesses']
+        self.cracked_counter = state['cracked_counter']
+        self.cracked_unique_counter = state['cracked_unique_counter']
+        self.x_axis_values = self.x_axis_values[len(self.x_axis_values) - state['x_axis_values']:]
+        with open(self.plot_series_file, 'w') as f:
+            f.write(state['plot_series'].encode('utf-8'))
+        self.progress_writer.restore(state['progress'])
 
 
     def parse_jtr_pot_file(self):
@@ -160,66 +264,35 @@ class PlaintextAnalysis(AnalysisScheme):
     def count_unique_pws(self):
         ''' Counts the total amount of unique passwords in the leak.
         '''
-        self.pws_unique_counter = 0                         # reset prior to counting
-        for _, value in self.pws_multi.items():
-            if value['occ'] == 1:
-                self.pws_unique_counter += 1
+        self.pws_unique_counter = self.pws_multi.occ.count(1)       # count the keys with a single occurrence directly in the occ-array
+
 
+    def add_duplicate(self, lookups):
+        ''' Counts a lookup of a cracked pw (candidate generated again by the guesser).
 
-    def count_duplicate_guesses(self):
-        ''' Counts the amount of pw candidates which have been genereated multiple times by the guesser
-        as well as the total amount of duplicates.
+        :param lookups: Lookup counter of the pw including this lookup.
         '''
-        for occ_lookups in self.pws_multi.itervalues():
-            lu_count = occ_lookups['lookups']
-            if lu_count > 1:                                # a lookup of 0 means 'pw uncracked'; 1 means 'pw_cracked'; 
-                                                            # >1 means 'candidate generated AT LEAST twice'
-                self.duplicate_candidates += 1              # increment counter for candidates that have been generated multiple times
-                self.duplicate_guesses_total += lu_count    # add amount of duplicate lookups to the counter                                                        
-
-
-    def categorize_pws(self):
-        ''' Process the cracked passwords and categorize them.
-        The function sorts the pws by:
-        --> letters only
-        --> digits only
-        --> symbols only
-        --> includes letters and digits
-        --> includes letters and symbols
-        --> includes letters, digits and symbols
+        if lookups == 2:
+            self.duplicate_candidates += 1          # counter for candidates that have been generated multiple times
+            self.duplicate_guesses_total += 2       # the total includes the first lookup of the candidate
+        else:
+            self.duplicate_guesses_total += 1
+
+
+    def add_cracked_pw(self, pw, occ, new=True):
+        ''' Updates the category and character counters with a cracked pw.
+
+        :param occ: Occurrences of the pw (of the cracked key) in the leak, the character counters are multiplied by them.
+        :param new: False if the pw has already cracked another key (e.g. with another salt), it is categorized only once.
         '''
-        # Declaration of regular expressions
-        only_letters_re = re.compile('^[a-zA-Z]*$')
-        only_digits_re = re.compile('^[0-9]*$')
-        only_symbols_re = re.compile('^[\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        letters_digits_re = re.compile('^[a-zA-Z0-9]*$')
-        letters_symbols_re = re.compile('^[a-zA-Z\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        digits_symbols_re = re.compile('^[0-9\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-        letters_digits_symbols_re = re.compile('^[a-zA-Z0-9\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]*$')
-
-        # Start analysis of characters in the cracked pws
-        for pw in self.cracked_pws.iterkeys():
-            if only_letters_re.search(pw):
-                self.only_letters_counter += 1
-                continue
-            if only_digits_re.search(pw):
-                self.only_digits_counter += 1
-                continue
-            if only_symbols_re.search(pw):
-                self.only_symbols_counter += 1
-                continue
-            if letters_digits_re.search(pw):
-                self.letters_digits_counter += 1
-                continue
-            if letters_symbols_re.search(pw):
-                self.letters_symbols_counter += 1
-                continue
-            if digits_symbols_re.search(pw):
-                self.digits_symbols_counter += 1
-                continue
-            if letters_digits_symbols_re.search(pw):
-                self.letters_digits_symbols_counter += 1
-                continue
+        category, letters, digits, symbols = classify(pw)
+        if new and category is not None:
+            self.category_counters[category] += 1
+        char_counters = self.char_counters
+        char_counters[0] += len(pw) * occ
+        char_counters[1] += letters * occ
+        char_counters[2] += digits * occ
+        char_counters[3] += symbols * occ
 
 
     def calc_average_chars(self):
@@ -228,25 +301,7 @@ class PlaintextAnalysis(AnalysisScheme):
         --> digits
         --> symbols
         '''
-        #  Declaration of regular expressions
-        letters_re = re.compile('[a-zA-Z]')
-        digits_re = re.compile('[0-9]')
-        symbols_re = re.compile('[\s\%\$\^\*\@\&\/\#\!\?\_\-\+\.\,\=\:\;\'\"\<\>\(\)\{\}\[\]]')
-
-        # Counter declarations
-        length_counter = 0
-        letters_counter = 0
-        digits_counter = 0
-        symbols_counter = 0
-        occ_counter = 0
-
-        # iterate through all cracked pws (and the counters per pw)
-        for pw in self.cracked_pws.iterkeys():
-            occ_counter = self.pws_multi[pw]['occ']
-            length_counter += len(pw) * occ_counter                                     # add length of pw to counter
-            letters_counter += len(letters_re.findall(pw)) * occ_counter    
-            digits_counter += len(digits_re.findall(pw)) * occ_counter
-            symbols_counter += len(symbols_re.findall(pw)) * occ_counter
+        length_counter, letters_counter, digits_counter, symbols_counter = self.char_counters
 
         # calc. the averages
         try:
@@ -254,10 +309,32 @@ class PlaintextAnalysis(AnalysisScheme):
             self.avg_letters = float(letters_counter) / float(self.cracked_counter)
             self.avg_digits = float(digits_counter) / float(self.cracked_counter)
             self.avg_symbols = float(symbols_counter) / float(self.cracked_counter)
-        except ZeroDivisionError:                                                       # no pw cracked --> ignore error as average values will stay 0
+        except ZeroDivisionError:           # no pw cracked --> ignore error as average values will stay 0
             pass
 
 
+    def get_statistics(self):
+        ''' Returns a snapshot of the statistics of the report (see ProgressWriter.write_snapshot()), the counters are kept up to date while cracking.
+
+        :return: Dict of the counters and averages.
+        '''
+        self.calc_average_chars()
+        return {'label': self.label,
+                'pw_counter': self.pw_counter,
+                'pws_unique_counter': self.pws_unique_counter,
+                'error_counter': self.error_counter,
+                'guesses': self.guesses,
+                'duplicate_candidates': self.duplicate_candidates,
+                'duplicate_guesses_total': self.duplicate_guesses_total,
+                'cracked_counter': self.cracked_counter,
+                'cracked_unique_counter': self.cracked_unique_counter,
+                'categories': self.category_counters,
+                'avg_length': self.avg_length,
+                'avg_letters': self.avg_letters,
+                'avg_digits': self.avg_digits,
+                'avg_symbols': self.avg_symbols}
+
+
     def execute_analysis_plugins(self):
         ''' Searches the 'analysis_plugins' folder for scripts to execute along with the default analysis modules.
         '''
@@ -293,11 +370,9 @@ class PlaintextAnalysis(AnalysisScheme):
         ''' Generates, edits and prints the analysis results.
         '''
         self.logger.debug("Generating analysis results. This may take a while!")
+        self.progress_writer.close()    # write the buffered rows of the progress file
 
-        self.count_duplicate_guesses()  # count duplicate candidates and guesses
-        self.count_unique_pws()         # call analysis function prior to printing the result below
-        self.categorize_pws()           # call analysis function prior to printing the results below
-        self.calc_average_chars()       # call analysis function prior to printing the results below
+        self.calc_average_chars()       # the counters are updated while cracking, see process_hits()
 
         output = list()                 # list of lines to write to the output file
 
@@ -320,19 +395,23 @@ class PlaintextAnalysis(AnalysisScheme):
         output.append("    Cracked pws (unique): %15s (%6.3f%%)" % ('{:,}'.format(self.cracked_unique_counter), percentage_unique))
         percentage_total = (float(self.cracked_counter)/float(self.pw_counter)) * 100
         output.append("     Cracked pws (total): %15s (%6.3f%%) (incremented by x if pw occurred x times in the leak!)" % ('{:,}'.format(self.cracked_counter), percentage_total))
-        output.append("  -->   [a-Z           ]: %15s" % '{:,}'.format(self.only_letters_counter))
-        output.append("  -->   [     0-9      ]: %15s" % '{:,}'.format(self.only_digits_counter))
-        output.append("  -->   [          !?&%%]: %15s" % '{:,}'.format(self.only_symbols_counter))
-        output.append("  -->   [a-Z  0-9      ]: %15s" % '{:,}'.format(self.letters_digits_counter))
-        output.append("  -->   [a-Z       !?&%%]: %15s" % '{:,}'.format(self.letters_symbols_counter))
-        output.append("  -->   [     0-9  !?&%%]: %15s" % '{:,}'.format(self.digits_symbols_counter))
-        output.append("  -->   [a-Z  0-9  !?&%%]: %15s" % '{:,}'.format(self.letters_digits_symbols_counter))
+        output.append("  -->   [a-Z           ]: %15s" % '{:,}'.format(self.category_counters['only_letters']))
+        output.append("  -->   [     0-9      ]: %15s" % '{:,}'.format(self.category_counters['only_digits']))
+        output.append("  -->   [          !?&%%]: %15s" % '{:,}'.format(self.category_counters['only_symbols']))
+        output.append("  -->   [a-Z  0-9      ]: %15s" % '{:,}'.format(self.category_counters['letters_digits']))
+        output.append("  -->   [a-Z       !?&%%]: %15s" % '{:,}'.format(self.category_counters['letters_symbols']))
+        output.append("  -->   [     0-9  !?&%%]: %15s" % '{:,}'.format(self.category_counters['digits_symbols']))
+        output.append("  -->   [a-Z  0-9  !?&%%]: %15s" % '{:,}'.format(self.category_counters['letters_digits_symbols']))
         output.append("")
         output.append("         Averages per pw:")
         output.append("                  length: %15.2f" % self.avg_length)
         output.append("                 letters: %15.2f" % self.avg_letters)
         output.append("                  digits: %15.2f" % self.avg_digits)
         output.append("                 symbols: %17.4f" % self.avg_symbols)
+        output.extend(self.evaluation_report())     # work of the evaluation of the candidates (hash leaks)
+        if self.metrics is not None:
+            output.append("")
+            output.extend(self.metrics.report())    # throughput and blocked time of the stages of the pipeline
         output.append("\n")
         output.append("\n")
 
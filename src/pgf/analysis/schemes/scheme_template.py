@@ -12,7 +12,7 @@ class AnalysisScheme(object):
 
     :param logger: Logger instance.
     :param label: Label of the current job
-    :param pws_multi: Dict of passwords/hashes (key) and as values another dict of two counters. One for the occurrences of the pw/hash in the leak ('occ') and one to count the lookups ('lookups') by the analysis module (^=amount of duplicately generated candidate) 
+    :param pws_multi: LeakIndex of passwords/hashes (key) providing a dict-like entry of counters per key. One for the occurrences of the pw/hash in the leak ('occ') and one to count the lookups ('lookups') by the analysis module (^=amount of duplicately generated candidate) 
     :param pw_counter: Counter of overall passwords in the leak
     :param error_counter: Amount parsing errors
     :param output_file: Path to the output file
@@ -38,7 +38,7 @@ class AnalysisScheme(object):
         abstract_method(self)
 
     def update_plot_file(self):
-        ''' Appends the provided value (percentage) to the last line of the plotfile.
+        ''' Appends the provided value (percentage) to the plot series file of the job (row of the plot file).
         '''
         abstract_method(self)
 
@@ -59,14 +59,8 @@ class AnalysisScheme(object):
         '''
         abstract_method(self)
 
-    def count_duplicate_guesses(self):
-        ''' Counts the amount of pw candidates which have been genereated multiple times by the guesser
-        as well as the total amount of duplicates.
-        '''
-        abstract_method(self)
-
-    def categorize_pws(self):
-        ''' Process the cracked passwords and categorize them.
+    def add_cracked_pw(self):
+        ''' Updates the category and character counters with a cracked pw.
         The function sorts the pws by:
         --> letters only
         --> digits only
@@ -85,6 +79,11 @@ class AnalysisScheme(object):
         '''
         abstract_method(self)
 
+    def get_statistics(self):
+        ''' Returns a snapshot of the statistics of the report.
+        '''
+        abstract_method(self)
+
     def execute_analysis_plugins(self):
         ''' Searches the 'analysis_plugins' folder for scripts to execute along with the default analysis modules.
         Those filenames with a leading '_' will be ignored.
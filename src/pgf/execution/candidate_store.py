@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+'''
+This module provides a persistent on-disk store of the candidate streams of the guessers.
+The stream of a guesser is recorded while it is running and can be replayed for later jobs with the same guesser
+configuration, instead of training and running the guesser again.
+
+The recording and the replay run as a stage of the pipeline of the Executor:
+
+    python pgf/execution/candidate_store.py record [store_dir] [key] ([metrics_file] [metrics_interval])         (guesser | record | analysis)
+    python pgf/execution/candidate_store.py replay [store_dir] [key] [limit] [skip] ([metrics_file] [metrics_interval]) (replay | analysis)
+    python pgf/execution/candidate_store.py [store_dir] --clear
+'''
+
+import sys
+import os
+sys.path.insert(1, os.path.abspath('./'))
+import errno
+import hashlib
+import json
+import timeit
+import zlib
+from array import array
+from pgf.log.logger import Logger
+from pgf.analysis.index.leak_cache import LeakCache
+from pgf.execution.stage_metrics import StageMetrics
+
+
+def read(fd, size):
+    ''' Reads up to [size] bytes from [fd] ('' at the end of the stream), retrying reads interrupted by a signal.
+    '''
+    while True:
+        try:
+            return os.read(fd, size)
+        except OSError, e:
+            if e.errno != errno.EINTR:
+                raise
+
+
+def write(fd, data):
+    ''' Writes all of [data] to [fd].
+    '''
+    while data:
+        data = data[os.write(fd, data):]
+
+
+class CandidateStore(LeakCache):
+    ''' Size-bounded store of recorded candidate streams. The entries are keyed by the content of the guesser script,
+    a content hash of the training file and the amount of guesses passed to the guesser ('max_guesses').
+    Least recently used entries are evicted first (see LeakCache).
+
+    Every entry holds the stream in zlib compressed chunks of about CHUNK_SIZE bytes of complete lines,
+    followed by an index of the chunks (offset, compressed size, size, amount of candidates per chunk),
+    so the first N candidates can be replayed without decompressing the rest of the stream.
+    Streams of guessers that have been killed (e.g. at 'terminate_guessing') are stored as incomplete and
+    are only replayed for jobs needing at most the amount of candidates they contain.
+
+    :param store_dir: Directory of the store files.
+    :param max_size: Maximum size of the store directory in MB (None = unbounded).
+    :param logger: Logger instance.
+    '''
+
+    MAGIC = 'PGF-CANDIDATE-STORE 1\n'           # change the version whenever the format of the entries changes
+    SUFFIX = '.cand'                            # file ending of the store entries
+    CHUNK_SIZE = 1 << 22                        # size of the uncompressed chunks
+    COMPRESSION_LEVEL = 1                       # fast compression, the recording must keep up with the guesser
+
+    def get_key(self, sh_guess, training_file, max_guesses):
+        ''' Returns the key of the stream of a guesser configuration.
+
+        :param sh_guess: Path of the guesser script.
+        :param training_file: Path of the training file.
+        :param max_guesses: Amount of guesses passed to the guesser.
+        '''
+        with open(sh_guess, 'rb') as f:
+            script_hash = hashlib.sha1(f.read()).hexdigest()
+        key = '%s|%s|%s|%s' % (self.MAGIC, script_hash, self.content_hash(training_file), max_guesses)
+        return hashlib.sha1(key).hexdigest()
+
+
+    def get_tmp_path(self, key, pid=None):
+        ''' Returns the path the recording process [pid] (None = the current process) records the stream [key] to
+        (see commit()). The path holds the pid, so the recordings of killed recorders are removed by sweep().
+        '''
+        return '%s.%d%s' % (self.get_path(key), pid or os.getpid(), self.TMP_SUFFIX)
+
+
+    def lookup(self, key, limit=None):
+        ''' Returns the header of the stored stream [key] if it can be replayed for a job needing [limit] candidates
+        (None = the complete stream), otherwise None.
+        '''
+        path = self.get_path(key)
+        header = self.read_header(path)
+        if header is None:
+            return None
+        if not header['complete'] and (limit is None or header['count'] < limit):
+            return None                                         # stream of a killed guesser, too short for the job
+        os.utime(path, None)                                    # mark entry as recently used
+        return header
+
+
+    def record(self, path, fd_in, fd_out, metrics=None):
+        ''' Passes the stream from [fd_in] through to [fd_out] and writes it to the (temporary) entry at [path].
+        The stream is recorded up to its end even if [fd_out] is closed early (e.g. by the analysis at 'terminate_guessing').
+
+        :param metrics: StageMetrics of the recorder (None = not instrumented).
+        '''
+        chunks = array('l')                                     # offset, compressed size, size, amount of candidates per chunk
+        pending = list()                                        # data not yet written to a chunk
+        pending_size = 0
+        forward = True
+        with open(path, 'wb') as f:
+            f.seek(self.HEADER_SIZE)
+
+            def write_chunk(data):
+                compressed = zlib.compress(data, self.COMPRESSION_LEVEL)
+                chunks.extend([f.tell(), len(compressed), len(data), data.count('\n') + (not data.endswith('\n'))])
+                f.write(compressed)
+
+            while True:
+                start = timeit.default_timer()
+                data = read(fd_in, 1 << 16)
+                if metrics is not None:
+                    metrics.read_wait += timeit.default_timer() - start
+                if not data:
+                    break
+                if forward:
+                    start = timeit.default_timer()
+                    try:
+                        write(fd_out, data)
+                    except OSError, e:
+                        if e.errno != errno.EPIPE:
+                            raise
+                        forward = False                         # reader is gone, keep recording until the guesser ends
+                    if metrics is not None:
+                        metrics.write_wait += timeit.default_timer() - start
+                if metrics is not None:
+                    metrics.add(data.count('\n'), len(data))
+                pending.append(data)
+                pending_size += len(data)
+                if pending_size >= self.CHUNK_SIZE:
+                    data = ''.join(pending)
+                    end = data.rfind('\n') + 1
+                    if end == 0:
+                        pending = [data]                        # no complete line yet
+                        continue
+                    write_chunk(data[:end])
+                    pending = [data[end:]]
+                    pending_size = len(pending[0])
+            if pending_size > 0:
+                write_chunk(''.join(pending))                   # last chunk, might end with an unterminated line
+            index_offset = f.tell()
+            chunks.tofile(f)
+            header = '%s%s\n' % (self.MAGIC, json.dumps({'chunks': len(chunks) / 4,
+                                                         'index_offset': index_offset,
+                                                         'count': sum(chunks[3::4]),
+                                                         'size': sum(chunks[2::4]),
+                                                         'complete': False}))
+            f.seek(0)
+            f.write(header)
+
+
+    def commit(self, tmp_path, key, complete, info):
+        ''' Moves a recorded stream into the store and evicts least recently used entries.
+        A complete stored stream is never replaced by an incomplete one.
+
+        :param tmp_path: Path the stream has been recorded to (see record()).
+        :param complete: True if the guesser has finished on its own, False if it has been killed.
+        :param info: Dict of information about the stream to add to the header (guesser, training file, ...).
+        '''
+        path = self.get_path(key)
+        header = self.read_header(tmp_path)
+        current = self.read_header(path)
+        if header is None or (current is not None and current['complete'] and not complete) \
+                or (current is not None and not complete and current['count'] >= header['count']):
+            os.remove(tmp_path)
+            return
+        header.update(info)
+        header['complete'] = complete
+        header_line = '%s%s\n' % (self.MAGIC, json.dumps(header))
+        if len(header_line) > self.HEADER_SIZE:
+            raise IOError("Header of the store entry too long!")
+        with open(tmp_path, 'r+b') as f:
+            f.write(header_line)
+        os.rename(tmp_path, path)
+        self.logger.debug("Candidate stream stored (%s, %s candidates, %s)." % (key, '{:,}'.format(header['count']),
+                                                                              'complete' if complete else 'incomplete'))
+        self.evict(keep=key)
+
+
+    def replay(self, key, fd_out, limit=None, metrics=None, skip=0):
+        ''' Writes the stored stream [key] to [fd_out]. Only the chunks needed for the first [limit] candidates are read.
+
+        :param metrics: StageMetrics of the replay (None = not instrumented).
+        :param skip: Amount of candidates at the beginning of the stream that are not written (e.g. analyzed before a checkpoint).
+                     The chunks holding only skipped candidates are not read.
+        '''
+        path = self.get_path(key)
+        header = self.read_header(path)
+        with open(path, 'rb') as f:
+            f.seek(header['index_offset'])
+            chunks = array('l')
+            chunks.fromfile(f, 4 * header['chunks'])
+            f.seek(self.HEADER_SIZE)
+            count = 0
+            for i in xrange(0, len(chunks), 4):
+                if count + chunks[i+3] <= skip:
+                    count += chunks[i+3]
+                    f.seek(chunks[i+1], os.SEEK_CUR)            # chunk of skipped candidates only
+                    continue
+                data = zlib.decompress(f.read(chunks[i+1]))
+                if count < skip:
+                    end = -1
+                    for _ in xrange(skip - count):
+                        end = data.find('\n', end + 1)
+                    data = data[end + 1:]                       # chunk of the last skipped candidate
+                start = timeit.default_timer()
+                try:
+                    write(fd_out, data)
+                except OSError, e:
+                    if e.errno != errno.EPIPE:
+                        raise
+                    return                                      # reader is gone (e.g. analysis killed the replay)
+                if metrics is not None:
+                    metrics.write_wait += timeit.default_timer() - start
+                    metrics.add(chunks[i+3] - max(0, skip - count), len(data))
+                count += chunks[i+3]
+                if limit is not None and count >= limit:
+                    return
+
+
+
+def get_metrics(args, stage):
+    ''' Returns the started StageMetrics of [stage] for the optional arguments [metrics_file] [metrics_interval] (None if not given).
+    '''
+    if len(args) != 2 or args[0] == 'None':
+        return None
+    metrics = StageMetrics(args[0], stage, float(args[1]))
+    metrics.start()
+    return metrics
+
+
+def main():
+    ''' Records or replays a candidate stream (stdin/stdout), or clears the store.
+    '''
+    metrics = None
+    if len(sys.argv) == 3 and sys.argv[2] == '--clear':
+        CandidateStore(sys.argv[1], logger=Logger()).invalidate()
+    elif len(sys.argv) in (4, 6) and sys.argv[1] == 'record':
+        metrics = get_metrics(sys.argv[4:], 'recorder')
+        store = CandidateStore(sys.argv[2], logger=Logger())
+        store.record(store.get_tmp_path(sys.argv[3]), sys.stdin.fileno(), sys.stdout.fileno(), metrics)
+    elif len(sys.argv) in (6, 8) and sys.argv[1] == 'replay':
+        limit = None if sys.argv[4] == 'None' else int(sys.argv[4])
+        metrics = get_metrics(sys.argv[6:], 'replay')
+        CandidateStore(sys.argv[2], logger=Logger()).replay(sys.argv[3], sys.stdout.fileno(), limit, metrics, int(sys.argv[5]))
+    else:
+        print "Usage: %s record [store_dir] [key] ([metrics_file] [metrics_interval]) | replay [store_dir] [key] [limit] [skip] ([metrics_file] [metrics_interval]) | [store_dir] --clear" % sys.argv[0]
+        exit(-1)
+    if metrics is not None:
+        metrics.close()
+
+
+if __name__ == '__main__':
+    main()
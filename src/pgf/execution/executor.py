@@ -7,9 +7,15 @@
 
 '''
 
+import os
 import time
 import sys
-from subprocess import Popen, PIPE
+import json
+from subprocess import Popen, PIPE, call
+from pgf.execution.candidate_store import CandidateStore
+from pgf.execution.training_cache import TrainingCache
+from pgf.execution.pipe_supervisor import inherit_fds, set_pipe_size
+from pgf.execution.resource_sampler import ResourceSampler
 
 class Executor(object):
     ''' This class executes the password guesser(s).
@@ -20,6 +26,52 @@ class Executor(object):
         '''
         self.job = job
         self.logger = job.logger
+        # the subprocesses are started with close_fds=True, so they do not hold the pipes of concurrently running jobs open
+        self.affinity = []                      # command prefix pinning the subprocesses to the cores assigned by the Scheduler (if any)
+        if job.cpu_cores is not None:
+            self.affinity = ['taskset', '--cpu-list', ','.join([str(core) for core in job.cpu_cores])]
+
+
+    def get_group_members(self):
+        ''' Returns the job-specific parameters of the other jobs of the job group as JSON list ('None' if the job has no group).
+        '''
+        if not self.job.group:
+            return None
+        return json.dumps([job.get_group_args() for job in self.job.group])
+
+
+    def pinned(self, cmd):
+        ''' Returns the command [cmd] (list or string of a shell command) run by taskset on the cores of the job (if any).
+        The affinity is set by the exec'd taskset instead of a preexec_fn, as the jobs are started from the threads
+        of the Scheduler, and is inherited by all processes started by the command.
+        '''
+        if not self.affinity:
+            return cmd
+        if isinstance(cmd, basestring):
+            return '%s %s' % (' '.join(self.affinity), cmd)
+        return self.affinity + cmd
+
+
+    def get_preexec_fn(self, pass_fds):
+        ''' Returns the preexec_fn of a subprocess started with close_fds=False to inherit the pipes [pass_fds] (besides stdin,
+        stdout and stderr). All other file descriptors are closed.
+        '''
+        return lambda: inherit_fds(pass_fds)
+
+
+    def get_metrics_args(self):
+        ''' Returns the arguments passing the metrics file and interval to a stage of the pipeline ('None' if not instrumented).
+        '''
+        if self.job.metrics_interval is None:
+            return ['None', 'None']
+        return [str(self.job.metrics_file), str(self.job.metrics_interval)]
+
+
+    def resize_pipe(self, pipe):
+        ''' Enlarges the buffer of [pipe] to 'pipe_buffer_size' bytes (if set).
+        '''
+        if self.job.pipe_buffer_size is not None:
+            set_pipe_size(pipe, self.job.pipe_buffer_size)
 
 
     def execute(self):
@@ -29,33 +81,84 @@ class Executor(object):
 
         :requires: All shell scripts have to be in the '/scripts/' directory of the PGF and also need to be executable! Use the command '(sudo) chmod +x [skript]' to make them all executable!
         '''
-        # subprocess 1: --> GUESSER GENERATES PW CANDIDATES
-        self.logger.debug('Starting Password Guesser!')
-        sh_guess = ['./%s' % str(self.job.sh_guess), self.job.training_file, str(self.job.max_guesses)]
-        path = r'./scripts/'
-        p_guesser = Popen(sh_guess, cwd=path, stdin=PIPE, stdout=PIPE, stderr=sys.stderr)
+        # candidates analyzed before the checkpoint the job is resumed from, skipped by the replay or discarded by the analysis
+        skip_candidates = self.job.resumed_candidates
+
+        # look up the candidate stream of the guesser in the candidate store
+        store = None
+        p_recorder = None
+        if self.job.candidate_store_dir is not None:
+            store = CandidateStore(self.job.candidate_store_dir, self.job.candidate_store_max_size, self.logger)
+            store_key = store.get_key(os.path.abspath('./scripts/%s' % self.job.sh_guess), self.job.training_file, self.job.max_guesses)
+
+        if store is not None and store.lookup(store_key, self.job.terminate_guessing) is not None:
+            # subprocess 1: --> REPLAY OF THE STORED CANDIDATES OF THE GUESSER
+            self.logger.debug('Replaying the stored candidates of the Password Guesser (%s)!' % store_key)
+            cmd_replay = ['./pgf/execution/candidate_store.py', 'replay', store.cache_dir, store_key, str(self.job.terminate_guessing),
+                          str(skip_candidates or 0)] + self.get_metrics_args()
+            p_guesser = Popen(self.pinned(cmd_replay), cwd='./', stdin=PIPE, stdout=PIPE, stderr=sys.stderr, close_fds=True)
+            candidates = p_guesser.stdout
+            self.resize_pipe(candidates)
+            source = 'replay'                           # process generating the candidates (resource sampling)
+            store = None                                # nothing to record
+            if skip_candidates is not None:
+                skip_candidates = 0                     # the replay starts behind the checkpoint
+        else:
+            # subprocess 1: --> GUESSER GENERATES PW CANDIDATES
+            self.logger.debug('Starting Password Guesser!')
+            sh_guess = ['./%s' % str(self.job.sh_guess), self.job.training_file, str(self.job.max_guesses)]
+            path = r'./scripts/'
+            if self.job.training_cache_dir is not None:
+                # restore the trained model of the guesser or train it (training phase), then run the guessing phase only
+                training_cache = TrainingCache(self.job.training_cache_dir, self.job.training_cache_max_size, self.logger)
+                sh_guess_path = os.path.abspath('./scripts/%s' % self.job.sh_guess)
+                if training_cache.get_declaration(sh_guess_path) is not None:
+                    training_cache.load_or_train(self.job.label, sh_guess_path, self.job.sh_content, self.job.training_file,
+                                                 lambda: call(self.pinned(sh_guess + ['train']), cwd=path, stdout=sys.stderr, stderr=sys.stderr, close_fds=True))
+                    sh_guess.append('guess')
+            source = 'guesser'
+            p_guesser = Popen(self.pinned(sh_guess), cwd=path, stdin=PIPE, stdout=PIPE, stderr=sys.stderr, close_fds=True)
+            candidates = p_guesser.stdout
+            self.resize_pipe(candidates)
+            if store is not None:
+                # RECORDER passes the candidates through and writes them to the candidate store
+                self.logger.debug('Recording the candidates of the Password Guesser (%s)!' % store_key)
+                cmd_record = ['./pgf/execution/candidate_store.py', 'record', store.cache_dir, store_key] + self.get_metrics_args()
+                p_recorder = Popen(self.pinned(cmd_record), cwd='./', stdin=candidates, stdout=PIPE, stderr=sys.stderr, close_fds=True)
+                store_tmp_path = store.get_tmp_path(store_key, p_recorder.pid)     # named by the recorder (taskset execs it, same pid)
+                candidates = p_recorder.stdout
+                self.resize_pipe(candidates)
 
 
         # subprocess 2: --> JtR HASHES PW CANDIDATES FOR COMPARISION
         p_john_hash = None
+        jtr_pipes = ['None', 'None', 'None']            # cracked file and the pipes of the cracked passwords and the candidates passed to JtR
 #         if self.job.filetype == 'hashvalues':         # not working, as filetype is determined in analysis.py (subprocess)
-        if 'hash' in self.job.pw_format:                # workaround for line above
+        if self.job.hash_evaluator == 'john':           # workaround for line above (hash jobs not evaluated by the built-in hash evaluator)
+            # STOPPER passes the first max_guesses (or terminate_guessing) candidates to JtR ('None' = all)
+            # and copies them to the analysis, which determines the guess numbers of the cracked passwords
+            tee_read, tee_write = os.pipe()
             if self.job.max_guesses is not None:
-                cmd = './pgf/execution/stopper.py %s' % str(self.job.max_guesses)
+                cmd_stopper = ['./pgf/execution/stopper.py', str(self.job.max_guesses)] + self.get_metrics_args() + [str(tee_write)]
             else:
-                cmd = './pgf/execution/stopper.py %s' % str(self.job.terminate_guessing)
-            cmd_stopper = [cmd]
+                cmd_stopper = ['./pgf/execution/stopper.py', str(self.job.terminate_guessing)] + self.get_metrics_args() + [str(tee_write)]
             path = r'./'
             self.logger.debug('Starting the Stopper!')
-            p_stopper = Popen(cmd_stopper, cwd=path, stdin=p_guesser.stdout, stdout=PIPE, stderr=PIPE, shell=True)
+            p_stopper = Popen(self.pinned(cmd_stopper), cwd=path, stdin=candidates, stdout=PIPE, stderr=sys.stderr, close_fds=False, preexec_fn=self.get_preexec_fn([tee_write]))
+            os.close(tee_write)
+            self.resize_pipe(p_stopper.stdout)
 
             cmd = str(self.job.jtr_command)
-            cmd_john = [cmd]
+            cmd_john = [self.pinned(cmd)]
             path = str(self.job.jtr_dir)
             self.logger.debug('Starting John the Ripper for the hash evaluation!')
             self.logger.debug(str(self.job.jtr_command))
             #TODO: 'shell=True' highly discouraged. Other option? Without 'shell=True': --> Error 'no such file or directory!'
-            p_john_hash = Popen(cmd_john, cwd=self.job.jtr_dir, stdin=p_stopper.stdout, stdout=PIPE, stderr=PIPE, shell=True)
+            p_john_hash = Popen(cmd_john, cwd=self.job.jtr_dir, stdin=p_stopper.stdout, stdout=PIPE, stderr=PIPE, shell=True, close_fds=True)
+            self.resize_pipe(p_john_hash.stderr)
+            candidates.close()                          # the guesser/recorder has to notice when the stopper is done (EPIPE)
+            p_stopper.stdout.close()                    # the stopper has to notice when JtR is gone (EPIPE)
+            jtr_pipes = [str(self.job.cracked_file), str(p_john_hash.stdout.fileno()), str(tee_read)]
 
 
         self.logger.debug('Starting analysis.py!')
@@ -71,23 +174,52 @@ class Executor(object):
                         str(self.job.jtr_pot_file),
                         str(self.job.output_file),
                         str(self.job.progress_file),
-                        str(self.job.plot_file)]
+                        str(self.job.plot_file),
+                        str(self.job.leak_cache_dir),
+                        str(self.job.leak_cache_max_size),
+                        str(self.job.parse_processes),
+                        str(self.job.intake_block_size),
+                        str(self.job.analysis_workers),
+                        str(self.job.plot_series_file),
+                        str(self.job.progress_flush_interval),
+                        str(self.job.progress_rows_per_decade),
+                        str(self.get_group_members())] + self.get_metrics_args() + [
+                        str(self.job.checkpoint_file),
+                        str(self.job.checkpoint_interval),
+                        str(skip_candidates),
+                        str(self.job.jtr_input_format) if self.job.hash_evaluator == 'builtin' else 'None'] + jtr_pipes + [
+                        str(self.job.stats_file)]
         path = './'
         if p_john_hash is None:
-            # JtR IS NOT RUNNING (plaintext input) --> piping stdout-pipe of guesser directly to analysis
-            p_analysis = Popen(cmd_analysis, cwd=path, stdin=p_guesser.stdout, stdout=sys.stdout, stderr=sys.stderr)
+            # JtR IS NOT RUNNING (plaintext input or built-in hash evaluator) --> piping stdout-pipe of guesser directly to analysis
+            p_analysis = Popen(self.pinned(cmd_analysis), cwd=path, stdin=candidates, stdout=sys.stdout, stderr=sys.stderr, close_fds=True)
         else:
             # JtR IS RUNNING (hash input) --> piping stdout-pipe of JtR to analysis
             # --> EXPLANATION: 'p_john_hash.stderr' is used as stdin as the status lines of JtR (printed with the '--external=AutoStatus' command).
             #     These lines are printed via the std.err pipe of John. Stdout is used to pritn the cracked passwords.
-            p_analysis = Popen(cmd_analysis, cwd=path, stdin=p_john_hash.stderr, stdout=sys.stdout, stderr=sys.stderr) 
-
-
-        # wait for JtR to finish cracking
+            #     The analysis inherits the stdout-pipe of JtR and the copy of the candidates passed to JtR by the stopper as well.
+            p_analysis = Popen(self.pinned(cmd_analysis), cwd=path, stdin=p_john_hash.stderr, stdout=sys.stdout, stderr=sys.stderr, close_fds=False,
+                               preexec_fn=self.get_preexec_fn([p_john_hash.stdout.fileno(), tee_read]))
+            p_john_hash.stderr.close()
+            p_john_hash.stdout.close()
+            os.close(tee_read)
+        if self.job.candidate_store_dir is not None and p_john_hash is None:
+            candidates.close()                          # the recorder/replay has to notice when its reader is gone (EPIPE)
+
+        # sample the resources used by the processes of the job
+        sampler = None
+        if self.job.resource_sample_interval is not None:
+            sampler = ResourceSampler(self.job.resources_file, self.job.resource_sample_interval, self.logger)
+            sampler.add(source, p_guesser.pid)
+            if p_john_hash is not None:
+                sampler.add('john', p_john_hash.pid)
+            sampler.add('analysis', p_analysis.pid)
+            sampler.start()
+
+
+        # wait for JtR to finish cracking (its output pipes are read by the analysis)
         if p_john_hash is not None:
-            # read lines from Johns output pipe in order be able to (relevantly) read only it's stderr pipe (status lines)
-            while p_john_hash.poll() is None:
-                _ = p_john_hash.stdout.readline()
+            p_john_hash.wait()
             self.logger.debug("John the Ripper has finished cracking!")
 
         # wait for the guesser to terminate
@@ -97,3 +229,16 @@ class Executor(object):
         # wait for the analysis module to terminate
         p_analysis.wait()
         self.logger.debug('Analysis is done!')
+
+        # store the recorded candidates (incomplete if the guesser has been killed)
+        if p_recorder is not None:
+            p_recorder.wait()
+            try:
+                store.commit(store_tmp_path, store_key, p_guesser.returncode == 0,
+                             {'sh_guess': self.job.sh_guess, 'training_file': self.job.training_file, 'max_guesses': self.job.max_guesses})
+            except (IOError, OSError), e:
+                self.logger.warning("The candidates could not be stored: <%s>" % str(e))
+
+        # stop the resource sampling, the peak and mean values are added to the jobs.json
+        if sampler is not None:
+            self.job.set_resources(sampler.stop())
@@ -0,0 +1,114 @@
+'''
+This module provides the supervisor draining the pipes of the subprocesses of a job.
+'''
+
+import os
+import errno
+import fcntl
+import select
+import timeit
+
+F_SETPIPE_SZ = 1031                             # fcntl command to resize a pipe (Linux >= 2.6.35, not exported by Python 2)
+PIPE_MAX_SIZE_FILE = '/proc/sys/fs/pipe-max-size'
+
+
+def set_pipe_size(pipe, size):
+    ''' Resizes the buffer of [pipe] (file object of either end) to [size] bytes, capped at the maximum size allowed
+    for unprivileged processes. Does nothing on systems not supporting it.
+
+    :return: The new size of the buffer or None if it could not be resized.
+    '''
+    try:
+        with open(PIPE_MAX_SIZE_FILE, 'r') as f:
+            size = min(size, int(f.read()))
+        return fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, size)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def inherit_fds(fds):
+    ''' Keeps the file descriptors [fds] open on exec and closes all others except stdin, stdout, stderr and the ones closed
+    on exec anyway. Called in a subprocess started with close_fds=False to inherit the additional pipes [fds] (preexec_fn),
+    so it does not hold the pipes of concurrently running jobs open.
+    '''
+    for fd in fds:
+        fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) & ~fcntl.FD_CLOEXEC)
+    try:
+        open_fds = [int(fd) for fd in os.listdir('/proc/self/fd')]
+    except OSError:
+        open_fds = range(3, os.sysconf('SC_OPEN_MAX'))
+    for fd in open_fds:
+        if fd <= 2 or fd in fds:
+            continue
+        try:
+            if not fcntl.fcntl(fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC:
+                os.close(fd)
+        except (IOError, OSError):
+            pass                                # already closed (e.g. the descriptor of the listed directory)
+
+
+class PipeSupervisor(object):
+    ''' Waits for data on the pipes of the subprocesses of a job (poll) and passes it to their consumers in reads of
+    up to READ_SIZE bytes, so waiting for the subprocesses does not take any CPU time.
+
+    :param logger: Logger-instance
+    :param metrics: StageMetrics the time spent waiting for data is added to (None = not instrumented).
+    '''
+
+    READ_SIZE = 1 << 16                         # maximum amount of bytes read from a pipe at once
+    IDLE_INTERVAL = 1.0                         # seconds waited for data before [idle] is called again
+
+    def __init__(self, logger, metrics=None):
+        ''' Constructor.
+        '''
+        self.logger = logger
+        self.metrics = metrics
+        self.poll = select.poll()
+        self.consumers = dict()                 # file descriptor --> (pipe, consumer)
+
+
+    def add(self, pipe, consumer=None):
+        ''' Supervises [pipe] (file object of the read end).
+
+        :param consumer: Function called with every chunk of data read from the pipe (None = the data is discarded).
+        '''
+        self.consumers[pipe.fileno()] = (pipe, consumer)
+        self.poll.register(pipe.fileno(), select.POLLIN | select.POLLPRI)
+
+
+    def run(self, until=None, idle=None):
+        ''' Drains the supervised pipes until all of them are closed by their writers (end of the subprocesses).
+        The pipes are closed afterwards.
+
+        :param until: Function returning True if the supervisor should return before (the remaining pipes are left open).
+        :param idle: Function called before every poll and every IDLE_INTERVAL seconds while no data arrives (None = poll without timeout).
+        '''
+        timeout = None if idle is None else self.IDLE_INTERVAL * 1000
+        while self.consumers and not (until is not None and until()):
+            if idle is not None:
+                idle()
+            start = timeit.default_timer()
+            try:
+                events = self.poll.poll(timeout)
+            except select.error, e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                continue
+            finally:
+                if self.metrics is not None:
+                    self.metrics.read_wait += timeit.default_timer() - start
+            for fd, _ in events:
+                try:
+                    data = os.read(fd, self.READ_SIZE)
+                except OSError, e:
+                    if e.errno != errno.EINTR:
+                        raise
+                    continue
+                pipe, consumer = self.consumers[fd]
+                if data:
+                    if consumer is not None:
+                        consumer(data)
+                    continue
+                self.poll.unregister(fd)        # end of file
+                del self.consumers[fd]
+                pipe.close()
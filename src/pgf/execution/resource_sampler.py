@@ -0,0 +1,165 @@
+'''
+This module provides the sampler of the resources used by the processes of a job (guesser, JtR and analysis).
+'''
+
+import threading
+import time
+import psutil
+from operator import add
+
+HEADER = 'time,process,cpu_percent,rss,read_bytes_per_second,write_bytes_per_second,ctx_switches_per_second\n'
+COLUMNS = ['cpu_percent', 'rss', 'read_bytes_per_second', 'write_bytes_per_second', 'ctx_switches_per_second']
+
+
+def get(p, name, *args, **kwargs):
+    ''' Calls the psutil method [name] of the process [p] (psutil version 1 methods are prefixed with 'get_').
+    '''
+    if psutil.__version__[0] == str(1):
+        name = 'get_%s' % name                  # psutil version 1 (apt-get)
+    return getattr(p, name)(*args, **kwargs)
+
+
+class ResourceSampler(object):
+    ''' Samples CPU usage, RSS, I/O and context switches of the process trees of a job every [interval] seconds in a
+    background thread. Every sample appends one row per process tree to the resources file of the job
+    ('[output_file]_resources.csv'); I/O and context switches are written as rates since the previous sample.
+
+    :param path: Path of the resources file.
+    :param interval: Seconds between two samples.
+    :param logger: Logger-instance
+    '''
+
+    def __init__(self, path, interval, logger):
+        ''' Constructor.
+        '''
+        self.path = path
+        self.interval = interval
+        self.logger = logger
+        self.roots = list()                     # (name, pid) of the root processes of the sampled trees
+        self.processes = dict()                 # pid --> psutil.Process (kept for the CPU usage between two samples)
+        self.new_pids = set()                   # processes first seen in the current sample (no CPU usage measured yet)
+        self.counters = dict()                  # name --> (time, read bytes, write bytes, context switches) of the previous sample
+        self.stats = dict()                     # name --> (amount of samples, peak and sum of every column)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+
+    def add(self, name, pid):
+        ''' Samples the process [pid] and all its child processes as [name] (e.g. 'guesser').
+        '''
+        self.roots.append((name, pid))
+
+
+    def start(self):
+        ''' Starts the sampling thread.
+        '''
+        self.f = open(self.path, 'a')
+        self.thread.start()
+
+
+    def stop(self):
+        ''' Stops the sampling thread and closes the resources file.
+
+        :return: Dict of the peak and mean value of every column per process tree (see summary()).
+        '''
+        self.stopped.set()
+        self.thread.join()
+        self.f.close()
+        return self.summary()
+
+
+    def run(self):
+        ''' Samples the process trees until the sampler is stopped.
+        '''
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+
+    def sample(self):
+        ''' Samples all process trees and appends a row per tree to the resources file.
+        '''
+        rows = list()
+        self.new_pids.clear()
+        for name, pid in self.roots:
+            now = time.time()
+            tree = self.get_tree(pid)
+            if not tree:
+                continue                        # process tree has terminated
+            cpu_percent = 0.0
+            rss = 0
+            read_bytes = 0
+            write_bytes = 0
+            ctx_switches = 0
+            for p in tree:
+                try:
+                    if p.pid not in self.new_pids:
+                        cpu_percent += get(p, 'cpu_percent')
+                    rss += get(p, 'memory_info').rss
+                    ctx_switches += sum(get(p, 'num_ctx_switches'))
+                    try:
+                        io = get(p, 'io_counters')
+                        read_bytes += io.read_bytes
+                        write_bytes += io.write_bytes
+                    except (AttributeError, psutil.AccessDenied):
+                        pass                    # I/O counters not supported by the platform
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass                        # process has terminated in the meantime
+            previous = self.counters.get(name, (now, read_bytes, write_bytes, ctx_switches))
+            self.counters[name] = (now, read_bytes, write_bytes, ctx_switches)
+            elapsed = now - previous[0]
+            if elapsed > 0:
+                # the counters of terminated child processes are lost, so the rates are never negative
+                rates = [max(0, current - last) / elapsed for current, last in zip((read_bytes, write_bytes, ctx_switches), previous[1:])]
+            else:
+                rates = [0.0, 0.0, 0.0]
+            values = [cpu_percent, rss] + rates
+            count, peaks, sums = self.stats.get(name, (0, values, [0] * len(values)))
+            self.stats[name] = (count + 1, map(max, peaks, values), map(add, sums, values))
+            rows.append('%.3f,%s,%.1f,%d,%.0f,%.0f,%.0f\n' % tuple([now, name] + values))
+        if rows:
+            self.f.write(''.join(rows))
+            self.f.flush()
+
+
+    def get_tree(self, pid):
+        ''' Returns the psutil.Process objects of the process [pid] and its child processes (empty list if it has terminated).
+        The objects are cached, so the CPU usage is measured between two samples.
+        '''
+        try:
+            root = self.get_process(pid)
+            status = root.status() if callable(root.status) else root.status       # property in psutil version 1
+            if status == psutil.STATUS_ZOMBIE:
+                raise psutil.NoSuchProcess(pid)             # terminated, but not waited for yet
+            tree = [root] + [self.get_process(child.pid) for child in get(root, 'children', recursive=True)]
+        except psutil.NoSuchProcess:
+            self.processes.pop(pid, None)
+            return list()
+        return tree
+
+
+    def get_process(self, pid):
+        ''' Returns the cached psutil.Process object of [pid].
+        '''
+        p = self.processes.get(pid)
+        if p is None:
+            p = psutil.Process(pid)
+            get(p, 'cpu_percent')               # the first call only starts the measurement of the CPU usage
+            self.processes[pid] = p
+            self.new_pids.add(pid)
+        return p
+
+
+    def summary(self):
+        ''' Returns the peak and mean value of every column per process tree, e.g.
+        {'guesser': {'cpu_percent': {'peak': 99.8, 'mean': 97.1}, 'rss': {...}, ...}, ...}
+        '''
+        summary = dict()
+        for name, _ in self.roots:
+            if name not in self.stats:
+                continue                        # terminated before the first sample
+            count, peaks, sums = self.stats[name]
+            summary[name] = dict()
+            for column, peak, total in zip(COLUMNS, peaks, sums):
+                summary[name][column] = {'peak': peak, 'mean': float(total) / count}
+        return summary
@@ -0,0 +1,115 @@
+'''
+This module provides the scheduler running several jobs of the job queue at once.
+'''
+
+import threading
+import multiprocessing
+import psutil
+from distutils.spawn import find_executable
+
+
+class Scheduler(object):
+    ''' Runs the jobs of the job queue concurrently, each in its own thread starting the pipeline of the job (see Executor).
+    The jobs are started in the order of the queue as soon as the resources they need are free:
+    At most [max_concurrent_jobs] jobs run at once, and the cores ('job_cores') and memory ('job_memory') requested
+    by the running jobs never exceed the cores and the memory available to the framework.
+    A job requesting more than is available is started as soon as no other job is running.
+
+    :param jobs: List of Job objects, in the order of execution.
+    :param run_job: Function processing a single job (Job object as parameter), called in the thread of the job.
+    :param max_concurrent_jobs: Maximum amount of jobs running at once (1 = the jobs are processed one after another).
+    :param cpu_affinity: CPU affinity policy. 'exclusive' pins the processes of every job to the cores assigned to it
+                         (by running them with 'taskset', see Executor), None leaves the placement of the processes to the operating system.
+    :param logger: Logger-instance
+    '''
+
+    def __init__(self, jobs, run_job, max_concurrent_jobs, cpu_affinity, logger):
+        ''' Constructor.
+        '''
+        if cpu_affinity not in (None, 'exclusive'):
+            raise ValueError("Unknown CPU affinity policy <%s>!" % cpu_affinity)
+        if cpu_affinity == 'exclusive' and find_executable('taskset') is None:
+            raise ValueError("The CPU affinity policy 'exclusive' requires 'taskset' (util-linux)!")
+        self.pending = list(jobs)
+        self.run_job = run_job
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs or 1)
+        self.cpu_affinity = cpu_affinity
+        self.logger = logger
+        try:
+            p = psutil.Process()
+            if psutil.__version__[0] == str(1):
+                cores = p.get_cpu_affinity()
+            else:
+                cores = p.cpu_affinity()
+        except (AttributeError, NotImplementedError):   # affinity not supported by the platform
+            cores = range(multiprocessing.cpu_count())
+        self.free_cores = sorted(cores)                 # cores not assigned to a running job
+        self.memory = psutil.virtual_memory().available / (1024 * 1024)    # MB available to the jobs
+        self.running = dict()                           # Job --> (thread, assigned cores)
+        self.condition = threading.Condition()          # notified whenever a job has finished
+
+
+    def required_cores(self, job):
+        ''' Returns the amount of cores the job needs. If not set in the 'run.ini', the guesser and the analysis
+        (or its 'analysis_workers') are assumed to need a core each.
+        '''
+        if job.job_cores is not None:
+            return max(1, job.job_cores)
+        return 1 + max(1, job.analysis_workers or 1)
+
+
+    def required_memory(self, job):
+        ''' Returns the memory (MB) the job needs (0 if not set in the 'run.ini').
+        '''
+        return job.job_memory or 0
+
+
+    def fits(self, job):
+        ''' Checks whether the resources needed by [job] are free.
+        '''
+        if not self.running:
+            return True                                 # start every job eventually, even if it requests too much
+        if len(self.running) >= self.max_concurrent_jobs:
+            return False
+        if self.required_cores(job) > len(self.free_cores):
+            return False
+        used_memory = sum([self.required_memory(j) for j in self.running])
+        return used_memory + self.required_memory(job) <= self.memory
+
+
+    def start(self, job):
+        ''' Assigns the cores to [job] and starts its thread. Needs to be called with the condition acquired.
+        '''
+        amount = min(self.required_cores(job), len(self.free_cores))
+        cores = self.free_cores[:amount]
+        self.free_cores = self.free_cores[amount:]
+        if self.cpu_affinity == 'exclusive' and cores:
+            job.set_cpu_cores(cores)
+        thread = threading.Thread(target=self.run_thread, args=(job,), name=job.label)
+        self.running[job] = (thread, cores)
+        self.logger.debug("Starting Job <%s> on %d core(s). Running jobs: %d, remaining jobs: %d" % (job.label, len(cores), len(self.running), len(self.pending)))
+        thread.start()
+
+
+    def run_thread(self, job):
+        ''' Processes [job] and frees its resources afterwards (runs in the thread of the job).
+        '''
+        try:
+            self.run_job(job)
+        except Exception, e:
+            self.logger.error("Job <%s> failed: <%s>" % (job.label, str(e)), exc_info=True)
+        finally:
+            with self.condition:
+                _, cores = self.running.pop(job)
+                self.free_cores = sorted(self.free_cores + cores)
+                self.condition.notify()
+
+
+    def run(self):
+        ''' Processes all jobs and returns as soon as the last one has finished.
+        '''
+        with self.condition:
+            while self.pending or self.running:
+                while self.pending and self.fits(self.pending[0]):
+                    self.start(self.pending.pop(0))
+                self.condition.wait(1)                  # timeout keeps the main thread responsive to KeyboardInterrupt
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+'''
+This module provides the instrumentation of the stages of the pipeline of a job (guesser --> [recorder] --> [stopper --> JtR] --> analysis).
+Every stage implemented by the framework appends its counters to the metrics file of the job ('[output_file]_metrics.csv'):
+
+    time,stage,candidates,bytes,candidates_per_second,read_wait,write_wait
+
+The counters are cumulative, 'candidates_per_second' is the rate since the previous row of the stage. 'read_wait' and 'write_wait'
+are the seconds the stage has spent blocked on reading its input and writing its output. The guesser and JtR are not
+instrumented, their throughput is seen by the stages reading their output.
+
+The summary of a metrics file can be printed from the command line:
+
+    python pgf/execution/stage_metrics.py [metrics_file]
+'''
+
+import sys
+import time
+
+HEADER = 'time,stage,candidates,bytes,candidates_per_second,read_wait,write_wait\n'
+PIPELINE = ['guesser', 'replay', 'recorder', 'stopper', 'john', 'analysis']    # order of the stages in the pipeline
+
+
+class StageMetrics(object):
+    ''' Counters of a single stage. The stage starts the metrics as soon as it starts to process the candidates (start()),
+    adds the candidates and bytes it has passed on (add()) and the seconds it has been blocked (read_wait, write_wait).
+    A row is appended to the metrics file every [interval] seconds.
+    The rows are written with a single write each, so the stages (processes) of a job can share the file.
+
+    :param path: Path of the metrics file.
+    :param stage: Name of the stage (see PIPELINE).
+    :param interval: Seconds between two rows.
+    '''
+
+    def __init__(self, path, stage, interval=1):
+        ''' Constructor.
+        '''
+        self.path = path
+        self.stage = stage
+        self.interval = interval
+        self.candidates = 0
+        self.bytes = 0
+        self.read_wait = 0.0                    # seconds blocked on reading the input
+        self.write_wait = 0.0                   # seconds blocked on writing the output
+        self.f = None
+        self.last_time = None
+        self.last_candidates = 0
+        self.next_row = None
+
+
+    def start(self):
+        ''' Opens the metrics file and writes the first row of the stage.
+        '''
+        self.f = open(self.path, 'a')
+        self.write_row(time.time())
+
+
+    def add(self, candidates, size):
+        ''' Adds [candidates] candidates of [size] bytes and writes a row if [interval] seconds have passed.
+        '''
+        self.candidates += candidates
+        self.bytes += size
+        now = time.time()
+        if now >= self.next_row:
+            self.write_row(now)
+
+
+    def write_row(self, now):
+        ''' Appends the current counters to the metrics file.
+        '''
+        elapsed = now - (self.last_time or now)
+        rate = (self.candidates - self.last_candidates) / elapsed if elapsed > 0 else 0.0
+        self.f.write('%.3f,%s,%d,%d,%.1f,%.3f,%.3f\n' % (now, self.stage, self.candidates, self.bytes, rate, self.read_wait, self.write_wait))
+        self.f.flush()
+        self.last_time = now
+        self.last_candidates = self.candidates
+        self.next_row = now + self.interval
+
+
+    def close(self):
+        ''' Writes the last row and closes the metrics file.
+        '''
+        if self.f is None or self.f.closed:
+            return
+        self.write_row(time.time())
+        self.f.close()
+
+
+    def report(self):
+        ''' Closes the metrics of this stage and returns the summary of the metrics file (list of lines, see summarize()).
+        '''
+        self.close()
+        return summarize(self.path)
+
+
+
+def summarize(path):
+    ''' Summarizes the metrics file at [path]: throughput and blocked time per stage and the stage that is most likely the bottleneck.
+    In a pipeline, the stages in front of the bottleneck are blocked writing and the stages behind it are blocked reading,
+    so the bottleneck is the stage in front of the first stage waiting for input most of the time.
+
+    :return: List of lines.
+    '''
+    first = dict()                              # stage --> first row
+    last = dict()                               # stage --> last row
+    peak = dict()                               # stage --> maximum candidates per second
+    with open(path, 'r') as f:
+        for line in f:
+            values = line.rstrip('\n').split(',')
+            if len(values) != 7 or values[1] not in PIPELINE:
+                continue                        # header or malformed row
+            row = [float(values[0]), values[1]] + [float(value) for value in values[2:]]
+            first.setdefault(row[1], row)
+            last[row[1]] = row
+            peak[row[1]] = max(peak.get(row[1], 0.0), row[4])
+    output = list()
+    output.append("Pipeline stages:            candidates             MB    avg. cand./s   peak cand./s  wait read  wait write")
+    stages = list()                             # (stage, share of time waiting for input) in the order of the pipeline
+    for stage in PIPELINE:
+        if stage not in last:
+            if (stage == 'guesser' and 'replay' not in last) or (stage == 'john' and 'stopper' in last):
+                stages.append((stage, None))    # stage not instrumented
+            continue
+        duration = last[stage][0] - first[stage][0]
+        read_share = last[stage][5] / duration if duration > 0 else 0.0
+        write_share = last[stage][6] / duration if duration > 0 else 0.0
+        stages.append((stage, read_share))
+        output.append("%24s: %15s %14.1f %15s %14s %9.1f%% %10.1f%%" % (stage,
+                                                                       '{:,}'.format(int(last[stage][2])),
+                                                                       last[stage][3] / (1 << 20),
+                                                                       '{:,}'.format(int(last[stage][2] / duration)) if duration > 0 else '-',
+                                                                       '{:,}'.format(int(peak[stage])),
+                                                                       read_share * 100, write_share * 100))
+    if len(output) == 1:
+        return list()                           # no stage instrumented
+    bottleneck = stages[-1][0]
+    for i, (stage, read_share) in enumerate(stages):
+        if read_share is not None and read_share >= 0.5 and i > 0:
+            bottleneck = stages[i-1][0]         # first stage waiting for input most of the time
+            break
+    output.append("       Likely bottleneck: %15s" % bottleneck)
+    return output
+
+
+
+def main():
+    ''' Prints the summary of a metrics file.
+    '''
+    if len(sys.argv) != 2:
+        print "Usage: %s [metrics_file]" % sys.argv[0]
+        exit(-1)
+    for line in summarize(sys.argv[1]):
+        print line
+
+
+if __name__ == '__main__':
+    main()
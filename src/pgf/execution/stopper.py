@@ -1,24 +1,104 @@
 #!/usr/bin/env python
-import sys
-
 '''
 :author: Robin Flume
 :contact: robin.flume@rub.de
 '''
 
+import sys
+import os
+sys.path.insert(1, os.path.abspath('./'))
+import errno
+import timeit
+from pgf.log.logger import Logger
+from pgf.execution.candidate_store import read, write
+from pgf.execution.stage_metrics import StageMetrics
+
+
+BLOCK_SIZE = 1 << 16                            # amount of bytes copied at once
+
+
+def limit_candidates(fd_in, fd_out, limit, metrics=None, fd_tee=None):
+    ''' Copies the first [limit] candidates (lines) from [fd_in] to [fd_out] in blocks of BLOCK_SIZE bytes.
+    The newlines are counted per block, only the last block is cut behind the [limit]th newline.
+
+    :param limit: Amount of candidates to pass through (None = all).
+    :param metrics: StageMetrics of the stopper (None = not instrumented).
+    :param fd_tee: Every block is also copied to [fd_tee] after it has been passed through (None = no copy). The analysis
+                   locates the candidates cracked by JtR in the copy (see CrackLocator).
+
+    :return: Amount of candidates passed through.
+    '''
+    counter = 0
+    unterminated = False                        # the last block ended within a candidate
+    while limit is None or counter < limit:
+        start = timeit.default_timer()
+        data = read(fd_in, BLOCK_SIZE)
+        if metrics is not None:
+            metrics.read_wait += timeit.default_timer() - start
+        if not data:
+            counter += unterminated             # unterminated last candidate
+            break
+        lines = data.count('\n')
+        if limit is not None and counter + lines >= limit:
+            end = -1
+            for _ in xrange(limit - counter):
+                end = data.find('\n', end + 1)
+            data = data[:end + 1]
+            lines = limit - counter
+        start = timeit.default_timer()
+        try:
+            write(fd_out, data)
+        except OSError, e:
+            if e.errno != errno.EPIPE:
+                raise
+            break                               # reader is gone
+        if fd_tee is not None:
+            try:
+                write(fd_tee, data)
+            except OSError, e:
+                if e.errno != errno.EPIPE:
+                    raise
+                fd_tee = None                   # the analysis is done, the candidates are passed on without a copy
+        counter += lines
+        if metrics is not None:
+            metrics.write_wait += timeit.default_timer() - start
+            metrics.add(lines, len(data))
+        unterminated = not data.endswith('\n')
+    return counter
+
+
 def main():
     ''' This script provides a solution for John the Ripper to only process the desired amount of guesses
     by blocking the output if the amount reached.
     Needed is this as the cracking instance of JtR is processing the incoming candidates faster than
     the analysis module of the PGF.
+
+    Call: stopper.py [limit] ([metrics_file] [metrics_interval] ([tee_fd]))
     '''
-    counter = 0
-    while counter < int(sys.argv[1]):
-        candidate = sys.stdin.readline()
-        sys.stdout.write(candidate)               # pass candidate through
-        counter += 1
-    else:
-        return
+    logger = Logger()
+    logger.basicConfig('DEBUG')
+    limit = None if sys.argv[1] == 'None' else int(sys.argv[1])
+    metrics = None
+    if len(sys.argv) >= 4 and sys.argv[2] != 'None':
+        metrics = StageMetrics(sys.argv[2], 'stopper', float(sys.argv[3]))
+        metrics.start()
+    fd_tee = None
+    if len(sys.argv) == 5 and sys.argv[4] != 'None':
+        fd_tee = int(sys.argv[4])               # pipe inherited from the Executor, read by the analysis
+    start = timeit.default_timer()
+    counter = limit_candidates(sys.stdin.fileno(), sys.stdout.fileno(), limit, metrics, fd_tee)
+    os.close(sys.stdout.fileno())               # EOF for JtR, so it prints its last status line
+    if fd_tee is not None:
+        try:
+            os.close(fd_tee)                    # EOF for the analysis
+        except OSError:
+            pass
+    if metrics is not None:
+        metrics.close()
+    duration = timeit.default_timer() - start
+    logger.debug("Stopper passed %s candidates in %.2fs (%s candidates/s)." \
+                 % ('{:,}'.format(counter), duration, '{:,}'.format(int(counter / duration)) if duration > 0 else '-'))
+
 
 if __name__ == '__main__':
     main()
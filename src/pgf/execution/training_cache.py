@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+'''
+This module provides a persistent on-disk cache of the models trained by the guessers (training artifacts).
+Guesser scripts declaring their training artifacts are run in two phases: the training phase is skipped and the
+snapshot of its artifacts is restored if the same script has already been trained on the same training file.
+
+A guesser script declares its artifacts (files or directories, relative to the training directory) in its header:
+
+    # TRAINING_DIR: /opt/pgf/omen
+    # TRAINING_ARTIFACTS: CP.level EP.level IP.level LN.level createConfig
+
+and runs only the phase passed as third parameter ('train' or 'guess', both phases if not set).
+The cache can be cleared from the command line:
+
+    python pgf/execution/training_cache.py [cache_dir] --clear
+'''
+
+import sys
+import os
+sys.path.insert(1, os.path.abspath('./'))
+import fcntl
+import hashlib
+import json
+import shutil
+import tarfile
+import threading
+import timeit
+from pgf.log.logger import Logger
+from pgf.analysis.index.leak_cache import LeakCache
+
+
+class TrainingCache(LeakCache):
+    ''' Size-bounded cache of training artifacts. The entries are keyed by the content of the guesser script ('sh_content')
+    and a content hash of the training file. Every entry is a tar snapshot of the declared artifacts behind the header,
+    which also holds the time the training took. Least recently used entries are evicted first (see LeakCache).
+
+    :param cache_dir: Directory of the cache files.
+    :param max_size: Maximum size of the cache directory in MB (None = unbounded).
+    :param logger: Logger instance.
+    '''
+
+    MAGIC = 'PGF-TRAINING-CACHE 1\n'            # change the version whenever the format of the entries changes
+    SUFFIX = '.train'                           # file ending of the cache entries
+
+    # hits and misses of all jobs of the run (the jobs might run concurrently)
+    hits = 0
+    misses = 0
+    time_saved = 0.0
+    counter_lock = threading.Lock()
+
+    def get_declaration(self, sh_guess):
+        ''' Parses the training declaration of a guesser script.
+
+        :param sh_guess: Path of the guesser script.
+
+        :return: (String, List): Training directory and artifacts, or None if the script declares no training artifacts.
+        '''
+        training_dir = None
+        artifacts = None
+        with open(sh_guess, 'r') as f:
+            for line in f:
+                if line.startswith('# TRAINING_DIR:'):
+                    training_dir = line.split(':', 1)[1].strip()
+                elif line.startswith('# TRAINING_ARTIFACTS:'):
+                    artifacts = line.split(':', 1)[1].split()
+        if training_dir is None or not artifacts:
+            return None
+        return training_dir, artifacts
+
+
+    def get_key(self, sh_content, training_file):
+        ''' Returns the key of the training artifacts of a guesser script trained on [training_file].
+        '''
+        key = '%s|%s|%s' % (self.MAGIC, sh_content, self.content_hash(training_file))
+        return hashlib.sha1(key).hexdigest()
+
+
+    def load_or_train(self, label, sh_guess, sh_content, training_file, train):
+        ''' Restores the cached training artifacts or trains the guesser with [train] and stores a snapshot of its artifacts.
+        The entry is locked while it is created, so concurrent jobs training the same model train it only once.
+
+        :param label: Label of the job (for logging).
+        :param sh_guess: Path of the guesser script.
+        :param sh_content: Content of the guesser script (see Job.sh_content).
+        :param training_file: Path of the training file.
+        :param train: Function running the training phase of the guesser, returning its exit status.
+        '''
+        training_dir, artifacts = self.get_declaration(sh_guess)
+        key = self.get_key(sh_content, training_file)
+        with open('%s.lock' % self.get_path(key), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)                    # released when the file is closed
+            start = timeit.default_timer()
+            header = self.restore(key, training_dir, artifacts)
+            if header is not None:
+                restore_time = timeit.default_timer() - start
+                with TrainingCache.counter_lock:
+                    TrainingCache.hits += 1
+                    TrainingCache.time_saved += max(0.0, header['train_time'] - restore_time)
+                    self.logger.debug("Training cache hit for job <%s>: restored in %.1fs instead of training for %.1fs. Hits: %d, misses: %d, time saved: %.1fs." \
+                                      % (label, restore_time, header['train_time'], TrainingCache.hits, TrainingCache.misses, TrainingCache.time_saved))
+                return
+            status = train()
+            train_time = timeit.default_timer() - start
+            with TrainingCache.counter_lock:
+                TrainingCache.misses += 1
+                self.logger.debug("Training cache miss for job <%s>: trained in %.1fs. Hits: %d, misses: %d, time saved: %.1fs." \
+                                  % (label, train_time, TrainingCache.hits, TrainingCache.misses, TrainingCache.time_saved))
+            if status != 0:
+                self.logger.warning("The training of job <%s> failed (exit status %d), its artifacts are not cached." % (label, status))
+                return
+            try:
+                self.store(key, sh_guess, training_file, training_dir, artifacts, train_time)
+            except (IOError, OSError, tarfile.TarError), e:
+                self.logger.warning("The training artifacts could not be cached: <%s>" % str(e))
+
+
+    def restore(self, key, training_dir, artifacts):
+        ''' Replaces the artifacts in [training_dir] by the snapshot of the cache entry [key].
+
+        :return: Header dict of the entry or None if there is no such entry.
+        '''
+        path = self.get_path(key)
+        header = self.read_header(path)
+        if header is None:
+            return None
+        for artifact in artifacts:
+            artifact_path = os.path.join(training_dir, artifact)
+            if os.path.isdir(artifact_path):
+                shutil.rmtree(artifact_path)
+            elif os.path.lexists(artifact_path):
+                os.remove(artifact_path)
+        with open(path, 'rb') as f:
+            f.seek(self.HEADER_SIZE)
+            tar = tarfile.open(fileobj=f, mode='r:')
+            tar.extractall(training_dir)
+            tar.close()
+        os.utime(path, None)                                    # mark entry as recently used
+        return header
+
+
+    def store(self, key, sh_guess, training_file, training_dir, artifacts, train_time):
+        ''' Writes a snapshot of the artifacts in [training_dir] as new cache entry (atomically) and evicts least recently used entries.
+        '''
+        path = self.get_path(key)
+        tmp_path = '%s.%d%s' % (path, os.getpid(), self.TMP_SUFFIX)
+        with open(tmp_path, 'wb') as f:
+            f.seek(self.HEADER_SIZE)
+            tar = tarfile.open(fileobj=f, mode='w:')
+            for artifact in artifacts:
+                artifact_path = os.path.join(training_dir, artifact)
+                if os.path.lexists(artifact_path):
+                    tar.add(artifact_path, arcname=artifact)
+                else:
+                    self.logger.warning("The training artifact <%s> does not exist." % artifact_path)
+            tar.close()
+            header = '%s%s\n' % (self.MAGIC, json.dumps({'sh_guess': os.path.basename(sh_guess),
+                                                         'training_file': os.path.abspath(training_file),
+                                                         'training_dir': training_dir,
+                                                         'artifacts': artifacts,
+                                                         'train_time': train_time}))
+            if len(header) > self.HEADER_SIZE:
+                raise IOError("Header of the cache entry too long!")
+            f.seek(0)
+            f.write(header)
+        os.rename(tmp_path, path)
+        self.logger.debug("Training artifacts of <%s> stored in the cache (%s)." % (os.path.basename(sh_guess), key))
+        self.evict(keep=key)
+
+
+
+def main():
+    ''' Clears the cache.
+    '''
+    if len(sys.argv) != 3 or sys.argv[2] != '--clear':
+        print "Usage: %s [cache_dir] --clear" % sys.argv[0]
+        exit(-1)
+    TrainingCache(sys.argv[1], logger=Logger()).invalidate()
+
+
+if __name__ == '__main__':
+    main()
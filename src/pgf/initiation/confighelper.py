@@ -10,6 +10,8 @@ import datetime
 import json
 from pgf.initiation.job import Job
 from pgf.preparation.preparation import Preparation
+from pgf.analysis.index.multi_leak_index import MultiLeakIndex
+from pgf.analysis.checkpoint import Checkpoint
 
 
 class ConfigHelper(object):
@@ -64,20 +66,110 @@ class ConfigHelper(object):
             job.set_terminate_guessing(self.get_option(section, 'terminate_guessing'))
             job.set_max_guesses(self.get_option(section, 'max_guesses'))
             job.set_output_file(self.get_option(section, 'output_file'))
+            job.set_leak_cache_dir(self.get_option(section, 'leak_cache_dir'))
+            job.set_leak_cache_max_size(self.get_option(section, 'leak_cache_max_size'))
+            job.set_candidate_store_dir(self.get_option(section, 'candidate_store_dir'))
+            job.set_candidate_store_max_size(self.get_option(section, 'candidate_store_max_size'))
+            job.set_training_cache_dir(self.get_option(section, 'training_cache_dir'))
+            job.set_training_cache_max_size(self.get_option(section, 'training_cache_max_size'))
+            job.set_checkpoint_dir(self.get_option(section, 'checkpoint_dir'))
+            job.set_checkpoint_interval(self.get_option(section, 'checkpoint_interval'))
+            job.set_parse_processes(self.get_option(section, 'parse_processes'))
+            job.set_intake_block_size(self.get_option(section, 'intake_block_size'))
+            job.set_analysis_workers(self.get_option(section, 'analysis_workers'))
+            job.set_pipe_buffer_size(self.get_option(section, 'pipe_buffer_size'))
+            job.set_metrics_interval(self.get_option(section, 'metrics_interval'))
+            job.set_resource_sample_interval(self.get_option(section, 'resource_sample_interval'))
+            job.set_progress_flush_interval(self.get_option(section, 'progress_flush_interval'))
+            job.set_progress_rows_per_decade(self.get_option(section, 'progress_rows_per_decade'))
+            job.set_job_cores(self.get_option(section, 'job_cores'))
+            job.set_job_memory(self.get_option(section, 'job_memory'))
             # setup jtr
             jtr_dir = self.get_option(section, 'jtr_dir')
             jtr_session = self.get_option(section, 'jtr_session_name')
+            if self.get_option('DEFAULT', 'max_concurrent_jobs') > 1:
+                jtr_session = '%s_%d' % (jtr_session, len(queue) + 1)     # concurrent jobs must not share the session files of JtR
             job.set_jtr_input_format(self.get_option(section, 'jtr_input_format'))
+            job.set_hash_evaluator(self.get_option(section, 'hash_evaluator'))
             job.setup_jtr(jtr_dir, jtr_session)
             # execute the Preparation module for the currently parsed job
             self.preparation.execute(job)
             queue.append(job)                       # add job to queue
+        # let jobs with the same guesser configuration share a single guesser run
+        if self.get_option('DEFAULT', 'group_jobs'):
+            self.group_jobs(queue)
+        # set the checkpoints of the jobs and resume the jobs from their checkpoints
+        self.setup_checkpoints(queue)
         # serialize jobs to json file
         self.serialize_jobs_to_json(queue)
         #return job queue
         return queue
 
 
+    def group_jobs(self, queue):
+        ''' Detects the jobs running the same guesser with the same training and amount of guesses against different
+        plaintext leaks. Only the first job of such a group (group leader) runs the guesser, its analysis matches the
+        candidates against the leaks of all jobs of the group (see GroupAnalysis) and writes the results of every job.
+
+        :param queue: Job queue
+        '''
+        leaders = dict()                            # group key --> group leader
+        for job in queue:
+            if 'hash' in job.pw_format:
+                continue                            # every hash job needs its own JtR instance
+            key = (job.sh_guess, job.training_file, job.max_guesses, job.terminate_guessing,
+                   job.intake_block_size, job.analysis_workers)
+            leader = leaders.get(key)
+            if leader is None or len(leader.group or []) + 1 >= MultiLeakIndex.MAX_LEAKS:
+                leaders[key] = job                  # first job of a (new) group
+            else:
+                leader.set_group((leader.group or []) + [job])
+                if job.metrics_file is not None:
+                    os.remove(job.metrics_file)     # the pipeline of the group is instrumented in the metrics file of its leader
+                    job.set_metrics_file(leader.metrics_file)
+                if job.resources_file is not None:
+                    os.remove(job.resources_file)   # the processes of the group are sampled into the resources file of its leader
+                    job.set_resources_file(leader.resources_file)
+        for job in queue:
+            if job.group:
+                self.logger.debug("Job <%s> runs the guesser for the jobs <%s> as well." % (job.label, '>, <'.join([member.label for member in job.group])))
+
+
+    def setup_checkpoints(self, queue):
+        ''' Sets the checkpoint files of the plaintext jobs (one per job group, written by the analysis of the group leader).
+        If 'resume' is set, the jobs with a checkpoint are resumed: they continue the output, progress and plot series files
+        of the interrupted run (the files created for this run are removed) at the amount of candidates of the checkpoint.
+        Hash jobs are not checkpointed, as the state of JtR would have to be restored as well.
+
+        :param queue: Job queue
+        '''
+        resume = self.get_option('DEFAULT', 'resume')
+        for job in queue:
+            if job.checkpoint_dir is None or 'hash' in job.pw_format or job.group_leader is not None:
+                continue
+            jobs = [job] + (job.group or [])
+            job.set_checkpoint_file(Checkpoint.get_path(job.checkpoint_dir, jobs))
+            if not resume:
+                continue
+            header = Checkpoint(job.checkpoint_file).read_header()
+            if header is None:
+                continue
+            files = [state['files'] for state in header['schemes']]
+            if len(files) != len(jobs) or not all([os.path.isfile(path) for job_files in files for path in job_files.itervalues()]) \
+                    or not all([os.path.getsize(job_files['progress_file']) >= state['progress']['size']
+                                for job_files, state in zip(files, header['schemes'])]):
+                self.logger.warning("The checkpoint of job <%s> cannot be resumed as the files of the interrupted run are missing, the job is started from the beginning." % job.label)
+                continue
+            for member, member_files in zip(jobs, files):
+                for path in (member.output_file, member.progress_file, member.plot_series_file):
+                    os.remove(path)                 # the files of the interrupted run are continued
+                member.set_output_file(str(member_files['output_file']))
+                member.set_progress_file(str(member_files['progress_file']))
+                member.set_plot_series_file(str(member_files['plot_series_file']))
+            job.set_resumed_candidates(header['candidates'])
+            self.logger.debug("Job <%s> is resumed from its checkpoint at candidate %s." % (job.label, '{:,}'.format(header['candidates'])))
+
+
     def get_option(self, section, option):
         ''' Returns the value for the provided option parsed from the given section.
         Value will be evaluated if possible, else it will be returned as string.
@@ -4,6 +4,7 @@
 '''
 
 import os
+from pgf.analysis.hash_evaluator import is_supported
 
 class Job(object):
     ''' This class represents a job 'to do' for the Password Guessing Framework.
@@ -27,13 +28,43 @@ class Job(object):
         self.output_file = None             # jtr_markov_myspace_myspace.txt
         self.progress_file = None           #_progress.csv
         self.plot_file = None               # [timestamp_plot_[uuid].csv
+        self.plot_series_file = None        # [timestamp]_[uuid]_[output_file]_plot.csv --> plot values of this job only (row of the plot file)
+        self.cracked_file = None            # [timestamp]_[uuid]_[output_file]_cracked.txt --> passwords cracked by JtR (hash jobs only)
+        self.stats_file = None              # [timestamp]_[uuid]_[output_file]_stats.json --> statistics of the report, updated while the job is running
+        self.metrics_file = None            # [timestamp]_[uuid]_[output_file]_metrics.csv --> throughput of the stages of the pipeline of the job
+        self.resources_file = None          # [timestamp]_[uuid]_[output_file]_resources.csv --> resources used by the processes of the job
+        self.resources = None               # {'guesser': {'cpu_percent': {'peak': 99.8, 'mean': 97.1}, ...}, ...} - will be set by the Executor
         self.jtr_dir= None                  # /opt/pgf/john-hash/
         self.jtr_input_format = None        # raw-md5 --> john-hash will be used with parameter '--format=raw-md5'
+        self.hash_evaluator = None          # builtin / john --> evaluator of the candidates of hash jobs (None for plaintext jobs)
         self.jtr_session = None             # PGF - will be set in the 'setup_jtr' method
         self.jtr_log_file = None            # PGF.log - will be set in the 'setup_jtr' method
         self.jtr_pot_file = None            # PGF.pot - will be set in the 'setup_jtr' method
         self.jtr_command = None             # ./john --stdin pw_file --session=pcfg_manager --pot=PGF --> will be set in the 'setup_jtr' method
         self.analysis_process = None
+        self.leak_cache_dir = None          # ./results/leak_cache/ --> directory of the cache of parsed leaks
+        self.leak_cache_max_size = None     # 4096 (MB)
+        self.parse_processes = None         # 4 --> amount of processes parsing the password file (None = all CPU cores)
+        self.intake_block_size = None       # 1048576 --> bytes of the candidate stream read at once by the analysis (None = line by line)
+        self.analysis_workers = None        # 4 --> processes matching the candidates against the leak
+        self.pipe_buffer_size = None        # 1048576 --> buffer size of the pipes between the subprocesses of the job (None = system default)
+        self.metrics_interval = None        # 1 (seconds) --> cadence of the rows of the metrics file (None = pipeline not instrumented)
+        self.resource_sample_interval = None # 1 (seconds) --> cadence of the samples of the resources file (None = not sampled)
+        self.progress_flush_interval = None # 5 (seconds) --> cadence of writing the buffered rows of the progress file
+        self.progress_rows_per_decade = None # 100 --> rows of the progress file kept per power of ten of guesses (None = all rows)
+        self.job_cores = None               # 4 --> cores needed by the job when running concurrently (None = guesser + analysis workers)
+        self.job_memory = None              # 2048 (MB) --> memory needed by the job when running concurrently (None = not considered)
+        self.candidate_store_dir = None     # ./results/candidate_store/ --> directory of the recorded candidate streams of the guessers
+        self.candidate_store_max_size = None # 16384 (MB)
+        self.training_cache_dir = None      # ./results/training_cache/ --> directory of the snapshots of the trained models of the guessers
+        self.training_cache_max_size = None # 4096 (MB)
+        self.checkpoint_dir = None          # ./results/checkpoints/ --> directory of the checkpoints of the analysis (plaintext jobs)
+        self.checkpoint_interval = None     # 600 (seconds) --> cadence of the checkpoints (None = no checkpoints)
+        self.checkpoint_file = None         # [checkpoint_dir]/[label]_[config hash].checkpoint - will be set by the ConfigHelper
+        self.resumed_candidates = None      # 4200000000 --> candidates analyzed before the checkpoint the job is resumed from - will be set by the ConfigHelper
+        self.cpu_cores = None               # [0, 1] --> cores the processes of the job are pinned to - will be set by the Scheduler
+        self.group = None                   # [Job, ...] --> jobs evaluating the candidates of this job's guesser as well - will be set by the ConfigHelper
+        self.group_leader = None            # JTR_MARKOV Yahoo vs. RockYou --> label of the job whose guesser generates the candidates for this job
 
 
     def prepare_for_json(self):
@@ -49,6 +80,17 @@ class Job(object):
         self_as_dict['runtime'] = 'Pending'
         self_as_dict['output_file'] = os.path.basename(self_as_dict['output_file'])
         self_as_dict['progress_file'] = os.path.basename(self_as_dict['progress_file'])
+        self_as_dict['plot_series_file'] = os.path.basename(self_as_dict['plot_series_file'])
+        if self.cracked_file is not None:
+            self_as_dict['cracked_file'] = os.path.basename(self_as_dict['cracked_file'])
+        if self.stats_file is not None:
+            self_as_dict['stats_file'] = os.path.basename(self_as_dict['stats_file'])
+        if self.metrics_file is not None:
+            self_as_dict['metrics_file'] = os.path.basename(self_as_dict['metrics_file'])
+        if self.resources_file is not None:
+            self_as_dict['resources_file'] = os.path.basename(self_as_dict['resources_file'])
+        if self.group is not None:
+            self_as_dict['group'] = [job.label for job in self.group]
         return self_as_dict
 
 
@@ -115,15 +157,149 @@ class Job(object):
                 output_file = '%s.csv' % output_file            # append file ending if not present
         self.output_file = os.path.abspath(output_file)         # resolve relative paths automatically
 
+    def set_leak_cache_dir(self, leak_cache_dir):
+        ''' Sets the directory of the leak cache. Relative paths are resolved, 'None' disables the cache.
+        '''
+        if leak_cache_dir is not None:
+            leak_cache_dir = os.path.abspath(leak_cache_dir)
+        self.leak_cache_dir = leak_cache_dir
+
+    def set_leak_cache_max_size(self, leak_cache_max_size):
+        self.leak_cache_max_size = leak_cache_max_size
+
+    def set_candidate_store_dir(self, candidate_store_dir):
+        ''' Sets the directory of the candidate store. Relative paths are resolved, 'None' disables the store.
+        '''
+        if candidate_store_dir is not None:
+            candidate_store_dir = os.path.abspath(candidate_store_dir)
+        self.candidate_store_dir = candidate_store_dir
+
+    def set_candidate_store_max_size(self, candidate_store_max_size):
+        self.candidate_store_max_size = candidate_store_max_size
+
+    def set_training_cache_dir(self, training_cache_dir):
+        ''' Sets the directory of the training cache. Relative paths are resolved, 'None' disables the cache.
+        '''
+        if training_cache_dir is not None:
+            training_cache_dir = os.path.abspath(training_cache_dir)
+        self.training_cache_dir = training_cache_dir
+
+    def set_training_cache_max_size(self, training_cache_max_size):
+        self.training_cache_max_size = training_cache_max_size
+
+    def set_checkpoint_dir(self, checkpoint_dir):
+        ''' Sets the directory of the checkpoints. Relative paths are resolved, 'None' disables the checkpoints.
+        '''
+        if checkpoint_dir is not None:
+            checkpoint_dir = os.path.abspath(checkpoint_dir)
+        self.checkpoint_dir = checkpoint_dir
+
+    def set_checkpoint_interval(self, checkpoint_interval):
+        self.checkpoint_interval = checkpoint_interval
+
+    def set_checkpoint_file(self, checkpoint_file):
+        self.checkpoint_file = checkpoint_file
+
+    def set_resumed_candidates(self, resumed_candidates):
+        self.resumed_candidates = resumed_candidates
+
+    def set_pipe_buffer_size(self, pipe_buffer_size):
+        self.pipe_buffer_size = pipe_buffer_size
+
+    def set_metrics_interval(self, metrics_interval):
+        self.metrics_interval = metrics_interval
+
+    def set_resource_sample_interval(self, resource_sample_interval):
+        self.resource_sample_interval = resource_sample_interval
+
+    def set_parse_processes(self, parse_processes):
+        self.parse_processes = parse_processes
+
+    def set_intake_block_size(self, intake_block_size):
+        self.intake_block_size = intake_block_size
+
+    def set_analysis_workers(self, analysis_workers):
+        self.analysis_workers = analysis_workers
+
+    def set_progress_flush_interval(self, progress_flush_interval):
+        self.progress_flush_interval = progress_flush_interval
+
+    def set_progress_rows_per_decade(self, progress_rows_per_decade):
+        self.progress_rows_per_decade = progress_rows_per_decade
+
+    def set_job_cores(self, job_cores):
+        self.job_cores = job_cores
+
+    def set_job_memory(self, job_memory):
+        self.job_memory = job_memory
+
+    def set_cpu_cores(self, cpu_cores):
+        self.cpu_cores = cpu_cores
+
+    def set_group(self, group):
+        ''' Sets the jobs evaluating the candidates of this job's guesser as well (job group).
+        '''
+        self.group = group
+        for job in group:
+            job.group_leader = self.label
+
+    def get_group_args(self):
+        ''' Returns the job-specific parameters of the analysis of this job, for the analysis of the job group leader.
+
+        :return: Dictionary of the parameters (as strings) named as the parameters of 'Analysis'.
+        '''
+        return {'label': str(self.label),
+                'pw_format': str(self.pw_format),
+                'pw_file': str(self.pw_file),
+                'output_file': str(self.output_file),
+                'progress_file': str(self.progress_file),
+                'plot_series_file': str(self.plot_series_file),
+                'stats_file': str(self.stats_file),
+                'leak_cache_dir': str(self.leak_cache_dir),
+                'leak_cache_max_size': str(self.leak_cache_max_size),
+                'parse_processes': str(self.parse_processes),
+                'progress_flush_interval': str(self.progress_flush_interval),
+                'progress_rows_per_decade': str(self.progress_rows_per_decade)}
+
     def set_progress_file(self, progress_file):
         self.progress_file = progress_file
 
     def set_plot_file(self, plot_file):
         self.plot_file = plot_file
 
+    def set_plot_series_file(self, plot_series_file):
+        self.plot_series_file = plot_series_file
+
+    def set_cracked_file(self, cracked_file):
+        self.cracked_file = cracked_file
+
+    def set_stats_file(self, stats_file):
+        self.stats_file = stats_file
+
+    def set_metrics_file(self, metrics_file):
+        self.metrics_file = metrics_file
+
+    def set_resources_file(self, resources_file):
+        self.resources_file = resources_file
+
+    def set_resources(self, resources):
+        self.resources = resources
+
     def set_jtr_input_format(self, jtr_input_format):
         self.jtr_input_format = jtr_input_format
 
+    def set_hash_evaluator(self, hash_evaluator):
+        ''' Sets the evaluator of the candidates of hash jobs: 'builtin' hashes them in the analysis (see hash_evaluator),
+        'john' pipes them through JtR. Hash formats not supported by the built-in evaluator are evaluated by JtR.
+        Requires 'pw_format' and 'jtr_input_format' to be set.
+        '''
+        if 'hash' not in self.pw_format:
+            hash_evaluator = None
+        elif hash_evaluator == 'builtin' and not is_supported(self.jtr_input_format, self.pw_format == 'hash_salted'):
+            self.logger.debug("The hash format <%s> of job <%s> is evaluated by JtR." % (self.jtr_input_format, self.label))
+            hash_evaluator = 'john'
+        self.hash_evaluator = hash_evaluator
+
     def setup_jtr(self, jtr_dir, jtr_session_name):
         ''' Constructs paths needed to process the JtR output files.
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 #
-# Simple wrapper for Python logging module. Adds information about location
-# emitting the debug information (file, line, function) and timestamp.
+# Simple asynchronous logger. Adds information about location emitting the
+# debug information (file, line, function) and timestamp.
 #
 # Copyright (C) 2010, 2011 Senko Rasic <senko.rasic@dobarkod.hr>
 #
@@ -23,12 +23,190 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import os.path
-import logging
+import os
+import sys
+import time
+import errno
+import heapq
+import atexit
+import threading
 import traceback
+from collections import deque
 
 from logging import DEBUG, WARNING, ERROR
 
+LEVEL_NAMES = {DEBUG: 'DEBUG', WARNING: 'WARNING', ERROR: 'ERROR'}
+OWNER_ENV = 'PGF_LOG_PID'       # pid of the process writing the logfile, its subprocesses write part files
+CONTINUATION = '    '           # prefix of the continuation lines of multi-line records (e.g. stack traces)
+
+
+class LogWriter(object):
+    '''
+    Background writer of the log records of a process. The logging threads
+    only append the records to a deque, a daemon thread writes them to the
+    logfile (kept open) and the console (stderr) every 'interval' seconds.
+    The thread is started along with the logfile by the first record of the
+    process. Processes forked from it (e.g. the workers of a multiprocessing
+    pool, which are terminated without running the atexit handlers) do not
+    start a thread but write every record immediately.
+
+    The process owning the logfile (the first process importing this module,
+    e.g. main.py) writes to 'results/log.txt', its subprocesses (analysis,
+    worker processes, ...) write to 'results/log.txt.[pid].part'. The part
+    files of finished processes are merged into the logfile by timestamp.
+    Every line of a record but the first one starts with CONTINUATION, so
+    the records can be told apart when the files are merged.
+    '''
+
+    interval = 0.2              # seconds between two writes of the queued records
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = None                         # process the writer has been started in (None = not started yet)
+        self.main_pid = os.getpid()             # process importing the module, other processes are forks of it
+        self.thread = None
+        os.environ.setdefault(OWNER_ENV, str(self.main_pid))   # claimed before any subprocess is started
+
+    def start(self):
+        '''
+        Starts the writer in the current process, also after a fork (the
+        writer thread of the parent process is not copied).
+        '''
+        self.pid = os.getpid()
+        self.is_owner = os.environ.get(OWNER_ENV) == str(self.pid)
+        if self.is_owner:
+            self.file_path = self.path
+        else:
+            self.file_path = '%s.%d.part' % (self.path, self.pid)
+        self.records = deque()
+        self.lock = threading.Lock()            # held while records are written or the logfile is replaced
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.logfile = open(self.file_path, 'a')
+        self.synchronous = self.pid != self.main_pid
+        self.thread = None
+        if not self.synchronous:
+            self.thread = threading.Thread(target=self.run, name='LogWriter')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def put(self, record):
+        '''
+        Queues a (timestamp, level, line) record.
+        '''
+        if os.getpid() != self.pid:
+            self.start()
+        self.records.append(record)
+        if self.synchronous:
+            self.flush()
+        elif record[1] >= ERROR:
+            self.wakeup.set()                   # write errors immediately
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes the queued records to the logfile and the console.
+        '''
+        if self.pid != os.getpid():
+            return                              # nothing logged by this process yet
+        with self.lock:
+            if not self.records:
+                return
+            lines = list()
+            while self.records:
+                created, level, line = self.records.popleft()
+                lines.append('%s.%06d %s %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)),
+                                                  int(created % 1 * 1000000),
+                                                  LEVEL_NAMES.get(level, level),
+                                                  line.replace('\n', '\n' + CONTINUATION)))
+            text = ''.join(lines)
+            try:
+                self.logfile.write(text)
+                self.logfile.flush()
+                sys.stderr.write(text)
+            except (IOError, ValueError):
+                pass                            # file closed during interpreter shutdown
+
+    def finished_parts(self):
+        '''
+        Returns the paths of the part files of the subprocesses that have terminated.
+        '''
+        directory = os.path.dirname(self.path)
+        prefix = '%s.' % os.path.basename(self.path)
+        parts = list()
+        for filename in os.listdir(directory):
+            if not (filename.startswith(prefix) and filename.endswith('.part')):
+                continue
+            try:
+                os.kill(int(filename[len(prefix):-len('.part')]), 0)
+            except ValueError:
+                continue
+            except OSError, e:
+                if e.errno == errno.ESRCH:      # no such process
+                    parts.append(os.path.join(directory, filename))
+        return parts
+
+    @staticmethod
+    def read_records(f):
+        '''
+        Yields the records of a logfile. Lines starting with CONTINUATION
+        belong to the record before them.
+        '''
+        record = ''
+        for line in f:
+            if record and not line.startswith(CONTINUATION):
+                yield record
+                record = ''
+            record += line
+        if record:
+            yield record
+
+    def merge(self):
+        '''
+        Merges the part files of terminated subprocesses into the logfile,
+        ordered by timestamp.
+        '''
+        if os.getpid() != self.pid:
+            self.start()                        # nothing logged yet, the logfile is created
+        if not self.is_owner:
+            return
+        self.flush()
+        parts = self.finished_parts()
+        if not parts:
+            return
+        with self.lock:
+            self.logfile.close()
+            files = [open(path, 'r') for path in [self.path] + parts]
+            tmp_path = '%s.tmp' % self.path
+            with open(tmp_path, 'w') as merged:
+                for record in heapq.merge(*[self.read_records(f) for f in files]):
+                    merged.write(record)
+            for f in files:
+                f.close()
+            os.rename(tmp_path, self.path)
+            for path in parts:
+                os.remove(path)
+            self.logfile = open(self.path, 'a')
+
+    def close(self):
+        '''
+        Stops the writer thread before the interpreter shuts down and writes the remaining records.
+        '''
+        if os.getpid() != self.pid:
+            return                              # nothing logged by this process
+        if self.thread is not None:
+            self.stopped = True
+            self.wakeup.set()
+            self.thread.join()
+        self.flush()
+        self.merge()
+
+
 class Logger(object):
     '''
     Logger mixin/base class adding verbose logging to subclasses.
@@ -36,11 +214,12 @@ class Logger(object):
     the information given, also show location of the message (file, line and
     function).
 
-    By default, the logging mechanism will only show warning and error messages
-    without any timestamping. A static method Logger.basicConfig() is provided
-    for basic usage with all debugging turned on and showing debuglevel and
-    timestamps. See the documentation of logging module for information how to
-    customize debug levels, formatters and outputs.
+    All messages are timestamped and written by a background thread to the
+    logfile and the console (see LogWriter), so logging does not block the
+    calling thread on I/O (except in forked processes). The minimum log level is set with the static method
+    Logger.basicConfig(); messages below it are dropped before they are
+    formatted. Arguments passed along with a message are only formatted into
+    it if the level is enabled.
 
     To activate the basic configuration:
     >>> Logger.basicConfig()
@@ -49,7 +228,7 @@ class Logger(object):
 
     >>> class MyClass(Logger):
     ...    def my_method(self):
-    ...        self.debug('called')
+    ...        self.debug('called %d times', 1)
     ...    def raises_exc(self):
     ...        try:
     ...            raise Exception('error message')
@@ -70,78 +249,84 @@ class Logger(object):
     '''
 
     show_source_location = True
-    
+
+    level = DEBUG
+
     # resolve relative path
     path = os.path.abspath('./results/log.txt')
 
-    # open/create the logfile
-    if not os.path.isfile(path):
-        log = open(path, 'w')
-        log.close()
-    logfile = open(path, 'a')
-    logfile.close()
-
-    # Formats the message as needed and calls the correct logging method
-    # to actually handle it
-    def _raw_log(self, logfn, message, exc_info):
-        cname = ''
-        loc = ''
-        fn = ''
-        tb = traceback.extract_stack()
-        if len(tb) > 2:
-            if self.show_source_location:
-                loc = '(%s:%d):' % (os.path.basename(tb[-3][0]), tb[-3][1])
-            fn = tb[-3][2]
+    # writer of the logfile, started by the first message of the process
+    writer = LogWriter(path)
+    atexit.register(writer.close)
+
+    # Formats the message as needed and queues it for the writer
+    def _raw_log(self, level, message, args, exc_info):
+        if level < Logger.level:
+            return
+        if args:
+            message = message % args
+        line = message
+        if self.show_source_location:
+            frame = sys._getframe(2)                    # caller of debug(), warning() or error()
+            fn = frame.f_code.co_name
             if fn != '<module>':
                 if self.__class__.__name__ != Logger.__name__:
                     fn = self.__class__.__name__ + '.' + fn
                 fn += '()'
-        line = loc + cname + fn + ': ' + message        # generate line to write
-        logfile = open(self.path, 'a')                       # open logfile
-        logfile.write("%s\n" % line)                             # write line to logfile
-        logfile.close()                                 # close logfile
-        logfn(line, exc_info=exc_info)
+            line = '(%s:%d):%s: %s' % (os.path.basename(frame.f_code.co_filename), frame.f_lineno, fn, message)
+        if exc_info:
+            line = '%s\n%s' % (line, traceback.format_exc().rstrip('\n'))
+        Logger.writer.put((time.time(), level, line))
 
-    def debug(self, message, exc_info=False):
+    def debug(self, message, *args, **kwargs):
         '''
         Log a debug-level message. If exc_info is True, if an exception
         was caught, show the exception information (message and stack trace).
         '''
-        self._raw_log(logging.debug, message, exc_info)
+        self._raw_log(DEBUG, message, args, kwargs.get('exc_info', False))
 
-    def warning(self, message, exc_info=False):
+    def warning(self, message, *args, **kwargs):
         '''
         Log a warning-level message. If exc_info is True, if an exception
         was caught, show the exception information (message and stack trace).
         '''
-        self._raw_log(logging.warning, message, exc_info)
+        self._raw_log(WARNING, message, args, kwargs.get('exc_info', False))
 
-    def error(self, message, exc_info=False):
+    def error(self, message, *args, **kwargs):
         '''
         Log an error-level message. If exc_info is True, if an exception
         was caught, show the exception information (message and stack trace).
         '''
-        self._raw_log(logging.error, message, exc_info)
+        self._raw_log(ERROR, message, args, kwargs.get('exc_info', False))
 
     @staticmethod
     def basicConfig(level_str='DEBUG'):
+        '''
+        Set the minimum log level, one of DEBUG, WARNING, ERROR. If not set,
+        DEBUG log level is used as minimum. Can be called any number of times.
+        '''
         if level_str == 'DEBUG':
-            level = DEBUG
+            Logger.level = DEBUG
         elif level_str == 'WARNING':
-            level = WARNING
+            Logger.level = WARNING
         elif level_str == 'ERROR':
-            level = ERROR
+            Logger.level = ERROR
         else:
             raise NotImplementedError
+
+    @staticmethod
+    def flush():
+        '''
+        Write all queued messages of the current process.
+        '''
+        Logger.writer.flush()
+
+    @staticmethod
+    def merge_logs():
         '''
-        Apply a basic logging configuration which outputs the log to the
-        console (stderr). Optionally, the minimum log level can be set, one
-        of DEBUG, WARNING, ERROR (or any of the levels from the logging
-        module). If not set, DEBUG log level is used as minimum.
+        Merge the logfiles of terminated subprocesses into the logfile.
         '''
-        logging.basicConfig(level=level,
-            format='%(asctime)s %(levelname)s %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S')
+        Logger.writer.merge()
 
 logger = Logger()
 
@@ -7,6 +7,7 @@ import os
 import time
 import datetime
 import uuid
+from pgf.execution import stage_metrics, resource_sampler
 
 
 class Preparation(object):
@@ -48,6 +49,47 @@ class Preparation(object):
         job.set_progress_file(progress_file)            # set progress_file path
         # init progress file with (0,0,0.000)-line
         self.write_line_to_file(progress_file, '0,0,0.000')
+        # create the plot series file (csv), the analysis appends the plot values of the job to it
+        plot_series_file = self.create_output_file(job.output_file, uuid=uuid_, suffix='plot', ending='csv')
+        job.set_plot_series_file(plot_series_file)      # set plot_series_file path
+        # create the statistics file (json), the analysis replaces it with the current statistics of the report while the job is running
+        stats_file = self.create_output_file(job.output_file, uuid=uuid_, suffix='stats', ending='json')
+        job.set_stats_file(stats_file)                  # set stats_file path
+        if job.hash_evaluator == 'john':
+            # create the file of the passwords cracked by JtR (txt), the executor writes the output of JtR to it
+            cracked_file = self.create_output_file(job.output_file, uuid=uuid_, suffix='cracked', ending='txt')
+            job.set_cracked_file(cracked_file)          # set cracked_file path
+        if job.metrics_interval is not None:
+            # create the metrics file (csv), the stages of the pipeline of the job append their counters to it
+            metrics_file = self.create_output_file(job.output_file, uuid=uuid_, suffix='metrics', ending='csv')
+            job.set_metrics_file(metrics_file)          # set metrics_file path
+            self.write_line_to_file(metrics_file, stage_metrics.HEADER)
+        if job.resource_sample_interval is not None:
+            # create the resources file (csv), the executor appends the samples of the resources used by the processes of the job to it
+            resources_file = self.create_output_file(job.output_file, uuid=uuid_, suffix='resources', ending='csv')
+            job.set_resources_file(resources_file)      # set resources_file path
+            self.write_line_to_file(resources_file, resource_sampler.HEADER)
+
+
+    def merge_plot_file(self, jobs):
+        ''' Regenerates the plot file from its header line and the plot series files of the [jobs] (one row per started job).
+        The file is replaced atomically, so the visualization module never reads a partially written file.
+
+        :param jobs: List of Job instances in the order of the run.ini.
+        '''
+        with open(self.plot_file_path, 'r') as f:
+            lines = [f.readline().rstrip('\n')]                  # header line
+        for job in jobs:
+            if os.path.isfile(job.plot_series_file):
+                with open(job.plot_series_file, 'r') as f:
+                    series = f.read().rstrip('\n')
+                if series:
+                    lines.append(series)                        # empty series --> job not started yet
+        tmp_path = '%s.tmp' % self.plot_file_path
+        with open(tmp_path, 'w') as f:                          # truncate the leftovers of an interrupted merge
+            for line in lines:
+                f.write('%s\n' % line)
+        os.rename(tmp_path, self.plot_file_path)
 
 
     def create_output_file(self, path, uuid, suffix=None, ending=None):
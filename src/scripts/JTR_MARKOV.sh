@@ -1,12 +1,21 @@
 #!/bin/bash
 
-# ${1} received the training file, ${2} (if used) the max. amount of guesses
+# ${1} received the training file, ${2} (if used) the max. amount of guesses,
+# ${3} (if used) the phase to run: 'train' or 'guess' (both phases if not set, see 'training_cache_dir' in the run.ini)
+# TRAINING_DIR: /opt/pgf/john-guess
+# TRAINING_ARTIFACTS: stats
 
 cd /opt/pgf/john-guess
 
 # Training
-rm -f stats
-./calc_stat "${1}" stats > /dev/null 2>&1
+if [ "${3}" != "guess" ]; then
+    rm -f stats
+    ./calc_stat "${1}" stats > /dev/null 2>&1
+    STATUS=$?
+    if [ "${3}" = "train" ]; then
+        exit ${STATUS}
+    fi
+fi
 
 # Determine Level
 ./genmkvpwd stats 0 12 > myLevel.txt
@@ -1,12 +1,21 @@
 #!/bin/bash
 
-# ${1} received the training file, ${2} (if used) the max. amount of guesses
+# ${1} received the training file, ${2} (if used) the max. amount of guesses,
+# ${3} (if used) the phase to run: 'train' or 'guess' (both phases if not set, see 'training_cache_dir' in the run.ini)
+# TRAINING_DIR: /opt/pgf/omen
+# TRAINING_ARTIFACTS: CP.level EP.level IP.level LN.level createConfig
 
 cd /opt/pgf/omen
 
 # Training
-rm -f CP.level EP.level IP.level LN.level createConfig
-./createNG --iPwdList "${1}" > /dev/null 2>&1
+if [ "${3}" != "guess" ]; then
+    rm -f CP.level EP.level IP.level LN.level createConfig
+    ./createNG --iPwdList "${1}" > /dev/null 2>&1
+    STATUS=$?
+    if [ "${3}" = "train" ]; then
+        exit ${STATUS}
+    fi
+fi
 
 # Execute Guesser
 ./enumNG --ignoreEP --maxattempts ${2} --pipeMode
@@ -1,12 +1,21 @@
 #!/bin/bash
 
-# ${1} received the training file, ${2} (if used) the max. amount of guesses
+# ${1} received the training file, ${2} (if used) the max. amount of guesses,
+# ${3} (if used) the phase to run: 'train' or 'guess' (both phases if not set, see 'training_cache_dir' in the run.ini)
+# TRAINING_DIR: /opt/pgf/pcfg-google
+# TRAINING_ARTIFACTS: grammar digits special
 
 cd /opt/pgf/pcfg-google
 
 # Training
-rm -f grammar/* digits/* special/*
-./process.py "${1}" > /dev/null 2>&1
+if [ "${3}" != "guess" ]; then
+    rm -f grammar/* digits/* special/*
+    ./process.py "${1}" > /dev/null 2>&1
+    STATUS=$?
+    if [ "${3}" = "train" ]; then
+        exit ${STATUS}
+    fi
+fi
 
 # Execute Guesser
 ./pcfg_manager -dname0 "${1}" -dprob0 0.6
\ No newline at end of file
@@ -62,12 +62,56 @@ function request_jobs_json() {
         for (var i=0; i<data.jobs.length; i++) {
             document.getElementById('runtime_'.concat(i)).innerHTML = data.jobs[i].runtime;
         }
-        request_job_data(data.plot_file)
+        request_job_data(data.plot_file, data.jobs)
         });
 }
 
 
-function request_job_data(plot_file) {
+function get_text(url) {
+    'use strict';
+    // resolves with an empty string if the file cannot be requested
+    var deferred = $.Deferred();
+    $.get(url).done(function(data) {
+        deferred.resolve(data);
+    }).fail(function() {
+        deferred.resolve('');
+    });
+    return deferred.promise();
+}
+
+
+function request_plot_rows(plot_file, jobs, callback) {
+    'use strict';
+    // The header line is read from the plot file, the rows are read from the plot series files of the jobs directly,
+    // as the plot file is only regenerated when a job has finished.
+    var requests = [get_text('/results/'+plot_file)];
+    $.each(jobs, function(jobNo, job) {
+        if (job.plot_series_file) {
+            requests.push(get_text('/results/'+job.plot_series_file));
+        }
+    });
+    $.when.apply($, requests).done(function() {
+        var lines = arguments[0].replace(/^\s+|\s+$/g,"").split('\n');
+        var rows = [];
+        if (arguments.length == 1) {
+            // no plot series files (results of an older version) --> rows of the plot file
+            for (var i=1; i<lines.length; i++) {
+                rows.push({jobNo: i-1, line: lines[i]});
+            }
+        } else {
+            for (var i=1; i<arguments.length; i++) {
+                var line = arguments[i].replace(/^\s+|\s+$/g,"");
+                if (line.length > 0) {
+                    rows.push({jobNo: i-1, line: line});    // empty series --> job not started yet
+                }
+            }
+        }
+        callback(lines[0], rows);
+    });
+}
+
+
+function request_job_data(plot_file, jobs) {
     'use strict';
     var options = {
         chart: {
@@ -120,38 +164,33 @@ function request_job_data(plot_file) {
         },
         series: []
     };
-    $.get('/results/'+plot_file, function(data) {
-        // Split the lines
-        var lines = data.replace(/^\s+|\s+$/g,"").split('\n'); //Fix to ingore last line data.split('\n');
-        var header_length = 0;
-        $.each(lines, function(lineNo, line) {
-            var items = line.split(',');
-            // header line containes categories
-            if (lineNo == 0) {
-                header_length = items.length;
-                $.each(items, function(itemNo, item) {
-                    if (itemNo > 0) options.xAxis.categories.push(item);
-                });
+    request_plot_rows(plot_file, jobs, function(header, rows) {
+        // header line containes categories
+        var header_items = header.split(',');
+        var header_length = header_items.length;
+        $.each(header_items, function(itemNo, item) {
+            if (itemNo > 0) options.xAxis.categories.push(item);
+        });
+        $.each(rows, function(rowNo, row) {
+            var items = row.line.split(',');
+            if(items.length != header_length) {
+                document.getElementById('status_'.concat(row.jobNo)).innerHTML = "Running";      // current job is running
             } else {
-                if(items.length != header_length) {
-                    document.getElementById('status_'.concat(lineNo-1)).innerHTML = "Running";      // current job is running
+                document.getElementById('status_'.concat(row.jobNo)).innerHTML = "Done";
+            }
+            // the rows contain data with their name in the first position
+            var series = { 
+                data: []
+            };
+            $.each(items, function(itemNo, item) {
+                if (itemNo == 0) {
+                    series.name = item;
                 } else {
-                    document.getElementById('status_'.concat(lineNo-1)).innerHTML = "Done";
+                    series.data.push(parseFloat(item));
+                    document.getElementById('success_rate_'.concat(row.jobNo)).innerHTML = item;
                 }
-                // the rest of the lines contain data with their name in the first position
-                var series = { 
-                    data: []
-                };
-                $.each(items, function(itemNo, item) {
-                    if (itemNo == 0) {
-                        series.name = item;
-                    } else {
-                        series.data.push(parseFloat(item));
-                        document.getElementById('success_rate_'.concat(lineNo-1)).innerHTML = item;
-                    }
-                });
-                options.series.push(series);
-            }
+            });
+            options.series.push(series);
         });
         var chart = new Highcharts.Chart(options);
     });